@@ -1,22 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from predict_route import predict_bp
-import pandas as pd
-from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
+from flask import Flask
+from predict_route import predict_bp, predict_batch, predict_csv
 import os
-from functools import wraps
 from dotenv import load_dotenv
 import json
-from datetime import datetime
 from flask_wtf.csrf import CSRFProtect
 from routes.main import main
 from routes.authRoutes import authRoutes
 from routes.adminRoute import adminRoute
 from routes.classification_routes import classification_bp
-from db.database import init_db, get_db_connection
-from auth.middleware import login_required, admin_required
+from routes.metricsRoute import metricsRoute
+from routes.reportRoutes import reportRoutes
+from db.database import init_db, init_app as init_db_app
 from routes.loadModel import loadModel
 import logging
+import atexit
+from db.write_behind import ClassificationWriter
+from reports.jobs import ReportQueue
+from reports.cache import ReportCache
+from ml.dataset import DatasetService
+from datetime import timedelta
 
 # Configure logging
 logging.basicConfig(
@@ -31,6 +33,28 @@ app.config['SECRET_KEY'] = "1qazwszx"
 app.config['WTF_CSRF_ENABLED'] = True
 app.config['WTF_CSRF_SECRET_KEY'] = "1qazwszx" 
 csrf = CSRFProtect(app)
+# API JSON untuk sistem lain: autentikasi lewat token API (lihat api_auth_required), bukan token CSRF
+csrf.exempt(predict_batch)
+csrf.exempt(predict_csv)
+app.config['API_TOKENS'] = [token.strip() for token in os.getenv('API_TOKENS', '').split(',') if token.strip()]
+app.config['PREDICT_MICROBATCH'] = os.getenv('PREDICT_MICROBATCH', '0') == '1'
+app.config['PREDICT_MICROBATCH_WINDOW_MS'] = float(os.getenv('PREDICT_MICROBATCH_WINDOW_MS', '2'))
+app.config['PREDICT_MICROBATCH_MAX_ROWS'] = int(os.getenv('PREDICT_MICROBATCH_MAX_ROWS', '64'))
+app.config['MODEL_WATCH_INTERVAL'] = float(os.getenv('MODEL_WATCH_INTERVAL', '5'))
+app.config['DB_WRITE_BEHIND'] = os.getenv('DB_WRITE_BEHIND', '0') == '1'
+app.config['DB_WRITE_BEHIND_QUEUE'] = int(os.getenv('DB_WRITE_BEHIND_QUEUE', '10000'))
+app.config['DB_WRITE_BEHIND_BATCH'] = int(os.getenv('DB_WRITE_BEHIND_BATCH', '500'))
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+app.config['METRICS_PUBLIC'] = os.getenv('METRICS_PUBLIC', '0') == '1'
+app.config['DATABASE'] = os.getenv('DATABASE_PATH', 'database.db')
+app.config['DATASET_PATH'] = os.getenv('DATASET_PATH', 'heart.csv')
+app.config['REPORT_DIR'] = os.getenv('REPORT_DIR', 'reports_output')
+app.config['REPORT_WORKERS'] = int(os.getenv('REPORT_WORKERS', '2'))
+app.config['REPORT_TTL_HOURS'] = float(os.getenv('REPORT_TTL_HOURS', '24'))
+app.config['REPORT_CACHE_DIR'] = os.getenv('REPORT_CACHE_DIR', os.path.join(app.config['REPORT_DIR'], 'cache'))
+app.config['REPORT_CACHE_MAX_MB'] = float(os.getenv('REPORT_CACHE_MAX_MB', '256'))
+init_db_app(app)
 
 # Add fromjson filter
 @app.template_filter('fromjson')
@@ -40,6 +64,9 @@ def fromjson_filter(value):
 # Load ML models
 loadModel(app)
 
+# heart.csv untuk halaman depan dan API dataset, dimuat sekali per proses
+app.config['DATASET'] = DatasetService(app.config['DATASET_PATH'])
+
 app.register_blueprint(predict_bp)
 app.register_blueprint(classification_bp)
 
@@ -47,9 +74,33 @@ app.register_blueprint(classification_bp)
 main(app)
 authRoutes(app)
 adminRoute(app)
+metricsRoute(app)
+reportRoutes(app)
 
 # Initialize database
 init_db()
 
+# Laporan PDF dibuat di thread pool terpisah dari request; hasil laporan/ekspor disimpan per versi data
+app.config['REPORT_CACHE'] = ReportCache(
+    app.config['REPORT_CACHE_DIR'],
+    max_bytes=int(app.config['REPORT_CACHE_MAX_MB'] * 2**20)
+)
+app.config['REPORT_QUEUE'] = ReportQueue(
+    app.config['REPORT_DIR'],
+    workers=app.config['REPORT_WORKERS'],
+    ttl=timedelta(hours=app.config['REPORT_TTL_HOURS']),
+    cache=app.config['REPORT_CACHE']
+)
+
+# Simpan hasil klasifikasi di background jika write-behind aktif
+if app.config['DB_WRITE_BEHIND']:
+    writer = ClassificationWriter(
+        max_queue=app.config['DB_WRITE_BEHIND_QUEUE'],
+        batch_size=app.config['DB_WRITE_BEHIND_BATCH']
+    )
+    app.config['CLASSIFICATION_WRITER'] = writer
+    # Pastikan antrian dikosongkan sebelum proses berhenti
+    atexit.register(writer.flush)
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", debug=True)
\ No newline at end of file
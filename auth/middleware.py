@@ -1,4 +1,5 @@
-from flask import session, redirect, url_for, flash, request
+import hmac
+from flask import session, redirect, url_for, flash, request, jsonify, current_app, g
 from functools import wraps
 
 def login_required(f):
@@ -18,3 +19,35 @@ def admin_required(f):
             return redirect(url_for('login', next=request.url))
         return f(*args, **kwargs)
     return decorated_function
+
+def request_api_token():
+    # Authorization: Bearer <token>, atau X-API-Key: <token>
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    return request.headers.get('X-API-Key')
+
+def valid_api_token(token):
+    return any(hmac.compare_digest(token.encode(), known.encode())
+               for known in current_app.config.get('API_TOKENS', ()))
+
+def api_auth_required(f):
+    """For API routes exempt from CSRFProtect: an API token (intake systems, scripts), or a
+    logged-in browser session that also sends the CSRF token."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = request_api_token()
+        if token:
+            if not valid_api_token(token):
+                return jsonify({'error': 'Invalid API token'}), 401
+            g.api_client = True
+            return f(*args, **kwargs)
+        if 'user_id' not in session:
+            return jsonify({'error': 'Authentication required: send an API token '
+                                     '(Authorization: Bearer <token>) or log in'}), 401
+        # Cookie sesi ikut terkirim dari form situs lain, jadi jalur browser tetap wajib token CSRF
+        csrf = current_app.extensions.get('csrf')
+        if csrf is not None and current_app.config.get('WTF_CSRF_ENABLED', True):
+            csrf.protect()
+        return f(*args, **kwargs)
+    return decorated_function
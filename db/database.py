@@ -1,11 +1,255 @@
+import os
 import sqlite3
+from flask import g, has_app_context
 from werkzeug.security import generate_password_hash
 import json
 from datetime import datetime
+from db.stats import STATS_TABLES, install_stats, drop_stats_triggers, rebuild_stats
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'database.db')
+
+# Dijalankan di setiap koneksi baru; journal_mode=WAL sendiri persisten dan diset di init_db
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -20000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+class RequestConnection(sqlite3.Connection):
+    """Connection shared by everything in one request; close() is a no-op until teardown."""
+
+    def close(self):
+        pass
+
+    def really_close(self):
+        if self.in_transaction:
+            self.rollback()
+        super().close()
+
+
+def set_database_path(path):
+    global DATABASE_PATH
+    DATABASE_PATH = path
+
+def connect(factory=sqlite3.Connection):
+    conn = sqlite3.connect(DATABASE_PATH, timeout=5.0, factory=factory)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def close_request_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.really_close()
+
+def init_app(app):
+    app.config.setdefault('DATABASE', DATABASE_PATH)
+    set_database_path(app.config['DATABASE'])
+    app.teardown_appcontext(close_request_connection)
+
+# Index untuk query yang paling sering: riwayat per user, filter tanggal, dashboard.
+SCHEMA_INDEXES = (
+    ('idx_classifications_user_created', 'classifications (user_id, created_at)'),
+    ('idx_classifications_created', 'classifications (created_at)'),
+    ('idx_users_role', 'users (role)'),
+)
+
+# Hasil rf disimpan langsung di classifications (migrasi 3); database lama juga belum punya model_version
+RESULT_COLUMNS = (
+    ('model_version', 'TEXT'),
+    ('rf_result', 'TEXT'),
+    ('rf_keterangan', 'TEXT'),
+    ('rf_probability', 'REAL'),
+)
+BACKFILL_CHUNK_ROWS = 5000
+
+# Pengganti tabel rf_results lama agar query/kode lama tetap jalan selama rollout
+RF_RESULTS_VIEW = (
+    """CREATE VIEW IF NOT EXISTS rf_results AS
+        SELECT id, id AS classification_id, rf_result, rf_keterangan, created_at
+        FROM classifications
+        WHERE rf_result IS NOT NULL""",
+    """CREATE TRIGGER IF NOT EXISTS rf_results_insert INSTEAD OF INSERT ON rf_results
+    BEGIN
+        UPDATE classifications SET rf_result = NEW.rf_result, rf_keterangan = NEW.rf_keterangan
+        WHERE id = NEW.classification_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS rf_results_update INSTEAD OF UPDATE ON rf_results
+    BEGIN
+        UPDATE classifications SET rf_result = NEW.rf_result, rf_keterangan = NEW.rf_keterangan
+        WHERE id = OLD.classification_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS rf_results_delete INSTEAD OF DELETE ON rf_results
+    BEGIN
+        UPDATE classifications SET rf_result = NULL, rf_keterangan = NULL, rf_probability = NULL
+        WHERE id = OLD.classification_id;
+    END""",
+)
+
+CLASSIFICATION_SELECT = """SELECT p.*, u.username, u.full_name \
+                FROM classifications p \
+                JOIN users u ON p.user_id = u.id \
+                """
+
+HAS_CLASSIFICATIONS = 'SELECT 1 FROM classifications LIMIT 1'
+HAS_USER_CLASSIFICATIONS = 'SELECT 1 FROM classifications WHERE user_id = ? LIMIT 1'
+
+RECENT_CLASSIFICATIONS = CLASSIFICATION_SELECT + "ORDER BY p.created_at DESC LIMIT 5"
+
+def _add_indexes(conn):
+    for name, definition in SCHEMA_INDEXES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+    conn.execute('ANALYZE')
+
+def _add_stats_tables(conn):
+    for statement in STATS_TABLES:
+        conn.execute(statement)
+
+def _object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row is not None else None
+
+def _copy_results(conn, after_id, up_to_id=None):
+    query = """UPDATE classifications SET (rf_result, rf_keterangan) = (
+                SELECT r.rf_result, r.rf_keterangan FROM rf_results r
+                WHERE r.classification_id = classifications.id
+                ORDER BY r.id DESC LIMIT 1)
+            WHERE rf_result IS NULL AND id > ?"""
+    params = (after_id,)
+    if up_to_id is not None:
+        query += " AND id <= ?"
+        params += (up_to_id,)
+    conn.execute(query, params)
+
+def _denormalize_results(conn):
+    """Move rf_results into classifications without holding the write lock for the whole copy.
+
+    Columns are added and committed first, existing rows are copied in short transactions,
+    and only the rows written meanwhile are copied in the final transaction that swaps
+    rf_results for a view. Safe to re-run after an interruption.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(classifications)")]
+    for name, column_type in RESULT_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE classifications ADD COLUMN {name} {column_type}")
+    if _object_type(conn, 'rf_results') != 'table':
+        # Sudah dimigrasi, atau database baru tanpa tabel lama: cukup pastikan view-nya ada
+        for statement in RF_RESULTS_VIEW:
+            conn.execute(statement)
+        return
+    # Backfill mencari hasil per classification; tanpa index ini setiap baris memindai rf_results
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_rf_results_classification ON rf_results (classification_id)')
+    conn.commit()
+
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM classifications').fetchone()[0]
+    for low in range(0, last_id, BACKFILL_CHUNK_ROWS):
+        conn.execute('BEGIN IMMEDIATE')
+        _copy_results(conn, low, low + BACKFILL_CHUNK_ROWS)
+        conn.commit()
+
+    conn.execute('BEGIN IMMEDIATE')
+    # Lock dilepas di antara chunk, jadi proses lain bisa sudah menyelesaikan langkah ini
+    if schema_version(conn) >= 3 or _object_type(conn, 'rf_results') == 'view':
+        return
+    if _object_type(conn, 'rf_results_legacy') is not None:
+        raise RuntimeError('rf_results_legacy already exists while rf_results is still a table; '
+                           'drop or rename one of them before migrating')
+    _copy_results(conn, last_id)
+    drop_stats_triggers(conn)
+    # Tabel lama disimpan untuk rollback; trigger/index ikut pindah bersama tabelnya
+    conn.execute('ALTER TABLE rf_results RENAME TO rf_results_legacy')
+    for statement in RF_RESULTS_VIEW:
+        conn.execute(statement)
+
+def _install_stats(conn):
+    install_stats(conn)
+    rebuild_stats(conn)
+
+def _add_report_jobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            file_path TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_report_jobs_user_kind ON report_jobs (user_id, kind, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_report_jobs_expires ON report_jobs (expires_at)')
+
+def _add_report_cache(conn):
+    # Trigger revision untuk versi data cache laporan, dan kunci cache per job
+    install_stats(conn)
+    conn.execute("INSERT OR IGNORE INTO stats_counters (name, value) VALUES ('revision', 0)")
+    conn.execute('ALTER TABLE report_jobs ADD COLUMN cache_key TEXT')
+
+def _add_user_revision_triggers(conn):
+    # install_stats membuat ulang semua trigger, termasuk revision untuk insert/delete users
+    install_stats(conn)
+
+# (versi, langkah). Setiap langkah dijalankan di dalam BEGIN IMMEDIATE dan user_version
+# dinaikkan di transaksi yang sama; langkah boleh commit di tengah asalkan bisa diulang.
+MIGRATIONS = (
+    (1, _add_indexes),
+    (2, _add_stats_tables),
+    (3, _denormalize_results),
+    (4, _install_stats),
+    (5, _add_report_jobs),
+    (6, _add_report_cache),
+    (7, _add_user_revision_triggers),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Apply pending migrations. Several processes may call this at once; the write lock
+    is taken before the version is read, so each step runs once. A step that commits
+    part-way may be entered twice and re-checks the schema before its final change."""
+    if conn.in_transaction:
+        conn.commit()
+    for version, step in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn)
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            # Langkah yang commit di tengah bisa disusul proses lain; versi tidak boleh turun
+            if schema_version(conn) < version:
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+# Path database yang skemanya sudah diperiksa di proses ini
+_initialized_paths = set()
 
 def init_db():
-    conn = sqlite3.connect('database.db')
+    """Create/migrate the schema; runs once per process and database path."""
+    if DATABASE_PATH in _initialized_paths:
+        return
+    conn = connect()
+    conn.execute('PRAGMA journal_mode = WAL')
     cursor = conn.cursor()
+    fresh = _object_type(conn, 'classifications') is None
 
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -34,75 +278,80 @@ def init_db():
             exerciseangina TEXT NOT NULL,
             oldpeak REAL NOT NULL,
             stslope TEXT NOT NULL,
+            model_version TEXT,
+            rf_result TEXT,
+            rf_keterangan TEXT,
+            rf_probability REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
 
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rf_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            classification_id INTEGER NOT NULL,
-            rf_result TEXT NOT NULL,
-            rf_keterangan TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (classification_id) REFERENCES classifications (id)
-        )
-    ''')
+    # Database baru langsung memakai skema akhir: hasil di classifications, rf_results hanya view.
+    # Database lama tetap punya tabel rf_results sampai migrasi 3 memindahkannya.
+    if fresh:
+        for statement in RF_RESULTS_VIEW:
+            cursor.execute(statement)
+
+    migrate(conn)
 
     # Buat admin default
     cursor.execute("SELECT * FROM users WHERE role='admin'")
     if not cursor.fetchone():
         cursor.execute(
-            "INSERT INTO users (username, email, password, full_name, role) VALUES (?, ?, ?, ?, ?)",
+            "INSERT OR IGNORE INTO users (username, email, password, full_name, role) VALUES (?, ?, ?, ?, ?)",
             ('admin', 'admin@example.com', generate_password_hash('admin123'), 'Admin User', 'admin')
         )
 
     conn.commit()
     conn.close()
+    _initialized_paths.add(DATABASE_PATH)
 
 def get_db_connection():
-    conn = sqlite3.connect('database.db')
-    conn.row_factory = sqlite3.Row
+    """One connection per request (kept in flask.g), or a fresh one outside a request."""
+    if not has_app_context():
+        return connect()
+    conn = g.get('db_conn')
+    if conn is None:
+        conn = g.db_conn = connect(RequestConnection)
     return conn
 
-def save_classification(user_id, classification_data, rf_result, rf_keterangan):
+INSERT_CLASSIFICATION = """INSERT INTO classifications (
+            user_id, age, sex, chestpaintype, restingbp, cholesterol,
+            fastingbs, restingecg, maxhr, exerciseangina, oldpeak, stslope,
+            model_version, rf_result, rf_keterangan, rf_probability
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+def _classification_values(user_id, classification_data, rf_result, rf_keterangan, model_version, rf_probability):
+    return (
+        user_id,
+        classification_data['age'],
+        classification_data['sex'],
+        classification_data['chestpaintype'],
+        classification_data['restingbp'],
+        classification_data['cholesterol'],
+        classification_data['fastingbs'],
+        classification_data['restingecg'],
+        classification_data['maxhr'],
+        classification_data['exerciseangina'],
+        classification_data['oldpeak'],
+        classification_data['stslope'],
+        model_version,
+        rf_result,
+        rf_keterangan,
+        rf_probability
+    )
+
+def _insert_classification(conn, user_id, classification_data, rf_result, rf_keterangan, model_version=None,
+                           rf_probability=None):
+    cursor = conn.execute(INSERT_CLASSIFICATION, _classification_values(
+        user_id, classification_data, rf_result, rf_keterangan, model_version, rf_probability))
+    return cursor.lastrowid
+
+def save_classification(user_id, classification_data, rf_result, rf_keterangan, model_version=None, rf_probability=None):
     conn = get_db_connection()
     try:
-        # Insert into classifications table
-        cursor = conn.execute(
-            """INSERT INTO classifications (
-                user_id, age, sex, chestpaintype, restingbp, cholesterol,
-                fastingbs, restingecg, maxhr, exerciseangina, oldpeak, stslope
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                user_id,
-                classification_data['age'],
-                classification_data['sex'],
-                classification_data['chestpaintype'],
-                classification_data['restingbp'],
-                classification_data['cholesterol'],
-                classification_data['fastingbs'],
-                classification_data['restingecg'],
-                classification_data['maxhr'],
-                classification_data['exerciseangina'],
-                classification_data['oldpeak'],
-                classification_data['stslope']
-            )
-        )
-        classification_id = cursor.lastrowid
-
-        # Insert into rf_results table
-        conn.execute(
-            """INSERT INTO rf_results (
-                classification_id, rf_result, rf_keterangan
-            ) VALUES (?, ?, ?)""",
-            (
-                classification_id,
-                rf_result,
-                rf_keterangan
-            )
-        )
+        _insert_classification(conn, user_id, classification_data, rf_result, rf_keterangan, model_version, rf_probability)
         conn.commit()
         return True
     except Exception as e:
@@ -111,37 +360,142 @@ def save_classification(user_id, classification_data, rf_result, rf_keterangan):
     finally:
         conn.close()
 
+def insert_classifications_batch(conn, rows):
+    """Insert many (user_id, classification_data, rf_result, rf_keterangan, model_version, rf_probability)
+    rows with one executemany call. The caller commits."""
+    if not rows:
+        return
+    conn.executemany(INSERT_CLASSIFICATION, [_classification_values(*row) for row in rows])
+
+def save_classifications(user_id, items, model_version=None):
+    """Save many (classification_data, rf_result, rf_keterangan, rf_probability) tuples in one transaction."""
+    conn = get_db_connection()
+    try:
+        insert_classifications_batch(conn, [
+            (user_id, classification_data, rf_result, rf_keterangan, model_version, rf_probability)
+            for classification_data, rf_result, rf_keterangan, rf_probability in items
+        ])
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Error saving classifications: {e}")
+        return False
+    finally:
+        conn.close()
+
+# Kolom yang boleh dipakai untuk sorting/pencarian di tabel server-side
+CLASSIFICATION_SORT_COLUMNS = {
+    'created_at': 'p.created_at',
+    'full_name': 'u.full_name',
+    'age': 'p.age',
+    'rf_result': 'p.rf_result',
+}
+CLASSIFICATION_SEARCH_COLUMNS = ('u.full_name', 'u.username', 'p.created_at', 'p.rf_result', 'p.rf_keterangan')
+
+def classification_filters(user_id=None, start_date=None, end_date=None, search=None):
+    params = []
+    conditions = []
+    if user_id:
+        conditions.append("p.user_id = ?")
+        params.append(user_id)
+    # Bandingkan kolom mentah dengan batas tanggal, bukan DATE(kolom), supaya index terpakai
+    if start_date:
+        conditions.append("p.created_at >= DATE(?)")
+        params.append(start_date)
+    if end_date:
+        conditions.append("p.created_at < DATE(?, '+1 day')")
+        params.append(end_date)
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in CLASSIFICATION_SEARCH_COLUMNS) + ")")
+        params.extend([pattern] * len(CLASSIFICATION_SEARCH_COLUMNS))
+    return conditions, params
+
+def _where(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+def classifications_query(user_id=None, start_date=None, end_date=None):
+    conditions, params = classification_filters(user_id, start_date, end_date)
+    query = CLASSIFICATION_SELECT + _where(conditions) + " ORDER BY p.created_at DESC"
+    return query, tuple(params)
+
+def classifications_page_query(user_id=None, start_date=None, end_date=None, search=None,
+                               order_by='created_at', descending=True, limit=25, offset=0, cursor=None):
+    """One page of classifications ordered by (order_by, id).
+
+    With order_by='created_at' and a cursor (created_at, id) of the last row of the previous page,
+    the page is found by seeking the index (keyset) instead of skipping `offset` rows.
+    """
+    conditions, params = classification_filters(user_id, start_date, end_date, search)
+    direction = 'DESC' if descending else 'ASC'
+    if cursor is not None and order_by == 'created_at':
+        created_at, last_id = cursor
+        op = '<' if descending else '>'
+        # Suku pertama memberi batas range untuk index, sisanya memutus seri created_at yang sama
+        conditions.append(f"p.created_at {op}= ? AND (p.created_at {op} ? OR p.id {op} ?)")
+        params.extend([created_at, created_at, last_id])
+        offset = 0
+    column = CLASSIFICATION_SORT_COLUMNS[order_by]
+    query = (CLASSIFICATION_SELECT + _where(conditions) +
+             f" ORDER BY {column} {direction}, p.id {direction} LIMIT ? OFFSET ?")
+    return query, tuple(params) + (limit, offset)
+
+def count_classifications_query(user_id=None, start_date=None, end_date=None, search=None):
+    conditions, params = classification_filters(user_id, start_date, end_date, search)
+    # users hanya perlu di-join untuk pencarian nama
+    join_users = "JOIN users u ON p.user_id = u.id " if search else ""
+    query = "SELECT COUNT(*) FROM classifications p " + join_users + _where(conditions)
+    return query, tuple(params)
+
+# Kolom input yang diekspor admin (urutan = urutan kolom file)
+EXPORT_COLUMNS = ('age', 'sex', 'chestpaintype', 'restingbp', 'cholesterol', 'fastingbs',
+                  'restingecg', 'maxhr', 'exerciseangina', 'oldpeak', 'stslope')
+
+def export_query(user_id=None, start_date=None, end_date=None):
+    conditions, params = classification_filters(user_id, start_date, end_date)
+    query = ("SELECT " + ", ".join(f"p.{column}" for column in EXPORT_COLUMNS) +
+             " FROM classifications p" + _where(conditions) + " ORDER BY p.created_at DESC, p.id DESC")
+    return query, tuple(params)
+
 def get_user_classifications(user_id=None, start_date=None, end_date=None):
     conn = get_db_connection()
     try:
-        query = """SELECT p.*, u.username, u.full_name, r.rf_result, r.rf_keterangan, r.created_at as rf_created_at \
-                FROM classifications p \
-                JOIN users u ON p.user_id = u.id \
-                JOIN rf_results r ON p.id = r.classification_id \
-                """
-        params = []
-        conditions = []
-        if user_id:
-            conditions.append("p.user_id = ?")
-            params.append(user_id)
-        if start_date:
-            conditions.append("DATE(p.created_at) >= DATE(?)")
-            params.append(start_date)
-        if end_date:
-            conditions.append("DATE(p.created_at) <= DATE(?)")
-            params.append(end_date)
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        query += " ORDER BY p.created_at DESC"
-        classifications = conn.execute(query, tuple(params)).fetchall()
+        query, params = classifications_query(user_id, start_date, end_date)
+        classifications = conn.execute(query, params).fetchall()
         return classifications
     finally:
         conn.close()
 
+def iter_user_classifications(user_id=None, start_date=None, end_date=None, fetch_rows=1000):
+    """Same rows as get_user_classifications, read fetch_rows at a time for large reports."""
+    conn = get_db_connection()
+    try:
+        query, params = classifications_query(user_id, start_date, end_date)
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_rows)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def count_user_classifications(user_id=None, start_date=None, end_date=None):
+    conn = get_db_connection()
+    try:
+        query, params = count_classifications_query(user_id, start_date, end_date)
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
 def delete_rf_result(id):
     conn = get_db_connection()
     try:
-        conn.execute('DELETE FROM rf_results WHERE classification_id = ?', (id,))
+        conn.execute(
+            'UPDATE classifications SET rf_result = NULL, rf_keterangan = NULL, rf_probability = NULL WHERE id = ?',
+            (id,)
+        )
         conn.commit()
         return True
     except Exception as e:
@@ -0,0 +1,73 @@
+"""EXPLAIN QUERY PLAN check for the hot classification queries.
+
+Run with ``python -m db.query_plans [database.db]``; exits non-zero when one of the
+queries below scans a table without an index or sorts through a temp b-tree.
+"""
+import sys
+
+from db import database
+from db.database import (connect, init_db, classifications_query, classifications_page_query,
+                         count_classifications_query, HAS_USER_CLASSIFICATIONS, RECENT_CLASSIFICATIONS)
+
+HOT_QUERIES = {
+    'history_exists': (HAS_USER_CLASSIFICATIONS, (1,)),
+    'history_page': classifications_page_query(1),
+    'history_page_keyset': classifications_page_query(1, cursor=('2024-01-31 10:00:00', 100)),
+    'history_count': count_classifications_query(1),
+    'admin_page_keyset': classifications_page_query(cursor=('2024-01-31 10:00:00', 100)),
+    'admin_page_keyset_asc': classifications_page_query(descending=False, cursor=('2024-01-31 10:00:00', 100)),
+    'admin_page_by_date': classifications_page_query(None, '2024-01-01', '2024-01-31', offset=50),
+    'user_classifications': classifications_query(1),
+    'user_classifications_by_date': classifications_query(1, '2024-01-01', '2024-01-31'),
+    'classifications_by_date': classifications_query(None, '2024-01-01', '2024-01-31'),
+    'dashboard_recent': (RECENT_CLASSIFICATIONS, ()),
+    'classifications_all': classifications_query(),
+}
+
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+
+
+def plan_problems(details):
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN') and 'USING' not in detail:
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(conn, queries=None):
+    """Return {name: (plan details, problems)} for each query."""
+    queries = queries or HOT_QUERIES
+    report = {}
+    for name, (query, params) in queries.items():
+        details = query_plan(conn, query, params)
+        report[name] = (details, plan_problems(details))
+    return report
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        database.set_database_path(argv[0])
+    init_db()
+    conn = connect()
+    try:
+        report = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    failed = False
+    for name, (details, problems) in report.items():
+        print(f"{'FAIL' if problems else 'ok'}  {name}")
+        for detail in details:
+            print(f"      {detail}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
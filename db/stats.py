@@ -0,0 +1,230 @@
+"""Dashboard counters and daily rollups, kept up to date by triggers.
+
+The dashboard reads a handful of rows here instead of running COUNT(*) over the
+whole tables. Run ``python -m db.stats rebuild [database.db]`` to backfill or to
+repair the numbers after rows were changed with the triggers missing.
+"""
+import sys
+from datetime import timedelta
+
+COUNTERS = ('patients', 'classifications', 'high_risk', 'revision')
+
+STATS_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS stats_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS daily_stats (
+        day TEXT PRIMARY KEY,
+        classifications INTEGER NOT NULL DEFAULT 0,
+        high_risk INTEGER NOT NULL DEFAULT 0
+    )''',
+)
+
+# (x IS 'ya') bernilai 0/1, juga saat rf_result NULL
+STATS_TRIGGERS = {
+    'stats_users_insert': """CREATE TRIGGER stats_users_insert AFTER INSERT ON users
+    WHEN NEW.role = 'patient'
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'patients';
+    END""",
+    'stats_users_delete': """CREATE TRIGGER stats_users_delete AFTER DELETE ON users
+    WHEN OLD.role = 'patient'
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'patients';
+    END""",
+    'stats_users_role': """CREATE TRIGGER stats_users_role AFTER UPDATE OF role ON users
+    WHEN (OLD.role = 'patient') <> (NEW.role = 'patient')
+    BEGIN
+        UPDATE stats_counters SET value = value + (CASE WHEN NEW.role = 'patient' THEN 1 ELSE -1 END)
+        WHERE name = 'patients';
+    END""",
+    'stats_classifications_insert': """CREATE TRIGGER stats_classifications_insert AFTER INSERT ON classifications
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'classifications';
+        UPDATE stats_counters SET value = value + (NEW.rf_result IS 'ya') WHERE name = 'high_risk';
+        INSERT INTO daily_stats (day, classifications, high_risk)
+        VALUES (DATE(NEW.created_at), 1, NEW.rf_result IS 'ya')
+        ON CONFLICT(day) DO UPDATE SET classifications = classifications + 1,
+                                       high_risk = high_risk + excluded.high_risk;
+    END""",
+    'stats_classifications_delete': """CREATE TRIGGER stats_classifications_delete AFTER DELETE ON classifications
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'classifications';
+        UPDATE stats_counters SET value = value - (OLD.rf_result IS 'ya') WHERE name = 'high_risk';
+        UPDATE daily_stats SET classifications = classifications - 1, high_risk = high_risk - (OLD.rf_result IS 'ya')
+        WHERE day = DATE(OLD.created_at);
+    END""",
+    'stats_classifications_update': """CREATE TRIGGER stats_classifications_update
+    AFTER UPDATE OF rf_result, created_at ON classifications
+    WHEN (OLD.rf_result IS 'ya') <> (NEW.rf_result IS 'ya') OR DATE(OLD.created_at) IS NOT DATE(NEW.created_at)
+    BEGIN
+        UPDATE stats_counters SET value = value + (NEW.rf_result IS 'ya') - (OLD.rf_result IS 'ya')
+        WHERE name = 'high_risk';
+        UPDATE daily_stats SET classifications = classifications - 1, high_risk = high_risk - (OLD.rf_result IS 'ya')
+        WHERE day = DATE(OLD.created_at);
+        INSERT INTO daily_stats (day, classifications, high_risk)
+        VALUES (DATE(NEW.created_at), 1, NEW.rf_result IS 'ya')
+        ON CONFLICT(day) DO UPDATE SET classifications = classifications + 1,
+                                       high_risk = high_risk + excluded.high_risk;
+    END""",
+    # revision naik setiap kali isi laporan bisa berubah; dipakai sebagai versi data untuk cache laporan
+    'stats_revision_insert': """CREATE TRIGGER stats_revision_insert AFTER INSERT ON classifications
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+    'stats_revision_update': """CREATE TRIGGER stats_revision_update AFTER UPDATE ON classifications
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+    'stats_revision_delete': """CREATE TRIGGER stats_revision_delete AFTER DELETE ON classifications
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+    'stats_revision_users': """CREATE TRIGGER stats_revision_users AFTER UPDATE OF username, full_name ON users
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+    # Laporan join ke users; user yang dihapus (tanpa cascade) harus hilang dari laporan yang di-cache
+    'stats_revision_users_insert': """CREATE TRIGGER stats_revision_users_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+    'stats_revision_users_delete': """CREATE TRIGGER stats_revision_users_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'revision';
+    END""",
+}
+
+# Trigger versi sebelum hasil rf pindah ke classifications
+LEGACY_TRIGGERS = ('stats_classifications_day', 'stats_rf_results_insert', 'stats_rf_results_delete',
+                   'stats_rf_results_update')
+
+
+def drop_stats_triggers(conn):
+    for name in tuple(STATS_TRIGGERS) + LEGACY_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def install_stats(conn):
+    """(Re)create the stats tables and triggers. The caller commits."""
+    for statement in STATS_TABLES:
+        conn.execute(statement)
+    drop_stats_triggers(conn)
+    for statement in STATS_TRIGGERS.values():
+        conn.execute(statement)
+
+
+def rebuild_stats(conn):
+    """Recompute every counter and daily row from the base tables. The caller commits.
+
+    revision cannot be recomputed; it is carried over and bumped so cached reports are invalidated.
+    """
+    row = conn.execute("SELECT value FROM stats_counters WHERE name = 'revision'").fetchone()
+    revision = (row[0] if row else 0) + 1
+    conn.execute('DELETE FROM stats_counters')
+    conn.execute('DELETE FROM daily_stats')
+    conn.execute(
+        """INSERT INTO stats_counters (name, value) VALUES
+            ('patients', (SELECT COUNT(*) FROM users WHERE role = 'patient')),
+            ('classifications', (SELECT COUNT(*) FROM classifications)),
+            ('high_risk', (SELECT COUNT(*) FROM classifications WHERE rf_result = 'ya')),
+            ('revision', ?)""",
+        (revision,)
+    )
+    conn.execute(
+        """INSERT INTO daily_stats (day, classifications, high_risk)
+            SELECT DATE(created_at), COUNT(*), SUM(rf_result IS 'ya')
+            FROM classifications
+            GROUP BY DATE(created_at)"""
+    )
+
+
+def get_counters(conn):
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update((row[0], row[1]) for row in conn.execute('SELECT name, value FROM stats_counters'))
+    return values
+
+
+def data_version(conn):
+    """Token that changes whenever report contents may change: revision, max id and row count."""
+    row = conn.execute(
+        """SELECT (SELECT value FROM stats_counters WHERE name = 'revision'),
+                  (SELECT MAX(id) FROM classifications),
+                  (SELECT value FROM stats_counters WHERE name = 'classifications')"""
+    ).fetchone()
+    return f'{row[0] or 0}-{row[1] or 0}-{row[2] or 0}'
+
+
+def dashboard_counts(conn, day):
+    """Counters for the admin dashboard plus the number of classifications on `day` (YYYY-MM-DD)."""
+    counts = get_counters(conn)
+    row = conn.execute('SELECT classifications FROM daily_stats WHERE day = DATE(?)', (day,)).fetchone()
+    counts['today'] = row[0] if row else 0
+    return counts
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def trend_series(conn, period, end, points):
+    """`points` buckets of per-day or per-week (Monday-based) counts ending at `end` (a date).
+
+    Reads at most `points` days/weeks of rollup rows, so the cost does not grow with the table.
+    Missing buckets are returned as zero.
+    """
+    if period == 'week':
+        end = week_start(end)
+        start = end - timedelta(weeks=points - 1)
+        rows = conn.execute(
+            """SELECT DATE(day, 'weekday 0', '-6 days') AS bucket, SUM(classifications), SUM(high_risk)
+                FROM daily_stats
+                WHERE day >= ? AND day < ?
+                GROUP BY bucket""",
+            (start.isoformat(), (end + timedelta(weeks=1)).isoformat())
+        ).fetchall()
+        step = timedelta(weeks=1)
+    else:
+        start = end - timedelta(days=points - 1)
+        rows = conn.execute(
+            'SELECT day, classifications, high_risk FROM daily_stats WHERE day >= ? AND day <= ?',
+            (start.isoformat(), end.isoformat())
+        ).fetchall()
+        step = timedelta(days=1)
+
+    by_bucket = {row[0]: (row[1], row[2]) for row in rows}
+    series = []
+    bucket = start
+    while bucket <= end:
+        classifications, high_risk = by_bucket.get(bucket.isoformat(), (0, 0))
+        series.append({'date': bucket.isoformat(), 'classifications': classifications, 'high_risk': high_risk})
+        bucket += step
+    return series
+
+
+def main(argv=None):
+    from db import database
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] != 'rebuild':
+        print('usage: python -m db.stats rebuild [database.db]')
+        return 2
+    if len(argv) > 1:
+        database.set_database_path(argv[1])
+    database.init_db()
+    conn = database.connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        rebuild_stats(conn)
+        conn.commit()
+        counters = get_counters(conn)
+        days = conn.execute('SELECT COUNT(*) FROM daily_stats').fetchone()[0]
+    finally:
+        conn.close()
+    print(', '.join(f'{name}={value}' for name, value in counters.items()) + f', days={days}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import logging
+import os
+import queue
+import threading
+import time
+from db.database import get_db_connection, insert_classifications_batch
+from monitoring.metrics import Histogram
+
+
+class ClassificationWriter:
+    """Write-behind queue for classification results.
+
+    Requests enqueue ``(user_id, classification_data, rf_result, rf_keterangan,
+    model_version, rf_probability)`` rows; a background thread drains the bounded queue in
+    batches and writes each batch with executemany in a single transaction.
+    When the queue stays full for ``put_timeout`` seconds, ``submit`` returns
+    False and the caller writes synchronously instead (backpressure).
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, put_timeout=0.05):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.queue_depth = Histogram([0, 1, 10, 50, 100, 500, 1000, 5000, 10000])
+        self.batch_rows = Histogram([1, 2, 5, 10, 50, 100, 500, 1000])
+        self.flush_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 1000])
+        self.written = 0
+        self.rejected = 0
+        self.failed = 0
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Thread tidak ikut ter-fork (gunicorn --preload), jadi mulai per proses
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                self._thread = threading.Thread(target=self._run, name='classification-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, row):
+        self._ensure_started()
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+    def _drain(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            self.queue_depth.observe(self._queue.qsize())
+            self.batch_rows.observe(len(batch))
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        conn = get_db_connection()
+        try:
+            insert_classifications_batch(conn, batch)
+            conn.commit()
+            self.written += len(batch)
+        except Exception as e:
+            conn.rollback()
+            self.failed += len(batch)
+            logging.error(f"Error writing {len(batch)} queued classifications: {str(e)}")
+        finally:
+            conn.close()
+        self.flush_ms.observe((time.perf_counter() - start) * 1000)
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stats(self):
+        return {
+            'queue_size': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'max_queue': self.max_queue,
+            'written': self.written,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'queue_depth': self.queue_depth.snapshot(),
+            'batch_rows': self.batch_rows.snapshot(),
+            'flush_ms': self.flush_ms.snapshot(),
+            'flush_p99_ms': self.flush_ms.quantile(0.99),
+        }
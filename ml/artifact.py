@@ -0,0 +1,108 @@
+import json
+import os
+import numpy as np
+from ml.forest_engine import CompiledForest
+
+ARTIFACT_FORMAT = 1
+ENGINE_ARRAYS = ['feature', 'threshold', 'left', 'right', 'leaf_proba', 'roots', 'classes']
+
+
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def write_artifact(directory, arrays, meta):
+    """Write arrays as raw .npy buffers plus meta.json, replacing `directory` in one step."""
+    tmp_dir = directory + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    # Ganti direktori lama sekaligus agar worker tidak membaca artifact setengah jadi
+    if os.path.exists(directory):
+        old_dir = directory + '.old'
+        os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+    else:
+        os.replace(tmp_dir, directory)
+    return meta
+
+
+def read_arrays(directory, names, mmap=True):
+    mmap_mode = 'r' if mmap else None
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in names}
+
+
+def save_engine(engine, directory, source_path=None, preprocessor=None):
+    """Write the compiled forest as raw .npy buffers plus meta.json, ready to be memory-mapped.
+
+    `preprocessor` is the fitted Preprocessor as a dict, so the artifact can encode requests on its own.
+    """
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'max_depth': engine.max_depth,
+        'n_features': engine.n_features,
+        'n_trees': engine.n_trees,
+        'n_nodes': engine.n_nodes,
+        'source': source_fingerprint(source_path) if source_path else None,
+        'preprocessor': preprocessor,
+    }
+    return write_artifact(directory, {name: getattr(engine, name) for name in ENGINE_ARRAYS}, meta)
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, 'meta.json')) as f:
+        return json.load(f)
+
+
+def is_current(directory, source_path, artifact_format=ARTIFACT_FORMAT):
+    """True if the artifact exists and was exported from the current source pickle."""
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        return False
+    meta = read_meta(directory)
+    if meta.get('format') != artifact_format:
+        return False
+    if source_path is None or not os.path.exists(source_path):
+        return True
+    return meta.get('source') == source_fingerprint(source_path)
+
+
+def load_engine(directory, mmap=True):
+    """Open the artifact. With mmap=True all workers share the same physical pages."""
+    meta = read_meta(directory)
+    if meta.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported model artifact format: {meta.get('format')}")
+    arrays = read_arrays(directory, ENGINE_ARRAYS, mmap)
+    # classes kecil dan dipakai untuk .take(), cukup disalin ke memori biasa
+    arrays['classes'] = np.array(arrays['classes'])
+    return CompiledForest(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays)
+
+
+def memory_report():
+    """Resident memory of the current process, split into shared and private pages where available."""
+    report = {'pid': os.getpid()}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile', 'RssShmem'):
+                    report[key.lower() + '_kb'] = int(value.split()[0])
+    except OSError:
+        import resource
+        report['maxrss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return report
+    # Pss membagi halaman bersama secara proporsional antar proses yang memakainya
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Pss', 'Shared_Clean', 'Private_Dirty'):
+                    report[key.lower() + '_kb'] = int(value.split()[0])
+    except OSError:
+        pass
+    return report
@@ -0,0 +1,104 @@
+"""Compression stage: smaller variants of the trained forest and when one may replace it.
+
+Variants come from fewer trees, capped depth and cost-complexity pruning (``ccp_alpha``)
+and, optionally, from distillation: a small forest or a single tree trained on the big
+forest's labels for the training rows plus jittered copies of them. Every variant goes
+through the same CV folds, hold-out test and serving profile as the search, so its
+accuracy/F1 deltas are measured against the reference model on identical data.
+"""
+import numpy as np
+
+from ml.training import SEED, evaluate, make_forest
+
+TREE_COUNTS = (10, 25, 50)
+DEPTH_CAPS = (4, 6, 8)
+CCP_ALPHAS = (0.001, 0.003, 0.01)
+STUDENTS = {
+    'distill-forest': {'n_estimators': 10, 'max_depth': 6},
+    # Satu pohon tanpa bootstrap, tetap berbentuk RandomForest agar format serving sama
+    'distill-tree': {'n_estimators': 1, 'bootstrap': False, 'max_features': None, 'max_depth': 8},
+}
+DISTILL_COPIES = 5
+# Standar deviasi geseran, dalam satuan fitur terskala (StandardScaler)
+DISTILL_NOISE = 0.1
+
+
+def compression_candidates(base_params, distill=False):
+    """Variants of `base_params` that can only be smaller or shallower than the reference."""
+    n_estimators = base_params.get('n_estimators', 100)
+    max_depth = base_params.get('max_depth')
+    candidates = []
+    for count in TREE_COUNTS:
+        if count < n_estimators:
+            candidates.append({'name': f'trees={count}', 'params': dict(base_params, n_estimators=count)})
+    for cap in DEPTH_CAPS:
+        if max_depth is None or cap < max_depth:
+            candidates.append({'name': f'depth<={cap}', 'params': dict(base_params, max_depth=cap)})
+    for alpha in CCP_ALPHAS:
+        candidates.append({'name': f'ccp_alpha={alpha}', 'params': dict(base_params, ccp_alpha=alpha)})
+    if distill:
+        for name, student in STUDENTS.items():
+            candidates.append({'name': name, 'params': dict(student), 'teacher': dict(base_params)})
+    return candidates
+
+
+def distillation_set(teacher_params, X, y):
+    """Training rows plus jittered copies, all labelled by a teacher forest fitted on (X, y)."""
+    teacher = make_forest(teacher_params).fit(X, y)
+    rng = np.random.RandomState(SEED)
+    copies = np.repeat(X, DISTILL_COPIES, axis=0)
+    X_all = np.vstack([X, copies + rng.normal(scale=DISTILL_NOISE, size=copies.shape)])
+    return X_all, teacher.predict(X_all)
+
+
+def _delta(value, reference):
+    # Dibulatkan agar selisih floating point (mis. -1e-17) tidak tercetak sebagai -0.0000
+    return round(value - reference, 6) + 0.0
+
+
+def add_deltas(reference, candidates):
+    ref_serving = reference['serving']
+    for candidate in candidates:
+        serving = candidate['serving']
+        candidate['delta'] = {
+            'cv_accuracy': _delta(candidate['cv_accuracy'], reference['cv_accuracy']),
+            'cv_f1': _delta(candidate['cv_f1'], reference['cv_f1']),
+            'test_accuracy': _delta(candidate['test']['accuracy'], reference['test']['accuracy']),
+            'test_f1': _delta(candidate['test']['f1'], reference['test']['f1']),
+            'latency_ratio': round(serving['single_row_us'] / ref_serving['single_row_us'], 3),
+            'bytes_ratio': round(serving['engine_bytes'] / ref_serving['engine_bytes'], 3),
+        }
+    return candidates
+
+
+def compress(prepared, reference, workers=None, distill=False):
+    """Evaluate the compression variants of `reference` (a search candidate); fastest first."""
+    candidates = evaluate(prepared, compression_candidates(reference['params'], distill), workers)
+    add_deltas(reference, candidates)
+    candidates.sort(key=lambda c: (c['serving']['single_row_us'], c['serving']['engine_bytes']))
+    return candidates
+
+
+def select_promotion(reference, candidates, tolerance):
+    """Fastest variant whose CV accuracy and F1 drop by at most `tolerance` and that is smaller; or None."""
+    eligible = [c for c in candidates
+                if c['delta']['cv_accuracy'] >= -tolerance and c['delta']['cv_f1'] >= -tolerance
+                and c['serving']['engine_bytes'] < reference['serving']['engine_bytes']]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda c: (c['serving']['single_row_us'], c['serving']['engine_bytes']))
+
+
+def format_compression_report(reference, candidates):
+    lines = [f"{'variant':16} {'cv_acc':>7} {'d_acc':>7} {'cv_f1':>7} {'d_f1':>7} {'test_acc':>8} {'d_test':>7} "
+             f"{'us/row':>7} {'x lat':>6} {'engine KB':>9} {'x size':>6}"]
+    rows = [dict(reference, name='reference', delta=None)] + candidates
+    for c in rows:
+        d, s = c['delta'], c['serving']
+        deltas = (f"{d['cv_accuracy']:>+7.4f}", f"{d['cv_f1']:>+7.4f}", f"{d['test_accuracy']:>+7.4f}",
+                  f"{d['latency_ratio']:>6.2f}", f"{d['bytes_ratio']:>6.2f}") if d else ('-'.rjust(7),) * 3 + ('1.00'.rjust(6),) * 2
+        lines.append(
+            f"{c['name']:16} {c['cv_accuracy']:>7.4f} {deltas[0]} {c['cv_f1']:>7.4f} {deltas[1]} "
+            f"{c['test']['accuracy']:>8.4f} {deltas[2]} {s['single_row_us']:>7.1f} {deltas[3]} "
+            f"{s['engine_bytes'] / 1024:>9.0f} {deltas[4]}")
+    return '\n'.join(lines)
@@ -0,0 +1,171 @@
+"""heart.csv kept in memory as typed NumPy columns, with precomputed statistics.
+
+The file is parsed once and parsed again only when its mtime or size changes, so
+pages and APIs that show the dataset cost the same no matter how often they are hit.
+"""
+import csv
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from ml.preprocessing import TARGET_COLUMN, _numeric
+
+CATEGORICAL_COLUMNS = ('Sex', 'ChestPainType', 'RestingECG', 'ExerciseAngina', 'ST_Slope')
+HISTOGRAM_BINS = 10
+MAX_PREVIEW_ROWS = 100
+
+
+def _typed(name, values):
+    # Konversi yang sama dengan preprocessor; kolom bilangan bulat disimpan sebagai int32, selain itu float32
+    floats = _numeric(values)
+    if np.isnan(floats).any():
+        raise ValueError(f"column {name} has values that are not numbers")
+    if np.all(floats == np.round(floats)):
+        return floats.astype(np.int32)
+    return floats.astype(np.float32)
+
+
+def _plain(value):
+    # Skalar NumPy -> angka Python; float32 dibulatkan agar tampil seperti di CSV (1.2, bukan 1.2000000476837158)
+    value = value.item() if isinstance(value, np.generic) else value
+    return round(value, 4) if isinstance(value, float) else value
+
+
+def _histogram(values):
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {'edges': [_plain(edge) for edge in edges], 'counts': counts.tolist()}
+
+
+class Dataset:
+    """One immutable snapshot of the CSV: numeric arrays, categorical codes and their statistics."""
+
+    def __init__(self, columns, numeric, categorical, mtime):
+        self.columns = columns
+        self.numeric = numeric
+        # nama kolom -> (kode int8 per baris, daftar kategori)
+        self.categorical = categorical
+        self.mtime = mtime
+        first = columns[0]
+        self.rows = len(numeric[first]) if first in numeric else len(categorical[first][0])
+        self.stats = self._summarize()
+
+    @classmethod
+    def load(cls, path):
+        mtime = os.stat(path).st_mtime
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            columns = next(reader)
+            rows = [row for row in reader if row]
+        missing = [name for name in CATEGORICAL_COLUMNS + (TARGET_COLUMN,) if name not in columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        if not rows or any(len(row) != len(columns) for row in rows):
+            raise ValueError(f"{path} has no rows or rows with a wrong number of fields")
+        raw = list(zip(*rows))
+        numeric = {}
+        categorical = {}
+        for name, values in zip(columns, raw):
+            if name in CATEGORICAL_COLUMNS:
+                categories, codes = np.unique(np.array(values), return_inverse=True)
+                categorical[name] = (codes.astype(np.int8), tuple(str(c) for c in categories))
+            else:
+                numeric[name] = _typed(name, values)
+        return cls(columns, numeric, categorical, mtime)
+
+    def _summarize(self):
+        features = {}
+        for name in self.columns:
+            if name == TARGET_COLUMN:
+                continue
+            if name in self.numeric:
+                values = self.numeric[name]
+                features[name] = {
+                    'type': 'numeric',
+                    'min': _plain(values.min()),
+                    'max': _plain(values.max()),
+                    'mean': _plain(values.mean()),
+                    'std': _plain(values.std()),
+                    'median': _plain(np.median(values)),
+                    'zeros': int(np.count_nonzero(values == 0)),
+                    'histogram': _histogram(values),
+                }
+            else:
+                codes, categories = self.categorical[name]
+                counts = np.bincount(codes, minlength=len(categories))
+                features[name] = {
+                    'type': 'categorical',
+                    'counts': dict(zip(categories, counts.tolist())),
+                }
+
+        balance = {}
+        if TARGET_COLUMN in self.numeric:
+            target = self.numeric[TARGET_COLUMN]
+            labels, counts = np.unique(target, return_counts=True)
+            balance = {str(label): int(count) for label, count in zip(labels.tolist(), counts)}
+        return {
+            'rows': self.rows,
+            'columns': list(self.columns),
+            'class_balance': balance,
+            'positive_rate': round(balance.get('1', 0) / self.rows, 4) if self.rows else 0.0,
+            'features': features,
+        }
+
+    def preview(self, offset=0, limit=10):
+        """Rows [offset, offset + limit) as lists of original values, in column order."""
+        offset = max(offset, 0)
+        end = min(offset + max(min(limit, MAX_PREVIEW_ROWS), 0), self.rows)
+        if offset >= end:
+            return []
+        columns = []
+        for name in self.columns:
+            if name in self.numeric:
+                values = self.numeric[name][offset:end]
+                if values.dtype.kind == 'f':
+                    values = np.round(values.astype(np.float64), 4)
+                columns.append(values.tolist())
+            else:
+                codes, categories = self.categorical[name]
+                columns.append([categories[code] for code in codes[offset:end]])
+        return [list(row) for row in zip(*columns)]
+
+
+class DatasetService:
+    """Shared, lazily (re)loaded Dataset; the file is stat'ed at most every check_interval seconds."""
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._dataset = None
+        self._signature = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def get(self):
+        now = time.monotonic()
+        dataset = self._dataset
+        if dataset is not None and now - self._checked < self.check_interval:
+            return dataset
+        with self._lock:
+            if self._dataset is not None and now - self._checked < self.check_interval:
+                return self._dataset
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if signature != self._signature:
+                    # Dicatat dulu agar file rusak yang sama tidak diparse ulang di setiap pengecekan
+                    self._signature = signature
+                    self._dataset = Dataset.load(self.path)
+                    self.reloads += 1
+                    logging.info(f"Dataset {self.path} loaded: {self._dataset.rows} rows")
+            except Exception as e:
+                # Versi lama tetap dipakai kalau file sedang ditulis/rusak
+                if self._dataset is None:
+                    self._signature = None
+                    raise
+                logging.error(f"Reloading dataset {self.path} failed, keeping the previous one: {str(e)}")
+            return self._dataset
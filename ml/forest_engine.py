@@ -0,0 +1,163 @@
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class CompiledForest:
+    """Random Forest + StandardScaler flattened into contiguous NumPy node arrays.
+
+    The scaler is folded into the split thresholds, so rows are scored on the
+    raw (encoded, unscaled) feature matrix. Thresholds are chosen so that
+    ``x <= threshold`` gives exactly the same branch as sklearn's
+    ``float32((x - mean) / scale) <= tree_threshold``.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, classes, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, rf_model, scaler):
+        if getattr(rf_model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+        n_features = rf_model.n_features_in_
+        mean = np.zeros(n_features) if scaler.mean_ is None or not scaler.with_mean else scaler.mean_
+        scale = np.ones(n_features) if scaler.scale_ is None or not scaler.with_std else scaler.scale_
+
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for estimator in rf_model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            node_ids = np.arange(n)
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.intp)
+            # Daun menunjuk ke dirinya sendiri agar traversal tidak perlu masking
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            threshold = np.full(n, np.inf)
+            split = ~is_leaf
+            threshold[split] = _fold_thresholds(
+                tree.threshold[split], mean[feature[split]], scale[feature[split]])
+
+            # Sama dengan DecisionTreeClassifier.predict_proba: value dinormalisasi per node
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            proba = value / normalizer
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            probas.append(proba)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            leaf_proba=np.ascontiguousarray(np.concatenate(probas)),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(rf_model.classes_),
+            max_depth=max_depth,
+            n_features=n_features,
+        )
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        feature, threshold, left, right = self.feature, self.threshold, self.left, self.right
+        for _ in range(self.max_depth):
+            go_left = X[rows, feature[node]] <= threshold[node]
+            node = np.where(go_left, left[node], right[node])
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # cumsum menjumlahkan berurutan per pohon, persis seperti akumulasi di sklearn
+        proba = np.cumsum(self.leaf_proba[leaves], axis=1)[:, -1, :]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def verify(self, X, rf_model, scaler):
+        """Compare against the sklearn model on raw matrix X. Returns the number of mismatching rows."""
+        return sklearn_mismatches(self, X, rf_model, scaler)
+
+
+def sklearn_mismatches(engine, X, rf_model, scaler):
+    """Rows of raw matrix X where `engine` differs from scaler + sklearn forest in label or any probability bit."""
+    import pandas as pd
+    X = np.asarray(X, dtype=np.float64)
+    columns = getattr(scaler, 'feature_names_in_', None)
+    if columns is not None:
+        scaled = pd.DataFrame(scaler.transform(pd.DataFrame(X, columns=columns)), columns=columns)
+    else:
+        scaled = scaler.transform(X)
+    expected_proba = rf_model.predict_proba(scaled)
+    expected = rf_model.predict(scaled)
+    mismatched = (engine.predict(X) != expected) | np.any(engine.predict_proba(X) != expected_proba, axis=1)
+    return int(np.count_nonzero(mismatched))
+
+
+def _scaled_float32(x, mean, scale):
+    # Replika StandardScaler.transform (float64) lalu cast float32 seperti di sklearn tree
+    return ((x - mean) / scale).astype(np.float32)
+
+
+def _to_ordered(v):
+    # Petakan float64 ke int64 yang urutannya sama dengan urutan nilai float
+    bits = v.view(np.int64)
+    magnitude = bits & np.int64(0x7FFFFFFFFFFFFFFF)
+    return np.where(bits < 0, -magnitude, magnitude)
+
+
+def _from_ordered(o):
+    bits = np.where(o < 0, (-o) | np.int64(-0x8000000000000000), o)
+    return bits.view(np.float64)
+
+
+def _fold_thresholds(tree_threshold, mean, scale):
+    """Largest raw value v with float32((v - mean) / scale) <= tree_threshold, per node."""
+    guess = tree_threshold * scale + mean
+    width = np.maximum(np.maximum(np.abs(guess), np.abs(tree_threshold * scale)), 1.0) * 1e-4
+    lo = guess - width
+    hi = guess + width
+    if np.any(_scaled_float32(lo, mean, scale) > tree_threshold) or \
+            np.any(_scaled_float32(hi, mean, scale) <= tree_threshold):
+        raise ValueError("Could not bracket folded split thresholds")
+    # Bisection pada representasi integer: tepat dalam maksimal 64 iterasi
+    lo_o, hi_o = _to_ordered(lo), _to_ordered(hi)
+    while np.any(hi_o - lo_o > 1):
+        mid_o = lo_o + (hi_o - lo_o) // 2
+        ok = _scaled_float32(_from_ordered(mid_o), mean, scale) <= tree_threshold
+        lo_o = np.where(ok, mid_o, lo_o)
+        hi_o = np.where(ok, hi_o, mid_o)
+    return _from_ordered(lo_o)
@@ -0,0 +1,106 @@
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+from monitoring.metrics import Histogram
+
+
+class _Pending:
+    __slots__ = ('row', 'context', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, row, context):
+        self.row = row
+        self.context = context
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one vectorized model call.
+
+    The worker thread takes the first waiting row, then keeps collecting rows
+    until ``window_ms`` has passed or ``max_batch`` rows are gathered, and
+    scores them with one ``predict_fn(context, matrix)`` call per distinct
+    context (normally just one: the model bundle the requests were made with).
+    """
+
+    def __init__(self, predict_fn, window_ms=2.0, max_batch=64, timeout=5.0):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_depth = Histogram([0, 1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.latency_ms = Histogram([0.5, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000])
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Thread tidak ikut ter-fork (gunicorn --preload), jadi mulai per proses
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, row, context=None):
+        self._ensure_started()
+        pending = _Pending(row, context)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            raise TimeoutError("Timed out waiting for micro-batched prediction")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.queue_depth.observe(self._queue.qsize())
+            self.batch_size.observe(len(batch))
+            groups = {}
+            for pending in batch:
+                groups.setdefault(id(pending.context), []).append(pending)
+            for group in groups.values():
+                try:
+                    preds = self.predict_fn(group[0].context, np.vstack([p.row for p in group]))
+                    for pending, pred in zip(group, preds):
+                        pending.result = pred
+                except Exception as e:
+                    logging.error(f"Micro-batched prediction failed: {str(e)}")
+                    for pending in group:
+                        pending.error = e
+            now = time.perf_counter()
+            for pending in batch:
+                self.latency_ms.observe((now - pending.enqueued_at) * 1000)
+                pending.done.set()
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'queue_depth': self.queue_depth.snapshot(),
+            'batch_size': self.batch_size.snapshot(),
+            'latency_ms': self.latency_ms.snapshot(),
+            'latency_p99_ms': self.latency_ms.quantile(0.99),
+        }
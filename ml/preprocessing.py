@@ -0,0 +1,221 @@
+"""Feature preprocessing shared by training and serving.
+
+``Preprocessor`` is fitted once on the training CSV. It holds the feature column
+order, the category code tables (sorted, i.e. the codes ``LabelEncoder`` assigns),
+and the RestingBP/Cholesterol cleaning rules with the training medians used as fill
+values. It is saved as a plain dict in the model pickle and in the artifacts'
+meta.json, so a model always carries the encoding it was trained with.
+``compile()`` turns it into an ``Encoder`` that builds the model input matrix from a
+list of records or from columns with a few NumPy operations per column.
+"""
+import csv
+from functools import cached_property
+
+import numpy as np
+
+PREPROCESSOR_FORMAT = 1
+TARGET_COLUMN = 'HeartDisease'
+# Nilai di luar rentang atau yang dianggap kosong diganti median training
+CLEANING_RULES = {
+    'RestingBP': {'min': 40, 'max': 140},
+    'Cholesterol': {'missing': [0]},
+}
+# Di bawah ini per-baris (lookup dict) lebih cepat daripada beberapa operasi NumPy per kolom
+ROW_ENCODE_MAX_ROWS = 32
+
+
+def field_name(column):
+    # 'ST_Slope' -> 'stslope': nama field di form, JSON dan header CSV yang dinormalisasi
+    return column.lower().replace('_', '')
+
+
+def read_columns(csv_path):
+    """CSV file as {column: list of strings}, in file order."""
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row for row in reader if row]
+    return {name: list(values) for name, values in zip(header, zip(*rows))}
+
+
+def _numeric(values):
+    # Seperti pd.to_numeric(errors='coerce'): nilai yang bukan angka menjadi NaN
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+def _is_numeric(values):
+    try:
+        np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def apply_rule(values, rule):
+    """Copy of `values` with NaN wherever `rule` marks a value as invalid."""
+    values = np.array(values, dtype=np.float64)
+    invalid = np.zeros(len(values), dtype=bool)
+    if 'min' in rule:
+        invalid |= values < rule['min']
+    if 'max' in rule:
+        invalid |= values > rule['max']
+    for missing in rule.get('missing', ()):
+        invalid |= values == missing
+    values[invalid] = np.nan
+    return values
+
+
+def _invalid(value, rule):
+    # Versi skalar apply_rule; NaN juga dianggap tidak valid
+    return (value != value or value < rule.get('min', -np.inf) or value > rule.get('max', np.inf)
+            or value in rule.get('missing', ()))
+
+
+class Preprocessor:
+    """Fitted feature encoding: column order, category codes, cleaning rules and their fill values."""
+
+    def __init__(self, columns, categories, rules, fill):
+        self.columns = list(columns)
+        self.categories = {column: list(values) for column, values in categories.items()}
+        self.rules = {column: dict(rule) for column, rule in rules.items()}
+        # Median per kolom numerik: pengganti nilai yang dibersihkan, juga baris contoh
+        self.fill = {column: float(value) for column, value in fill.items()}
+
+    @classmethod
+    def fit(cls, data, target=TARGET_COLUMN, rules=CLEANING_RULES):
+        """Fit on {column: values}, e.g. read_columns('heart.csv'); the target column is left out."""
+        columns = [column for column in data if column != target]
+        categories = {}
+        fill = {}
+        for column in columns:
+            if column not in rules and not _is_numeric(data[column]):
+                categories[column] = sorted({str(value) for value in data[column]})
+                continue
+            values = _numeric(data[column])
+            if column in rules:
+                values = apply_rule(values, rules[column])
+            fill[column] = np.nanmedian(values)
+        return cls(columns, categories, {column: rules[column] for column in rules if column in columns}, fill)
+
+    def to_dict(self):
+        return {
+            'format': PREPROCESSOR_FORMAT,
+            'columns': self.columns,
+            'categories': self.categories,
+            'rules': self.rules,
+            'fill': self.fill,
+        }
+
+    @classmethod
+    def from_dict(cls, saved):
+        if saved.get('format') != PREPROCESSOR_FORMAT:
+            raise ValueError(f"Unsupported preprocessor format: {saved.get('format')}")
+        return cls(saved['columns'], saved['categories'], saved['rules'], saved['fill'])
+
+    @cached_property
+    def fields(self):
+        return [field_name(column) for column in self.columns]
+
+    @cached_property
+    def field_categories(self):
+        """{field: allowed values} for the categorical fields, in column order."""
+        return {field_name(column): self.categories[column] for column in self.columns if column in self.categories}
+
+    @cached_property
+    def numeric_fields(self):
+        return [field for field in self.fields if field not in self.field_categories]
+
+    def reference_record(self):
+        """A valid input record: the median of every numeric field and the first category of the others."""
+        return {field_name(column): self.categories[column][0] if column in self.categories else self.fill[column]
+                for column in self.columns}
+
+    def compile(self):
+        return Encoder(self)
+
+    def transform(self, data):
+        return self.compile().encode_columns(data)
+
+
+class Encoder:
+    """Preprocessor compiled for serving: records or columns -> raw (unscaled) feature matrix.
+
+    The matrix stays float64: the forest engines scale it and cast to float32 themselves,
+    the same order of operations as sklearn, which keeps their output bit-identical.
+    """
+
+    def __init__(self, preprocessor):
+        self.columns = list(preprocessor.columns)
+        self.fields = preprocessor.fields
+        self._steps = []
+        self._row_steps = []
+        for column, field in zip(self.columns, self.fields):
+            if column in preprocessor.categories:
+                categories = preprocessor.categories[column]
+                self._steps.append((column, field, np.array(categories, dtype=str), None, None))
+                self._row_steps.append((field, {value: code for code, value in enumerate(categories)}, None, None))
+            else:
+                rule, fill = preprocessor.rules.get(column), preprocessor.fill.get(column)
+                self._steps.append((column, field, None, rule, fill))
+                self._row_steps.append((field, None, rule, fill))
+
+    def encode_columns(self, data):
+        """{field or column name: sequence} -> (n, n_features) matrix. Raises ValueError on unknown values."""
+        matrix = None
+        for j, (column, field, table, rule, fill) in enumerate(self._steps):
+            values = data[field] if field in data else data[column]
+            if matrix is None:
+                matrix = np.empty((len(values), len(self._steps)))
+            if table is not None:
+                matrix[:, j] = self._codes(field, table, values)
+                continue
+            values = np.asarray(values, dtype=np.float64)
+            if rule is not None:
+                values = apply_rule(values, rule)
+                values[np.isnan(values)] = fill
+            matrix[:, j] = values
+        return matrix
+
+    def encode_records(self, records):
+        """List of validated records (lower-case field names) -> (n, n_features) matrix."""
+        if len(records) <= ROW_ENCODE_MAX_ROWS:
+            matrix = np.empty((len(records), len(self._row_steps)))
+            for i, record in enumerate(records):
+                matrix[i] = self._encode_row(record)
+            return matrix
+        return self.encode_columns({field: [record[field] for record in records] for field in self.fields})
+
+    def _encode_row(self, record):
+        row = []
+        for field, codes, rule, fill in self._row_steps:
+            value = record[field]
+            if codes is not None:
+                code = codes.get(value)
+                if code is None:
+                    raise ValueError(f"Invalid value for {field}: {value}. Must be one of {list(codes)}")
+                row.append(code)
+                continue
+            value = float(value)
+            if rule is not None and _invalid(value, rule):
+                value = fill
+            row.append(value)
+        return row
+
+    @staticmethod
+    def _codes(field, table, values):
+        # Tabel sudah terurut, jadi kodenya adalah posisi hasil searchsorted
+        values = np.asarray(values, dtype=str)
+        codes = np.minimum(np.searchsorted(table, values), len(table) - 1)
+        unknown = table[codes] != values
+        if unknown.any():
+            raise ValueError(f"Invalid value for {field}: {values[unknown][0]}. Must be one of {table.tolist()}")
+        return codes
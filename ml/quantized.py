@@ -0,0 +1,221 @@
+"""Quantized forest: the serving model in about a fifth of the compiled forest's memory.
+
+Per node it stores a uint8 feature id, uint16 (or uint32 for large forests) child
+indices, a float32 threshold and one leaf byte. The byte indexes a small table of
+the distinct leaf probability rows, so a pure leaf and an impure one cost the same.
+
+Thresholds stay in the scaler's output space instead of being folded into raw units.
+sklearn casts the scaled input to float32 and compares it with a float64 threshold,
+and for a float32 value ``v``, ``v <= t`` is the same as ``v <= t32`` when ``t32`` is
+the largest float32 not above ``t``. So with the scaled float32 input, float32
+thresholds are exact for every input, not only for the rows that were checked. Each
+threshold is checked against that bound when the forest is built, and
+``validation_sweep`` compares the result with sklearn bit for bit anyway.
+"""
+import numpy as np
+
+from ml.artifact import ENGINE_ARRAYS, read_arrays, read_meta, source_fingerprint, write_artifact
+from ml.forest_engine import TREE_LEAF, CompiledForest, _scaled_float32, sklearn_mismatches
+
+QUANTIZED_FORMAT = 'quantized-1'
+QUANTIZED_ARRAYS = ['feature', 'threshold', 'left', 'right', 'leaf', 'leaf_table', 'roots', 'classes',
+                    'mean', 'scale']
+# Baris acak tambahan di validation sweep, di luar baris referensi dan titik batas split
+SWEEP_RANDOM_ROWS = 2000
+
+
+def _index_dtype(n):
+    return np.uint16 if n <= np.iinfo(np.uint16).max else np.uint32
+
+
+def float32_thresholds(threshold):
+    """Largest float32 <= each float64 threshold, checked to split float32 inputs exactly like the original."""
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    lower = t32.astype(np.float64)
+    upper = np.nextafter(t32, np.float32(np.inf)).astype(np.float64)
+    # Tidak ada float32 di antara t32 dan threshold asli -> perbandingan float32 identik
+    if np.any(lower > threshold) or np.any(upper <= threshold):
+        raise ValueError("Split thresholds are not exactly representable for float32 inputs")
+    return t32
+
+
+class QuantizedForest:
+    """Random Forest + StandardScaler in compact node arrays; scores raw (encoded, unscaled) rows."""
+
+    def __init__(self, feature, threshold, left, right, leaf, leaf_table, roots, classes, mean, scale,
+                 max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf = leaf
+        self.leaf_table = leaf_table
+        self.roots = roots
+        self.classes = classes
+        self.mean = mean
+        self.scale = scale
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return int(sum(getattr(self, name).nbytes for name in QUANTIZED_ARRAYS))
+
+    @classmethod
+    def from_sklearn(cls, rf_model, scaler):
+        if getattr(rf_model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+        n_features = rf_model.n_features_in_
+        if n_features > np.iinfo(np.uint8).max:
+            raise ValueError(f"{n_features} features do not fit a uint8 feature id")
+        mean = np.zeros(n_features) if scaler.mean_ is None or not scaler.with_mean else scaler.mean_
+        scale = np.ones(n_features) if scaler.scale_ is None or not scaler.with_std else scaler.scale_
+
+        n_total = sum(estimator.tree_.node_count for estimator in rf_model.estimators_)
+        index_dtype = _index_dtype(n_total)
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for estimator in rf_model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            node_ids = np.arange(n)
+
+            # Daun menunjuk ke dirinya sendiri agar traversal tidak perlu masking
+            features.append(np.where(is_leaf, 0, tree.feature))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+
+            # Sama dengan DecisionTreeClassifier.predict_proba: value dinormalisasi per node
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            # Node internal tidak pernah dibaca sebagai daun; kodenya disamakan dengan daun pertama
+            proba = value / normalizer
+            proba[~is_leaf] = proba[is_leaf][0]
+            probas.append(proba)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        # Baris probabilitas yang berbeda jarang lebih dari 256 untuk daun kecil; kode 1 byte per node
+        leaf_table, leaf_codes = np.unique(np.concatenate(probas), axis=0, return_inverse=True)
+        leaf_dtype = np.uint8 if len(leaf_table) <= 256 else np.uint16
+        return cls(
+            feature=np.concatenate(features).astype(np.uint8),
+            threshold=float32_thresholds(np.concatenate(thresholds)),
+            left=np.concatenate(lefts).astype(index_dtype),
+            right=np.concatenate(rights).astype(index_dtype),
+            leaf=leaf_codes.reshape(-1).astype(leaf_dtype),
+            leaf_table=np.ascontiguousarray(leaf_table),
+            roots=np.asarray(roots, dtype=index_dtype),
+            classes=np.asarray(rf_model.classes_),
+            mean=np.asarray(mean, dtype=np.float64),
+            scale=np.asarray(scale, dtype=np.float64),
+            max_depth=max_depth,
+            n_features=n_features,
+        )
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        # Input diskalakan lalu di-cast float32, persis seperti yang dilihat pohon sklearn
+        Z = _scaled_float32(X, self.mean, self.scale).ravel()
+        row_offset = (np.arange(X.shape[0]) * self.n_features)[:, None]
+        # Indeks node dipakai sebagai intp; array uint16 sendiri hanya untuk penyimpanan
+        node = np.broadcast_to(self.roots.astype(np.intp), (X.shape[0], self.n_trees))
+        feature, threshold, left, right = self.feature, self.threshold, self.left, self.right
+        for _ in range(self.max_depth):
+            go_left = Z.take(row_offset + feature.take(node)) <= threshold.take(node)
+            node = np.where(go_left, left.take(node), right.take(node)).astype(np.intp)
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # cumsum menjumlahkan berurutan per pohon, persis seperti akumulasi di sklearn
+        proba = np.cumsum(self.leaf_table[self.leaf[leaves]], axis=1)[:, -1, :]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def verify(self, X, rf_model, scaler):
+        """Compare against the sklearn model on raw matrix X. Returns the number of mismatching rows."""
+        return sklearn_mismatches(self, X, rf_model, scaler)
+
+
+def validation_sweep(rf_model, scaler, X_reference, random_rows=SWEEP_RANDOM_ROWS, seed=42):
+    """Raw rows that probe every split: each threshold and the next value above it, plus random rows.
+
+    Boundary values come from the compiled forest's folded raw thresholds, i.e. the exact
+    points where a float32 rounding difference would flip a branch.
+    """
+    X_reference = np.asarray(X_reference, dtype=np.float64)
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+    split = np.isfinite(compiled.threshold)
+    pairs = np.unique(np.column_stack([compiled.feature[split], compiled.threshold[split]]), axis=0)
+    features = pairs[:, 0].astype(np.intp)
+    values = pairs[:, 1]
+    base = X_reference[np.arange(2 * len(pairs)) % len(X_reference)].copy()
+    base[np.arange(len(pairs)), features] = values
+    base[len(pairs) + np.arange(len(pairs)), features] = np.nextafter(values, np.inf)
+
+    rng = np.random.RandomState(seed)
+    low, high = X_reference.min(axis=0), X_reference.max(axis=0)
+    random = rng.uniform(low, high, size=(random_rows, X_reference.shape[1]))
+    return np.vstack([X_reference, base, random])
+
+
+def save_quantized(forest, directory, source_path=None, compiled_bytes=None, preprocessor=None):
+    meta = {
+        'format': QUANTIZED_FORMAT,
+        'max_depth': forest.max_depth,
+        'n_features': forest.n_features,
+        'n_trees': forest.n_trees,
+        'n_nodes': forest.n_nodes,
+        'leaf_codes': len(forest.leaf_table),
+        'dtypes': {name: str(getattr(forest, name).dtype) for name in QUANTIZED_ARRAYS},
+        'nbytes': forest.nbytes,
+        'compiled_nbytes': compiled_bytes,
+        'source': source_fingerprint(source_path) if source_path else None,
+        'preprocessor': preprocessor,
+    }
+    return write_artifact(directory, {name: getattr(forest, name) for name in QUANTIZED_ARRAYS}, meta)
+
+
+def load_quantized(directory, mmap=True):
+    meta = read_meta(directory)
+    if meta.get('format') != QUANTIZED_FORMAT:
+        raise ValueError(f"Unsupported quantized model format: {meta.get('format')}")
+    arrays = read_arrays(directory, QUANTIZED_ARRAYS, mmap)
+    # Array kecil yang dipakai per request cukup disalin ke memori biasa
+    for name in ('classes', 'mean', 'scale'):
+        arrays[name] = np.array(arrays[name])
+    return QuantizedForest(max_depth=meta['max_depth'], n_features=meta['n_features'], **arrays)
+
+
+def memory_comparison(forest, compiled):
+    """Bytes per worker of the model arrays: compiled forest vs quantized forest."""
+    compiled_bytes = int(sum(getattr(compiled, name).nbytes for name in ENGINE_ARRAYS))
+    return {
+        'compiled_bytes': compiled_bytes,
+        'quantized_bytes': forest.nbytes,
+        'bytes_per_node': round(forest.nbytes / forest.n_nodes, 2),
+        'compiled_bytes_per_node': round(compiled_bytes / compiled.n_nodes, 2),
+        'reduction': round(compiled_bytes / forest.nbytes, 2),
+    }
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+REGISTRY_DIR = 'models/registry'
+MANIFEST = 'manifest.json'
+MODEL_FILE = 'models_and_scaler_smoteenn.pkl'
+ENGINE_SUBDIR = 'rf_engine'
+QUANTIZED_SUBDIR = 'rf_quantized'
+
+
+class ModelRegistry:
+    """Directory of versioned model artifacts plus a manifest naming the current version.
+
+    Layout::
+
+        models/registry/manifest.json
+        models/registry/<version>/models_and_scaler_smoteenn.pkl
+        models/registry/<version>/rf_engine/...
+        models/registry/<version>/rf_quantized/...
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self):
+        if not self.exists():
+            return {'current': None, 'versions': []}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        # os.replace atomik: pembaca selalu melihat manifest lama atau baru, tidak setengah
+        os.replace(tmp_path, self.manifest_path)
+
+    def manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def current_version(self):
+        return self.read_manifest().get('current')
+
+    def versions(self):
+        return self.read_manifest().get('versions', [])
+
+    def version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def model_path(self, version):
+        return os.path.join(self.version_dir(version), MODEL_FILE)
+
+    def engine_dir(self, version):
+        return os.path.join(self.version_dir(version), ENGINE_SUBDIR)
+
+    def quantized_dir(self, version):
+        return os.path.join(self.version_dir(version), QUANTIZED_SUBDIR)
+
+    def new_version(self):
+        version = datetime.now().strftime('v%Y%m%d-%H%M%S')
+        existing = {v['version'] for v in self.versions()}
+        suffix = 1
+        candidate = version
+        while candidate in existing or os.path.exists(self.version_dir(candidate)):
+            suffix += 1
+            candidate = f'{version}-{suffix}'
+        return candidate
+
+    def publish(self, model_path, engine_dir=None, metrics=None, make_current=True, quantized_dir=None):
+        """Copy a trained model (and its compiled and quantized artifacts) into a new registry version."""
+        version = self.new_version()
+        target = self.version_dir(version)
+        os.makedirs(target)
+        shutil.copy2(model_path, self.model_path(version))
+        if engine_dir and os.path.exists(engine_dir):
+            shutil.copytree(engine_dir, self.engine_dir(version))
+        if quantized_dir and os.path.exists(quantized_dir):
+            shutil.copytree(quantized_dir, self.quantized_dir(version))
+        manifest = self.read_manifest()
+        manifest.setdefault('versions', []).append({
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'metrics': metrics or {},
+        })
+        if make_current:
+            manifest['current'] = version
+        self._write_manifest(manifest)
+        return version
+
+    def set_current(self, version):
+        manifest = self.read_manifest()
+        if version not in {v['version'] for v in manifest.get('versions', [])}:
+            raise KeyError(f"Unknown model version: {version}")
+        manifest['current'] = version
+        self._write_manifest(manifest)
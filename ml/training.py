@@ -0,0 +1,306 @@
+"""Training pipeline: cached data preparation and a parallel cross-validated search.
+
+The cleaned/encoded dataset, the hold-out split and every fold's SMOTEENN resample
+are stored as ``.npz`` files named by a sha256 of their inputs (heart.csv bytes, the
+fitted preprocessor with its cleaning rules, split and resampling parameters), so a
+rerun only recomputes what changed. Candidates are scored with stratified k-fold CV
+in a process pool, refit on the hold-out training set and measured the way they are
+served (compiled forest latency and artifact size).
+"""
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+import uuid
+import warnings
+from multiprocessing import Pool
+
+import numpy as np
+
+from ml.preprocessing import TARGET_COLUMN, Preprocessor, read_columns
+
+SEED = 42
+TEST_SIZE = 0.2
+SMOTEENN_PARAMS = {'sampling_strategy': 0.96, 'random_state': SEED}
+DEFAULT_CACHE_DIR = os.path.join('models', 'cache')
+DEFAULT_FOLDS = 5
+# Grid default; mencakup model produksi sebelumnya (100 pohon, max_depth 40, min_samples_split 4)
+DEFAULT_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, 20, 40],
+    'min_samples_split': [2, 4],
+}
+RANK_KEYS = {
+    'f1': ('cv_f1', 'cv_accuracy'),
+    'accuracy': ('cv_accuracy', 'cv_f1'),
+}
+LATENCY_REPEATS = 200
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(*parts):
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def cached_arrays(cache_dir, key, build):
+    """Arrays stored under `key`, computed by build() and written on the first call."""
+    path = os.path.join(cache_dir, f'{key}.npz')
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as data:
+            return dict(data), path
+    arrays = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    # Tulis ke file sementara dulu agar proses lain tidak membaca cache setengah jadi
+    partial = f'{path}.{uuid.uuid4().hex}.npz'
+    np.savez(partial, **arrays)
+    os.replace(partial, path)
+    return arrays, path
+
+
+def clean_dataset(data, preprocessor):
+    """Encode categoricals (alphabetical codes) and repair RestingBP/Cholesterol with the served preprocessor."""
+    return {
+        'X': preprocessor.transform(data),
+        'y': np.asarray(data[TARGET_COLUMN], dtype=np.int64),
+        'columns': np.array(preprocessor.columns, dtype=str),
+    }
+
+
+def resample(X_train, y_train, X_valid):
+    """Scale on the training part only, then SMOTEENN it; the validation part is only scaled."""
+    from sklearn.preprocessing import StandardScaler
+    from imblearn.combine import SMOTEENN
+
+    scaler = StandardScaler().fit(X_train)
+    X_res, y_res = SMOTEENN(**SMOTEENN_PARAMS).fit_resample(scaler.transform(X_train), y_train)
+    return {
+        'X_res': np.asarray(X_res, dtype=np.float64),
+        'y_res': np.asarray(y_res),
+        'X_valid': scaler.transform(X_valid),
+    }
+
+
+class PreparedData:
+    """Cleaned dataset, hold-out split and CV folds, each loaded from or written to the cache."""
+
+    def __init__(self, csv_path, cache_dir=DEFAULT_CACHE_DIR, folds=DEFAULT_FOLDS):
+        from sklearn.model_selection import StratifiedKFold, train_test_split
+
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        data = read_columns(csv_path)
+        # Di-fit sekali: dipakai untuk dataset ini dan disimpan bersama model yang dipilih. Isinya (aturan
+        # pembersihan, median, kode kategori) ikut di kunci cache, jadi aturan yang berubah tidak memakai npz lama
+        self.preprocessor = Preprocessor.fit(data, TARGET_COLUMN)
+        self.dataset_key = content_hash('dataset', file_hash(csv_path), self.preprocessor.to_dict())
+        dataset, _ = self._cached(self.dataset_key, lambda: clean_dataset(data, self.preprocessor))
+        self.columns = [str(c) for c in dataset['columns']]
+        X, y = dataset['X'], dataset['y']
+
+        # Split yang sama dengan versi lama train_models.py (stratified 80/20, seed 42)
+        train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=TEST_SIZE,
+                                               random_state=SEED, stratify=y)
+        self.X_train, self.y_train = X[train_idx], y[train_idx]
+        self.X_test, self.y_test = X[test_idx], y[test_idx]
+        _, self.holdout_path = self._cached(
+            content_hash('holdout', self.dataset_key, TEST_SIZE, SEED, SMOTEENN_PARAMS),
+            lambda: resample(self.X_train, self.y_train, self.X_test))
+
+        # Fold CV hanya di bagian training; test set disimpan untuk evaluasi akhir
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=SEED)
+        self.fold_paths = []
+        for i, (fit_idx, valid_idx) in enumerate(splitter.split(self.X_train, self.y_train)):
+            key = content_hash('fold', self.dataset_key, TEST_SIZE, folds, SEED, i, SMOTEENN_PARAMS)
+            _, path = self._cached(key, lambda: dict(
+                resample(self.X_train[fit_idx], self.y_train[fit_idx], self.X_train[valid_idx]),
+                y_valid=self.y_train[valid_idx]))
+            self.fold_paths.append(path)
+
+    def _cached(self, key, build):
+        exists = os.path.exists(os.path.join(self.cache_dir, f'{key}.npz'))
+        arrays, path = cached_arrays(self.cache_dir, key, build)
+        if exists:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return arrays, path
+
+    def scaler(self):
+        """StandardScaler of the hold-out training set, fitted on named columns like the served model."""
+        import pandas as pd
+        from sklearn.preprocessing import StandardScaler
+        return StandardScaler().fit(pd.DataFrame(self.X_train, columns=self.columns))
+
+
+def candidate_grid(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def make_forest(params):
+    from sklearn.ensemble import RandomForestClassifier
+    # n_jobs=1: paralelisme ada di level proses pool, bukan di dalam satu fit
+    return RandomForestClassifier(random_state=SEED, n_jobs=1, **params)
+
+
+def classification_metrics(y_true, pred):
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+    return {
+        'accuracy': float(accuracy_score(y_true, pred)),
+        'precision': float(precision_score(y_true, pred)),
+        'recall': float(recall_score(y_true, pred)),
+        'f1': float(f1_score(y_true, pred)),
+    }
+
+
+# Data fold per proses worker, dibaca sekali dari cache
+_arrays = {}
+
+
+def _load(path):
+    if path not in _arrays:
+        with np.load(path, allow_pickle=False) as data:
+            _arrays[path] = dict(data)
+    return _arrays[path]
+
+
+def _init_worker():
+    warnings.filterwarnings('ignore')
+
+
+def fit_candidate(spec, X, y, columns=None):
+    """Fit the forest described by `spec`: {'params': ...} plus, for a distilled student, 'teacher' params."""
+    if spec.get('teacher'):
+        from ml.compression import distillation_set
+        X, y = distillation_set(spec['teacher'], X, y)
+    if columns is not None:
+        # Fit dengan nama kolom, sama seperti model produksi (lihat predict_route.run_model_proba)
+        X = _named(X, columns)
+    return make_forest(spec['params']).fit(X, y)
+
+
+def _spec(candidate):
+    return {key: candidate[key] for key in ('params', 'teacher') if key in candidate}
+
+
+def _score_fold(task):
+    index, spec, path = task
+    fold = _load(path)
+    model = fit_candidate(spec, fold['X_res'], fold['y_res'])
+    return index, classification_metrics(fold['y_valid'], model.predict(fold['X_valid']))
+
+
+def _fit_holdout(task):
+    index, spec, path, columns = task
+    holdout = _load(path)
+    model = fit_candidate(spec, holdout['X_res'], holdout['y_res'], columns)
+    return index, pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def serving_profile(model, scaler, X_sample):
+    """Latency and size of a model as served: the compiled forest on raw rows, plus pickle size."""
+    from ml.artifact import ENGINE_ARRAYS
+    from ml.forest_engine import CompiledForest
+    from ml.quantized import QuantizedForest
+
+    engine = CompiledForest.from_sklearn(model, scaler)
+    rows = X_sample[:LATENCY_REPEATS]
+    # Pemanasan dulu agar kandidat pertama tidak menanggung cache dingin
+    for row in rows[:10]:
+        engine.predict_proba(row[None, :])
+    timings = []
+    for row in rows:
+        start = time.perf_counter_ns()
+        engine.predict_proba(row[None, :])
+        timings.append(time.perf_counter_ns() - start)
+    start = time.perf_counter_ns()
+    engine.predict_proba(X_sample)
+    batch_ns = time.perf_counter_ns() - start
+    return engine, {
+        'single_row_us': round(float(np.median(timings)) / 1000, 1),
+        'batch_row_us': round(batch_ns / len(X_sample) / 1000, 2),
+        'engine_bytes': int(sum(getattr(engine, name).nbytes for name in ENGINE_ARRAYS)),
+        'quantized_bytes': QuantizedForest.from_sklearn(model, scaler).nbytes,
+        'pickle_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        'n_nodes': engine.n_nodes,
+        'max_depth': engine.max_depth,
+    }
+
+
+def _mean(results, key):
+    return float(np.mean([r[key] for r in results]))
+
+
+def evaluate(prepared, candidates, workers=None):
+    """Cross-validate candidates in a process pool, refit them on the hold-out training set and profile them.
+
+    Each candidate is a dict with ``params`` (and ``teacher`` for a distilled student); it
+    gets its CV means, hold-out test metrics and serving profile added, plus the fitted
+    ``model`` and its compiled ``engine``.
+    """
+    fold_tasks = [(i, _spec(c), path) for i, c in enumerate(candidates) for path in prepared.fold_paths]
+    folds = [[] for _ in candidates]
+    models = [None] * len(candidates)
+    with Pool(workers, initializer=_init_worker) as pool:
+        for index, metrics in pool.imap_unordered(_score_fold, fold_tasks):
+            folds[index].append(metrics)
+        holdout_tasks = [(i, _spec(c), prepared.holdout_path, prepared.columns) for i, c in enumerate(candidates)]
+        for index, payload in pool.imap_unordered(_fit_holdout, holdout_tasks):
+            models[index] = payload
+
+    # Latensi diukur berurutan di proses utama agar angka antar kandidat sebanding
+    scaler = prepared.scaler()
+    for candidate, results, payload in zip(candidates, folds, models):
+        model = pickle.loads(payload)
+        for key in ('accuracy', 'f1', 'precision', 'recall'):
+            candidate[f'cv_{key}'] = _mean(results, key)
+        candidate['cv_f1_std'] = float(np.std([r['f1'] for r in results]))
+        candidate['test'] = classification_metrics(
+            prepared.y_test, model.predict(scaler.transform(_named(prepared.X_test, prepared.columns))))
+        candidate['engine'], candidate['serving'] = serving_profile(model, scaler, prepared.X_test)
+        candidate['model'] = model
+    return candidates
+
+
+def search(prepared, grid, workers=None, rank_by='f1'):
+    """Evaluate every grid candidate; returns them ranked best first."""
+    candidates = evaluate(prepared, [{'params': params} for params in candidate_grid(grid)], workers)
+    primary, secondary = RANK_KEYS[rank_by]
+    candidates.sort(key=lambda c: (-round(c[primary], 6), -round(c[secondary], 6), c['serving']['single_row_us']))
+    for rank, candidate in enumerate(candidates, 1):
+        candidate['rank'] = rank
+    return candidates
+
+
+def _named(X, columns):
+    import pandas as pd
+    return pd.DataFrame(X, columns=columns)
+
+
+def report_rows(candidates):
+    """Candidates without the fitted objects, ready for json.dump."""
+    return [{key: value for key, value in c.items() if key not in ('model', 'engine')} for c in candidates]
+
+
+def format_report(candidates, limit=None):
+    lines = [f"{'#':>3} {'n_est':>5} {'depth':>5} {'split':>5} {'cv_acc':>7} {'cv_f1':>7} {'test_acc':>8} "
+             f"{'test_f1':>7} {'us/row':>7} {'us/row@b':>8} {'engine KB':>9} {'pickle KB':>9}"]
+    for c in candidates[:limit]:
+        p, s = c['params'], c['serving']
+        lines.append(
+            f"{c['rank']:>3} {p.get('n_estimators', '-'):>5} {str(p.get('max_depth')):>5} "
+            f"{p.get('min_samples_split', '-'):>5} {c['cv_accuracy']:>7.4f} {c['cv_f1']:>7.4f} "
+            f"{c['test']['accuracy']:>8.4f} {c['test']['f1']:>7.4f} {s['single_row_us']:>7.1f} "
+            f"{s['batch_row_us']:>8.2f} {s['engine_bytes'] / 1024:>9.0f} {s['pickle_bytes'] / 1024:>9.0f}")
+    return '\n'.join(lines)
@@ -0,0 +1,134 @@
+import bisect
+import threading
+import time
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style: each bucket counts values <= its upper bound).
+
+    observe() takes no lock so it stays cheap on the request path; under the GIL
+    a concurrent increment can very rarely be lost, which is fine for metrics.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    def quantile(self, q):
+        # Perkiraan kasar: batas atas bucket tempat kuantil jatuh
+        counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        running = 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        counts, value_sum = list(self._counts), self._sum
+        total = sum(counts)
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            running += count
+            cumulative.append(('+Inf' if bound == float('inf') else bound, running))
+        return {'buckets': cumulative, 'count': total, 'sum': value_sum}
+
+
+# Batas bucket latency dalam detik (konvensi Prometheus)
+LATENCY_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+ENABLED = True
+
+
+class MetricsRegistry:
+    """Per-process store of labelled histograms, rendered by /metrics."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text='', buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+                self._help.setdefault(name, help_text)
+        return histogram
+
+    def collect(self):
+        with self._lock:
+            items = list(self._histograms.items())
+        for (name, labels), histogram in sorted(items, key=lambda item: item[0]):
+            yield name, self._help.get(name, ''), dict(labels), histogram
+
+
+REGISTRY = MetricsRegistry()
+
+
+def stage(route, name):
+    """Histogram for one stage of a route; look it up once at import, not per request."""
+    return REGISTRY.histogram('heart_stage_seconds', 'Time spent in each stage of a request',
+                              route=route, stage=name)
+
+
+def lap(histogram, start_ns):
+    """Record time since start_ns and return the new start. Use as: t = lap(STAGE, t)."""
+    now = time.perf_counter_ns()
+    if ENABLED:
+        histogram.observe((now - start_ns) * 1e-9)
+    return now
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def render_histogram(name, labels, histogram):
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot['buckets']:
+        bucket_labels = dict(labels, le=bound if bound == '+Inf' else repr(float(bound)))
+        lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {count}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {snapshot["sum"]}')
+    lines.append(f'{name}_count{_format_labels(labels)} {snapshot["count"]}')
+    return lines
+
+
+def render_prometheus(extra_histograms=(), gauges=(), common_labels=None):
+    """Prometheus text exposition of the registry plus extra (name, help, labels, histogram)
+    tuples and (name, help, type, labels, value) gauges/counters."""
+    common_labels = common_labels or {}
+    lines = []
+    seen = set()
+    for name, help_text, labels, histogram in list(REGISTRY.collect()) + list(extra_histograms):
+        if name not in seen:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            seen.add(name)
+        lines.extend(render_histogram(name, dict(common_labels, **labels), histogram))
+    for name, help_text, metric_type, labels, value in gauges:
+        if name not in seen:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            seen.add(name)
+        lines.append(f'{name}{_format_labels(dict(common_labels, **labels))} {value}')
+    return '\n'.join(lines) + '\n'
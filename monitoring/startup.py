@@ -0,0 +1,110 @@
+"""Import-time profile of the app and a startup budget check.
+
+Run with ``python -m monitoring.startup [--budget 1.5] [--top 15]`` from the project
+root. ``import app`` runs in a fresh interpreter under ``-X importtime``, the slowest
+modules are listed, and the exit code is non-zero when the import takes longer than
+the budget or pulls in a module that should only be loaded on first use (ReportLab,
+pandas, sklearn via the pickle fallback). Run it once the mmap model artifact exists,
+otherwise the pickle fallback loads sklearn by design. ``tests/test_startup.py`` runs
+the same check against the test workspace's model.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+DEFAULT_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '1.5'))
+# Hanya boleh di-import saat pertama dipakai (PDF, jalur sklearn, training)
+LAZY_MODULES = ('reportlab', 'pandas', 'sklearn', 'scipy', 'joblib', 'matplotlib')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def profile_import(module='app', python=sys.executable):
+    """Import `module` in a new interpreter; returns (wall seconds, [(name, self_us, cumulative_us, depth)])."""
+    start = time.perf_counter()
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    modules = []
+    # stderr juga berisi log aplikasi; hanya baris importtime yang dipakai
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return seconds, modules
+
+
+def loaded_lazy_modules(module='app', python=sys.executable):
+    """Names from LAZY_MODULES present in sys.modules after importing `module` in a new interpreter."""
+    code = (f'import sys, {module}\n'
+            f'print("LAZY_MODULES", *sorted({{name.split(".")[0] for name in sys.modules}} & set({LAZY_MODULES!r})))')
+    result = subprocess.run([python, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    # Baris terakhir berlabel; stdout di atasnya bisa berisi print dari aplikasi
+    line = [line for line in result.stdout.splitlines() if line.startswith('LAZY_MODULES')][-1]
+    return line.split()[1:]
+
+
+def direct_imports(modules, module='app'):
+    """Modules imported directly by `module`, with the cumulative time of everything under them."""
+    # importtime mencetak anak sebelum induknya, jadi kumpulkan depth 1 sampai baris induk muncul
+    children = []
+    for entry in modules:
+        if entry[3] == 1:
+            children.append(entry)
+        elif entry[3] == 0:
+            if entry[0] == module:
+                return children
+            children = []
+    return []
+
+
+def check_startup(seconds, modules, budget=DEFAULT_BUDGET_SECONDS):
+    """List of problems: over budget, or a lazy module imported at startup."""
+    problems = []
+    if seconds > budget:
+        problems.append(f"startup took {seconds:.2f}s, budget is {budget:.2f}s")
+    loaded = {name for name, _, _, _ in modules}
+    for name in LAZY_MODULES:
+        if name in loaded:
+            problems.append(f"{name} is imported at startup")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS, help='seconds')
+    parser.add_argument('--top', type=int, default=15, help='number of modules to list')
+    args = parser.parse_args(argv)
+
+    seconds, modules = profile_import(args.module)
+    print(f"import {args.module}: {seconds:.2f}s wall, {len(modules)} modules")
+
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  imported by {args.module}")
+    children = sorted(direct_imports(modules, args.module), key=lambda m: -m[2])
+    for name, self_us, cumulative_us, _ in children[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    print(f"\n{'self ms':>14}  slowest modules")
+    for name, self_us, _, _ in sorted(modules, key=lambda m: -m[1])[:args.top]:
+        print(f"{self_us / 1000:>14.1f}  {name}")
+
+    problems = check_startup(seconds, modules, args.budget)
+    print()
+    for problem in problems:
+        print(f"FAIL  {problem}")
+    if not problems:
+        print(f"ok  within {args.budget:.2f}s budget, no lazy modules loaded")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
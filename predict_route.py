@@ -1,82 +1,361 @@
-from flask import Blueprint, request, jsonify, current_app, session
-import pandas as pd
+from flask import Blueprint, request, jsonify, current_app, session, Response, stream_with_context
+import csv
+import io
+import json
+import math
+import numpy as np
+import time
 import traceback
-from db.database import save_classification
+from db.database import save_classifications
+from monitoring.metrics import stage, lap
+from auth.middleware import api_auth_required
 import logging
 
 predict_bp = Blueprint('predict_bp', __name__)
 
+DEFAULT_BATCH_MAX_ROWS = 1000
+DEFAULT_CSV_CHUNK_ROWS = 1000
+
+# Histogram per tahap, diambil sekali saat import agar hot path cukup satu bisect
+PREDICT_PARSE = stage('predict', 'parse')
+PREDICT_VALIDATE = stage('predict', 'validate')
+PREDICT_ENCODE = stage('predict', 'encode')
+PREDICT_MODEL = stage('predict', 'model')
+PREDICT_DB = stage('predict', 'db_write')
+PREDICT_RESPOND = stage('predict', 'respond')
+BATCH_PARSE = stage('predict_batch', 'parse')
+BATCH_VALIDATE = stage('predict_batch', 'validate')
+BATCH_ENCODE = stage('predict_batch', 'encode')
+BATCH_MODEL = stage('predict_batch', 'model')
+BATCH_DB = stage('predict_batch', 'db_write')
+BATCH_RESPOND = stage('predict_batch', 'respond')
+MODEL_DATAFRAME = stage('model', 'dataframe')
+MODEL_SCALE = stage('model', 'scale')
+MODEL_FOREST = stage('model', 'forest')
+
+def validate_record(data, preprocessor):
+    """Normalise one input record against the fields and categories the model was trained with.
+
+    Returns (data, error) where exactly one is None."""
+    if not isinstance(data, dict):
+        return None, 'Record must be a JSON object'
+    data = {k.lower(): v for k, v in data.items()}
+    missing_fields = [field for field in preprocessor.fields if field not in data]
+    if missing_fields:
+        return None, f"Missing required fields: {', '.join(missing_fields)}"
+    for field, valid_options in preprocessor.field_categories.items():
+        value = data[field]
+        if value not in valid_options:
+            return None, f"Invalid value for {field}: {value}. Must be one of {valid_options}"
+    for field in preprocessor.numeric_fields:
+        value = data[field]
+        # bool adalah subclass int, dan "nan"/"inf" lolos float(); NaN dirutekan beda oleh engine vs sklearn
+        if isinstance(value, bool):
+            return None, f"Invalid numeric value for {field}: {value}"
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None, f"Invalid numeric value for {field}: {value}"
+        if not math.isfinite(number):
+            return None, f"Invalid numeric value for {field}: {value}"
+    return data, None
+
+def model_ready(config):
+    return config.get('MODEL') is not None
+
+HIGH_RISK_CLASS = 1
+
+def run_model_proba(bundle, matrix):
+    """Run the scaler and the forest of one model bundle once for the whole matrix; returns class probabilities."""
+    t = time.perf_counter_ns()
+    if bundle.engine is not None:
+        # Scaler sudah dilebur ke threshold, jadi hanya ada tahap forest
+        proba = bundle.engine.predict_proba(matrix)
+        lap(MODEL_FOREST, t)
+        return proba
+    # Hanya jalur sklearn yang butuh pandas (nama fitur); di-import saat pertama dipakai
+    import pandas as pd
+    columns = bundle.preprocessor.columns
+    input_data = pd.DataFrame(matrix, columns=columns)
+    t = lap(MODEL_DATAFRAME, t)
+    scaled = bundle.scaler.transform(input_data)
+    t = lap(MODEL_SCALE, t)
+    input_scaled = pd.DataFrame(scaled, columns=columns)
+    t = lap(MODEL_DATAFRAME, t)
+    proba = bundle.rf_model.predict_proba(input_scaled)
+    lap(MODEL_FOREST, t)
+    return proba
+
+def model_classes(bundle):
+    return bundle.engine.classes if bundle.engine is not None else bundle.rf_model.classes_
+
+def proba_outcomes(bundle, proba):
+    """Predicted labels (argmax, like RandomForestClassifier.predict) and the high-risk probability per row."""
+    classes = model_classes(bundle)
+    preds = classes.take(np.argmax(proba, axis=1), axis=0).astype(int)
+    return preds, proba[:, list(classes).index(HIGH_RISK_CLASS)]
+
+def run_model(bundle, matrix):
+    return proba_outcomes(bundle, run_model_proba(bundle, matrix))[0]
+
+def predict_matrix(bundle, matrix):
+    # Prediksi satu baris digabung dengan request lain jika micro-batching aktif
+    batcher = current_app.config.get('MICRO_BATCHER')
+    if batcher is not None and len(matrix) == 1:
+        return np.array([batcher.submit(matrix[0], bundle)])
+    return run_model_proba(bundle, matrix)
+
+def predict_cached(bundle, matrix):
+    """Like predict_matrix, but rows already in the prediction cache skip the model entirely.
+
+    Returns (labels, high-risk probabilities)."""
+    cache = current_app.config.get('PREDICTION_CACHE')
+    if cache is None:
+        return proba_outcomes(bundle, predict_matrix(bundle, matrix))
+    # Versi model ikut di key, supaya hasil model lama tidak pernah terbaca setelah swap
+    keys = [(bundle.version,) + cache.make_key(row) for row in matrix]
+    preds = np.empty(len(keys), dtype=int)
+    probabilities = np.empty(len(keys))
+    misses = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            misses.append(i)
+        else:
+            preds[i], probabilities[i] = cached
+    if misses:
+        miss_preds, miss_probabilities = proba_outcomes(bundle, predict_matrix(bundle, matrix[misses]))
+        for i, rf_pred, probability in zip(misses, miss_preds, miss_probabilities):
+            preds[i] = rf_pred
+            probabilities[i] = probability
+            cache.put(keys[i], (int(rf_pred), float(probability)))
+    return preds, probabilities
+
+def persist_classifications(user_id, items, model_version):
+    """Queue results for the write-behind writer if enabled; whatever it rejects is written synchronously."""
+    writer = current_app.config.get('CLASSIFICATION_WRITER')
+    if writer is not None:
+        items = [item for item in items
+                 if not writer.submit((user_id, item[0], item[1], item[2], model_version, item[3]))]
+    if items:
+        save_classifications(user_id, items, model_version=model_version)
+
+def describe_prediction(rf_pred):
+    if rf_pred == 1:
+        return 'ya', 'Pasien diklasifikasi risiko gagal jantung.'
+    return 'tidak', 'Pasien tidak diklasifikasi risiko gagal jantung.'
+
+def records_from_payload(payload):
+    """Accept either a JSON array of records or columnar JSON ({field: [values, ...]})."""
+    if isinstance(payload, dict) and isinstance(payload.get('records'), list):
+        payload = payload['records']
+    if isinstance(payload, list):
+        return payload, None
+    if isinstance(payload, dict) and payload and all(isinstance(v, list) for v in payload.values()):
+        lengths = {len(v) for v in payload.values()}
+        if len(lengths) != 1:
+            return None, 'All columns must have the same length'
+        n_rows = lengths.pop()
+        columns = list(payload.items())
+        return [{k: v[i] for k, v in columns} for i in range(n_rows)], None
+    return None, 'Body must be a JSON array of records or an object of equal-length columns'
+
 @predict_bp.route('/predict', methods=['POST'])
 def predict():
     try:
+        t = time.perf_counter_ns()
         if not request.is_json:
             return jsonify({'error': 'Request must be JSON'}), 400
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
-        data = {k.lower(): v for k, v in data.items()}
-        required_fields = ['age', 'sex', 'chestpaintype', 'restingbp', 'cholesterol', 
-                         'fastingbs', 'restingecg', 'maxhr', 'exerciseangina', 
-                         'oldpeak', 'stslope']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify({'error': f"Missing required fields: {', '.join(missing_fields)}"}), 400
-        valid_values = {
-            'sex': ['M', 'F'],
-            'chestpaintype': ['TA', 'ATA', 'NAP', 'ASY'],
-            'restingecg': ['Normal', 'ST', 'LVH'],
-            'exerciseangina': ['N', 'Y'],
-            'stslope': ['Up', 'Flat', 'Down']
-        }
-        for field, valid_options in valid_values.items():
-            value = data[field]
-            if value not in valid_options:
-                return jsonify({'error': f"Invalid value for {field}: {value}. Must be one of {valid_options}"}), 400
-        categorical_mappings = {
-            'sex': {'M': 1, 'F': 0},
-            'chestpaintype': {'TA': 3, 'ATA': 1, 'NAP': 2, 'ASY': 0},
-            'restingecg': {'Normal': 1, 'ST': 2, 'LVH': 0},
-            'exerciseangina': {'N': 0, 'Y': 1},
-            'stslope': {'Up': 2, 'Flat': 1, 'Down': 0}
-        }
-        input_data = pd.DataFrame([{
-            'Age': float(data['age']),
-            'Sex': categorical_mappings['sex'][data['sex']],
-            'ChestPainType': categorical_mappings['chestpaintype'][data['chestpaintype']],
-            'RestingBP': float(data['restingbp']),
-            'Cholesterol': float(data['cholesterol']),
-            'FastingBS': int(data['fastingbs']),
-            'RestingECG': categorical_mappings['restingecg'][data['restingecg']],
-            'MaxHR': float(data['maxhr']),
-            'ExerciseAngina': categorical_mappings['exerciseangina'][data['exerciseangina']],
-            'Oldpeak': float(data['oldpeak']),
-            'ST_Slope': categorical_mappings['stslope'][data['stslope']]
-        }])
-        if not all(key in current_app.config for key in ['SCALER', 'RF_MODEL']):
+        t = lap(PREDICT_PARSE, t)
+        if not model_ready(current_app.config):
             return jsonify({'error': 'ML model not properly loaded'}), 500
-        scaler = current_app.config['SCALER']
-        rf_model = current_app.config['RF_MODEL']
-        input_scaled = pd.DataFrame(scaler.transform(input_data), columns=input_data.columns)
-        rf_pred = int(rf_model.predict(input_scaled)[0])
-        if rf_pred == 1:
-            rf_result = 'ya'
-            rf_keterangan = 'Pasien diklasifikasi risiko gagal jantung.'
-        else:
-            rf_result = 'tidak'
-            rf_keterangan = 'Pasien tidak diklasifikasi risiko gagal jantung.'
+        bundle = current_app.config['MODEL']
+        data, error = validate_record(data, bundle.preprocessor)
+        if error:
+            return jsonify({'error': error}), 400
+        t = lap(PREDICT_VALIDATE, t)
+        matrix = bundle.encoder.encode_records([data])
+        t = lap(PREDICT_ENCODE, t)
+        rf_preds, probabilities = predict_cached(bundle, matrix)
+        rf_result, rf_keterangan = describe_prediction(int(rf_preds[0]))
+        t = lap(PREDICT_MODEL, t)
         # Simpan ke database jika user login
         if 'user_id' in session:
-            save_classification(
-                user_id=session['user_id'],
-                classification_data=data,
-                rf_result=rf_result,
-                rf_keterangan=rf_keterangan
-            )
-        return jsonify({
+            persist_classifications(session['user_id'], [(data, rf_result, rf_keterangan, float(probabilities[0]))],
+                                    bundle.version)
+            t = lap(PREDICT_DB, t)
+        response = jsonify({
             'random_forest': rf_result,
             'keterangan': rf_keterangan
         })
+        lap(PREDICT_RESPOND, t)
+        return response
     except Exception as e:
         logging.error(f"An error occurred during classification: {str(e)}")
         logging.error(traceback.format_exc())
         return jsonify({'error': f"An error occurred during classification: {str(e)}"}), 500
+
+@predict_bp.route('/predict/batch', methods=['POST'])
+@api_auth_required
+def predict_batch():
+    try:
+        t = time.perf_counter_ns()
+        if not request.is_json:
+            return jsonify({'error': 'Request must be JSON'}), 400
+        records, error = records_from_payload(request.get_json())
+        t = lap(BATCH_PARSE, t)
+        if error:
+            return jsonify({'error': error}), 400
+        if not records:
+            return jsonify({'error': 'No data provided'}), 400
+        max_rows = current_app.config.get('PREDICT_BATCH_MAX_ROWS', DEFAULT_BATCH_MAX_ROWS)
+        if len(records) > max_rows:
+            return jsonify({'error': f"Batch too large: {len(records)} records (max {max_rows})"}), 413
+        if not model_ready(current_app.config):
+            return jsonify({'error': 'ML model not properly loaded'}), 500
+        bundle = current_app.config['MODEL']
+
+        results = [None] * len(records)
+        valid_rows = []
+        valid_index = []
+        for i, record in enumerate(records):
+            data, error = validate_record(record, bundle.preprocessor)
+            if error:
+                results[i] = {'index': i, 'error': error}
+            else:
+                valid_rows.append(data)
+                valid_index.append(i)
+        t = lap(BATCH_VALIDATE, t)
+
+        to_save = []
+        if valid_rows:
+            matrix = bundle.encoder.encode_records(valid_rows)
+            t = lap(BATCH_ENCODE, t)
+            rf_preds, probabilities = predict_cached(bundle, matrix)
+            for i, data, rf_pred, probability in zip(valid_index, valid_rows, rf_preds, probabilities):
+                rf_result, rf_keterangan = describe_prediction(int(rf_pred))
+                results[i] = {'index': i, 'random_forest': rf_result, 'keterangan': rf_keterangan}
+                to_save.append((data, rf_result, rf_keterangan, float(probability)))
+            t = lap(BATCH_MODEL, t)
+
+        # Simpan ke database jika user login, satu transaksi untuk seluruh batch
+        if to_save and 'user_id' in session:
+            persist_classifications(session['user_id'], to_save, bundle.version)
+            t = lap(BATCH_DB, t)
+        response = jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': len(results) - len(valid_rows)
+        })
+        lap(BATCH_RESPOND, t)
+        return response
+    except Exception as e:
+        logging.error(f"An error occurred during batch classification: {str(e)}")
+        logging.error(traceback.format_exc())
+        return jsonify({'error': f"An error occurred during batch classification: {str(e)}"}), 500
+
+def normalize_csv_header(header):
+    # 'ST_Slope' (heart.csv) dan 'stslope' (form) sama-sama diterima
+    return [name.strip().lower().replace('_', '') for name in header]
+
+def iter_csv_chunks(text_stream, chunk_rows, fields):
+    """Yield (first_row_number, records) chunks from a CSV stream without reading it all.
+
+    `fields` are the columns the header must contain, i.e. the model's preprocessor fields."""
+    reader = csv.reader(text_stream)
+    header = normalize_csv_header(next(reader, []))
+    missing_fields = [field for field in fields if field not in header]
+    if missing_fields:
+        raise ValueError(f"Missing required columns: {', '.join(missing_fields)}")
+    chunk = []
+    first_row = 1
+    for values in reader:
+        if not values:
+            continue
+        chunk.append(dict(zip(header, values)))
+        if len(chunk) >= chunk_rows:
+            yield first_row, chunk
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        yield first_row, chunk
+
+def score_chunk(bundle, first_row, records):
+    """Validate, encode and score one chunk with a single vectorized call; results keep input order."""
+    results = [None] * len(records)
+    valid_rows = []
+    valid_index = []
+    for i, record in enumerate(records):
+        data, error = validate_record(record, bundle.preprocessor)
+        if error:
+            results[i] = {'row': first_row + i, 'error': error}
+        else:
+            valid_rows.append(data)
+            valid_index.append(i)
+    if valid_rows:
+        rf_preds = run_model(bundle, bundle.encoder.encode_records(valid_rows))
+        for i, rf_pred in zip(valid_index, rf_preds):
+            rf_result, rf_keterangan = describe_prediction(int(rf_pred))
+            results[i] = {'row': first_row + i, 'random_forest': rf_result, 'keterangan': rf_keterangan}
+    return results
+
+@predict_bp.route('/predict/csv', methods=['POST'])
+@api_auth_required
+def predict_csv():
+    if not model_ready(current_app.config):
+        return jsonify({'error': 'ML model not properly loaded'}), 500
+    bundle = current_app.config['MODEL']
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    chunk_rows = current_app.config.get('PREDICT_CSV_CHUNK_ROWS', DEFAULT_CSV_CHUNK_ROWS)
+
+    def generate():
+        # Stream dibuka di dalam generator agar tetap terbuka selama respons dikirim
+        upload = request.files.get('file')
+        raw_stream = upload.stream if upload else request.stream
+        text_stream = io.TextIOWrapper(raw_stream, encoding='utf-8-sig', newline='')
+        chunks = iter_csv_chunks(text_stream, chunk_rows, bundle.preprocessor.fields)
+        try:
+            first_chunk = next(chunks, None)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            yield f"Invalid CSV: {str(e)}"
+            return
+        # Nilai pertama adalah status untuk view; sisanya isi respons
+        yield None
+        if output_format == 'csv':
+            yield 'row,random_forest,keterangan,error\r\n'
+        pending = [first_chunk] if first_chunk else []
+        try:
+            for first_row, records in _chain(pending, chunks):
+                results = score_chunk(bundle, first_row, records)
+                if output_format == 'csv':
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for result in results:
+                        writer.writerow([result['row'], result.get('random_forest', ''),
+                                         result.get('keterangan', ''), result.get('error', '')])
+                    yield buffer.getvalue()
+                else:
+                    yield ''.join(json.dumps(result) + '\n' for result in results)
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Header sudah terkirim, jadi error parsing dilaporkan sebagai baris terakhir
+            logging.error(f"CSV scoring aborted: {str(e)}")
+            if output_format == 'csv':
+                yield f',,,"Invalid CSV: {str(e)}"\r\n'
+            else:
+                yield json.dumps({'error': f"Invalid CSV: {str(e)}"}) + '\n'
+
+    body = stream_with_context(generate())
+    error = next(body)
+    if error:
+        return jsonify({'error': error}), 400
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(body, mimetype=mimetype, headers={'X-Model-Version': str(bundle.version)})
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
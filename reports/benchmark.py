@@ -0,0 +1,63 @@
+"""Time and peak memory of the classifications PDF report for growing row counts.
+
+Run with ``python -m reports.benchmark [--rows 1000,10000,100000] [--legacy-max 5000]``.
+Every measurement runs in a fresh process on synthetic rows (no database), so peak RSS
+is that of a single render. ``chunked`` is the default LongTable-block rendering,
+``single`` is one table holding every row (the old layout), limited to ``--legacy-max``
+rows because its cost grows super-linearly.
+"""
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from reports.pdf import render_classifications_pdf, REPORT_CHUNK_ROWS
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        yield {
+            'full_name': f'Pasien {i % 500}', 'created_at': f'2025-01-{1 + i % 28:02d} 10:{i % 60:02d}:00',
+            'age': 30 + i % 50, 'sex': 'M' if i % 2 else 'F', 'chestpaintype': 'ATA', 'restingbp': 120 + i % 40,
+            'cholesterol': 180 + i % 120, 'fastingbs': i % 2, 'restingecg': 'Normal', 'maxhr': 100 + i % 90,
+            'exerciseangina': 'N', 'oldpeak': (i % 30) / 10, 'stslope': 'Up',
+        }
+
+
+def measure(job):
+    rows, chunk_rows = job
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        render_classifications_pdf(synthetic_rows(rows), 'Benchmark', output, total=rows, chunk_rows=chunk_rows)
+        seconds = time.perf_counter() - start
+        size = output.tell()
+    # ru_maxrss dalam KiB di Linux
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='1000,10000,100000', help='comma separated row counts')
+    parser.add_argument('--legacy-max', type=int, default=5000, help='largest row count for the single-table mode')
+    parser.add_argument('--chunk-rows', type=int, default=REPORT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':8} {'rows':>8} {'seconds':>9} {'us/row':>8} {'peak MB':>8} {'pdf MB':>8}")
+    for rows in [int(value) for value in args.rows.split(',')]:
+        modes = [('chunked', args.chunk_rows)]
+        if rows <= args.legacy_max:
+            modes.append(('single', None))
+        for mode, chunk_rows in modes:
+            # maxtasksperchild=1: proses baru per pengukuran agar peak RSS tidak terbawa
+            with Pool(1, maxtasksperchild=1) as pool:
+                seconds, peak_mb, size = pool.apply(measure, ((rows, chunk_rows),))
+            print(f"{mode:8} {rows:>8} {seconds:>9.2f} {seconds / rows * 1e6:>8.0f} {peak_mb:>8.0f} "
+                  f"{size / 2**20:>8.1f}")
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
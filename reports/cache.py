@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+
+class ReportCache:
+    """Rendered reports and exports on disk, addressed by a hash of what produced them.
+
+    The key covers the endpoint, its filters and the data version, so an entry never
+    goes stale: once the data changes the key changes and the old file is simply no
+    longer asked for. The same key doubles as the HTTP ETag. Files are evicted
+    least-recently-used first once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(endpoint, params, version):
+        encoded = json.dumps([endpoint, params, version], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def get(self, key, extension):
+        """Path of the cached file, or None. A hit counts as a use for eviction."""
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def writer(self, key, extension):
+        """Binary file to render into; it becomes visible under its key only if the block succeeds."""
+        partial = f'{self.path(key, extension)}.{uuid.uuid4().hex}.part'
+        try:
+            with open(partial, 'wb') as output:
+                yield output
+            os.replace(partial, self.path(key, extension))
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.evict()
+
+    def tee(self, key, extension, pieces):
+        """Pass streamed pieces through while storing them; an aborted download stores nothing."""
+        with self.writer(key, extension) as output:
+            for piece in pieces:
+                output.write(piece.encode('utf-8') if isinstance(piece, str) else piece)
+                yield piece
+
+    def evict(self):
+        with self._evict_lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                else:
+                    logging.debug(f"Report cache evicted {os.path.basename(path)}")
+                total -= size
@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from db.database import get_db_connection
+
+# kind -> (nama builder(params, path, progress) di reports.pdf, nama file unduhan)
+REPORT_KINDS = {
+    'classifications': ('classifications_report', 'classifications.pdf'),
+    'user_history': ('user_history_report', 'classification_history.pdf'),
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def report_builder(kind):
+    # ReportLab baru di-import oleh laporan pertama, bukan saat worker start
+    from reports import pdf
+    return getattr(pdf, REPORT_KINDS[kind][0])
+
+
+def _timestamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def get_job(job_id):
+    conn = get_db_connection()
+    try:
+        return conn.execute('SELECT * FROM report_jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+class ReportQueue:
+    """Builds PDF reports off the request path.
+
+    Jobs are rows in ``report_jobs`` so any worker process can show their status;
+    the PDF itself is rendered by a small thread pool in the process that accepted
+    the request and kept in ``directory`` until ``ttl`` has passed. Jobs left
+    queued or running for longer than ``stale_after`` (e.g. the worker died) are
+    marked failed when the table is cleaned up. Jobs submitted with a ``cache_key``
+    are rendered into the report cache instead, and a cached PDF is served without
+    rendering again.
+    """
+
+    def __init__(self, directory, workers=2, ttl=timedelta(hours=24), stale_after=timedelta(minutes=30), cache=None):
+        self.directory = directory
+        self.cache = cache
+        self.workers = workers
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Thread pool tidak ikut ter-fork (gunicorn --preload), jadi buat per proses
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='report')
+                self._pid = os.getpid()
+
+    def submit(self, kind, params, user_id, cache_key=None):
+        """Queue a report and return its job id.
+
+        An identical report still in progress is reused; with a cache_key whose PDF is
+        already cached, the job is created finished and nothing is rendered.
+        """
+        self._ensure_started()
+        self.purge_expired()
+        encoded = json.dumps(params, sort_keys=True)
+        now = datetime.now()
+        cached = self.cache.get(cache_key, 'pdf') if self.cache is not None and cache_key else None
+        conn = get_db_connection()
+        try:
+            row = conn.execute(
+                f"""SELECT id FROM report_jobs
+                    WHERE user_id = ? AND kind = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})
+                    AND params = ? AND cache_key IS ?""",
+                (user_id, kind, *ACTIVE_STATUSES, encoded, cache_key)
+            ).fetchone()
+            if row is None and cached:
+                row = conn.execute(
+                    """SELECT id FROM report_jobs
+                        WHERE user_id = ? AND cache_key = ? AND status = 'done' AND expires_at >= ?""",
+                    (user_id, cache_key, _timestamp(now))
+                ).fetchone()
+            if row is not None:
+                return row['id']
+            job_id = uuid.uuid4().hex
+            if cached:
+                conn.execute(
+                    """INSERT INTO report_jobs (id, kind, params, user_id, status, progress, file_path, cache_key,
+                                                created_at, finished_at, expires_at)
+                        VALUES (?, ?, ?, ?, 'done', 1.0, ?, ?, ?, ?, ?)""",
+                    (job_id, kind, encoded, user_id, cached, cache_key, _timestamp(now), _timestamp(now),
+                     _timestamp(now + self.ttl))
+                )
+            else:
+                conn.execute(
+                    'INSERT INTO report_jobs (id, kind, params, user_id, cache_key, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, encoded, user_id, cache_key, _timestamp(now))
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        if not cached:
+            self._executor.submit(self._run, job_id)
+        return job_id
+
+    def recover(self, job):
+        """Make sure a finished, unexpired job still has its PDF; returns (job, requeued).
+
+        A cached PDF can be evicted while its job still says done. If another job has
+        rendered the same cache key again, the job points at that file; otherwise it is
+        queued and rendered again. Only one request re-queues a given job.
+        """
+        if (job['status'] != 'done' or job['expires_at'] < _timestamp(datetime.now())
+                or (job['file_path'] and os.path.exists(job['file_path']))):
+            return job, False
+        cached = self.cache.get(job['cache_key'], 'pdf') if self.cache is not None and job['cache_key'] else None
+        if cached:
+            self._update(job['id'], file_path=cached)
+            return get_job(job['id']), False
+        self._ensure_started()
+        conn = get_db_connection()
+        try:
+            # created_at ikut diperbarui agar purge_expired tidak menganggap job ini macet
+            requeued = conn.execute(
+                """UPDATE report_jobs SET status = 'queued', progress = 0, file_path = NULL, error = NULL,
+                        created_at = ?, finished_at = NULL, expires_at = NULL
+                    WHERE id = ? AND status = 'done'""",
+                (_timestamp(datetime.now()), job['id'])
+            ).rowcount == 1
+            conn.commit()
+        finally:
+            conn.close()
+        if requeued:
+            logging.info(f"Report job {job['id']} lost its PDF, rendering it again")
+            self._executor.submit(self._run, job['id'])
+        return get_job(job['id']), requeued
+
+    def _update(self, job_id, **fields):
+        conn = get_db_connection()
+        try:
+            assignments = ', '.join(f'{name} = ?' for name in fields)
+            conn.execute(f'UPDATE report_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run(self, job_id):
+        job = get_job(job_id)
+        if job is None:
+            return
+        params = json.loads(job['params'])
+        reported = [0.0]
+
+        def progress(fraction):
+            # Cukup tulis tiap kenaikan 5%
+            if fraction - reported[0] >= 0.05:
+                reported[0] = fraction
+                self._update(job_id, progress=round(fraction, 3))
+
+        self._update(job_id, status='running')
+        try:
+            builder = report_builder(job['kind'])
+            if self.cache is not None and job['cache_key']:
+                with self.cache.writer(job['cache_key'], 'pdf') as output:
+                    builder(params, output, progress)
+                path = self.cache.path(job['cache_key'], 'pdf')
+            else:
+                path = os.path.join(self.directory, f'{job_id}.pdf')
+                partial = path + '.part'
+                try:
+                    builder(params, partial, progress)
+                    os.replace(partial, path)
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+        except Exception as e:
+            logging.error(f"Report job {job_id} ({job['kind']}) failed: {str(e)}")
+            self._finish(job_id, status='failed', error=str(e))
+            return
+        self._finish(job_id, status='done', progress=1.0, file_path=path)
+
+    def _finish(self, job_id, **fields):
+        finished = datetime.now()
+        self._update(job_id, finished_at=_timestamp(finished), expires_at=_timestamp(finished + self.ttl), **fields)
+
+    def purge_expired(self):
+        """Delete finished reports past their expiry and fail jobs that never finished."""
+        now = datetime.now()
+        conn = get_db_connection()
+        try:
+            expired = conn.execute(
+                'SELECT id, file_path, cache_key FROM report_jobs WHERE expires_at < ?', (_timestamp(now),)
+            ).fetchall()
+            for row in expired:
+                # File di cache laporan bisa dipakai job lain; cache menghapusnya sendiri (eviction)
+                if row['file_path'] and not row['cache_key'] and os.path.exists(row['file_path']):
+                    os.remove(row['file_path'])
+            if expired:
+                conn.executemany('DELETE FROM report_jobs WHERE id = ?', [(row['id'],) for row in expired])
+            conn.execute(
+                f"""UPDATE report_jobs SET status = 'failed', error = 'Laporan tidak selesai', finished_at = ?,
+                        expires_at = ?
+                    WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) AND created_at < ?""",
+                (_timestamp(now), _timestamp(now + self.ttl), *ACTIVE_STATUSES, _timestamp(now - self.stale_after))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return len(expired)
+
+    def stats(self):
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM report_jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        return {row[0]: row[1] for row in rows}
@@ -0,0 +1,215 @@
+"""PDF reports for classifications.
+
+Rows are laid out in ``LongTable`` blocks of ``REPORT_CHUNK_ROWS`` rows, each with the
+header repeated, and a block is only built when the layout reaches it. ReportLab then
+never has to measure or split one table holding every row, so time per row stays flat
+and only one block of flowables is in memory at a time. Pages are filled with the public
+``Frame.add``/``Frame.split`` API on a canvas, with the page geometry of ``SimpleDocTemplate``.
+"""
+import time
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Frame, LongTable, TableStyle, Paragraph, Spacer
+from reportlab.platypus.doctemplate import LayoutError
+from reportlab.lib.styles import getSampleStyleSheet
+from db.database import iter_user_classifications, count_user_classifications
+from monitoring.metrics import stage, lap
+
+ADMIN_PDF_QUERY = stage('print_classifications', 'query')
+ADMIN_PDF_RENDER = stage('print_classifications', 'pdf')
+USER_PDF_QUERY = stage('print_user_history', 'query')
+USER_PDF_RENDER = stage('print_user_history', 'pdf')
+
+REPORT_CHUNK_ROWS = 100
+PAGE_SIZE = letter
+# Margin default SimpleDocTemplate
+PAGE_MARGIN = inch
+
+# Style dibuat sekali per proses, bukan per laporan/per sel
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = STYLES['Title']
+CELL_STYLE = STYLES['Normal']
+
+CLASSIFICATION_HEADER = ['User', 'Date', 'Input Data', 'Result']
+# Increased column widths for better readability and to prevent text overflow
+CLASSIFICATION_COLUMN_WIDTHS = [80, 100, 180, 180]
+CLASSIFICATION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('LEFTPADDING', (0,0), (-1,-1), 6),
+    ('RIGHTPADDING', (0,0), (-1,-1), 6),
+    ('TOPPADDING', (0,0), (-1,-1), 6),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+])
+
+HISTORY_HEADER = ['Date', 'Hasil', 'Keterangan']
+HISTORY_COLUMN_WIDTHS = [150, 150, 250]
+HISTORY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def _no_progress(fraction):
+    pass
+
+
+def _table_blocks(rows, format_row, header, col_widths, style, chunk_rows, total, progress):
+    # chunk_rows=None: satu tabel berisi semua baris (cara lama, untuk perbandingan benchmark)
+    block = []
+    done = 0
+    emitted = False
+    for row in rows:
+        block.append(format_row(row))
+        if chunk_rows and len(block) == chunk_rows:
+            done += len(block)
+            emitted = True
+            yield LongTable([header] + block, colWidths=col_widths, repeatRows=1, style=style)
+            block = []
+            if total:
+                progress(min(done / total, 1.0))
+    if block or not emitted:
+        yield LongTable([header] + block, colWidths=col_widths, repeatRows=1, style=style)
+
+
+def _page_frame():
+    return Frame(PAGE_MARGIN, PAGE_MARGIN, PAGE_SIZE[0] - 2 * PAGE_MARGIN, PAGE_SIZE[1] - 2 * PAGE_MARGIN)
+
+
+def _render(output, title_text, blocks):
+    """Lay out the title and the table blocks page by page; a block is built only when a frame needs it."""
+    canv = Canvas(output, pagesize=PAGE_SIZE)
+    canv.setTitle(title_text)
+    pending = [Paragraph(title_text, TITLE_STYLE), Spacer(1, 20)]
+    frame = _page_frame()
+    page_empty = True
+    while True:
+        if not pending:
+            block = next(blocks, None)
+            if block is None:
+                break
+            pending.append(block)
+        flowable = pending.pop(0)
+        if frame.add(flowable, canv, trySplit=1):
+            page_empty = False
+            continue
+        # Tabel dipecah di batas halaman; bagian pertama pasti muat di sisa frame
+        parts = frame.split(flowable, canv)
+        if parts:
+            if not frame.add(parts[0], canv):
+                raise LayoutError(f"Split part of {type(flowable).__name__} does not fit the remaining frame")
+            page_empty = False
+            pending[:0] = parts[1:]
+            continue
+        if page_empty:
+            raise LayoutError(f"{type(flowable).__name__} is too large for an empty page")
+        canv.showPage()
+        frame = _page_frame()
+        page_empty = True
+        pending.insert(0, flowable)
+    canv.showPage()
+    canv.save()
+
+
+def _classification_row(pred):
+    pred_dict = dict(pred)
+
+    # Format input data directly from pred_dict
+    input_data_formatted = "<br/>".join([
+        f"<strong>Age:</strong> {pred_dict.get('age', 'N/A')}",
+        f"<strong>Sex:</strong> {pred_dict.get('sex', 'N/A')}",
+        f"<strong>Chest Pain Type:</strong> {pred_dict.get('chestpaintype', 'N/A')}",
+        f"<strong>Resting BP:</strong> {pred_dict.get('restingbp', 'N/A')}",
+        f"<strong>Cholesterol:</strong> {pred_dict.get('cholesterol', 'N/A')}",
+        f"<strong>Fasting BS:</strong> {pred_dict.get('fastingbs', 'N/A')}",
+        f"<strong>Resting ECG:</strong> {pred_dict.get('restingecg', 'N/A')}",
+        f"<strong>Max HR:</strong> {pred_dict.get('maxhr', 'N/A')}",
+        f"<strong>Exercise Angina:</strong> {pred_dict.get('exerciseangina', 'N/A')}",
+        f"<strong>Old Peak:</strong> {pred_dict.get('oldpeak', 'N/A')}",
+        f"<strong>ST Slope:</strong> {pred_dict.get('stslope', 'N/A')}"
+    ])
+
+    # Kolom hasil sama dengan riwayat user: hasil Random Forest dan keterangannya
+    result_formatted = "<br/>".join([
+        f"<strong>Hasil:</strong> {pred_dict.get('rf_result') or '-'}",
+        f"<strong>Keterangan:</strong> {pred_dict.get('rf_keterangan') or '-'}"
+    ])
+
+    # Kolom users.full_name boleh NULL; pakai username
+    user = pred_dict.get('full_name') or pred_dict.get('username') or 'N/A'
+    return [
+        Paragraph(str(user), CELL_STYLE),
+        Paragraph(str(pred_dict.get('created_at', 'N/A')), CELL_STYLE),
+        Paragraph(input_data_formatted, CELL_STYLE),
+        Paragraph(result_formatted, CELL_STYLE)
+    ]
+
+
+def _history_row(pred):
+    hasil = pred['rf_result'] if 'rf_result' in pred.keys() else '-'
+    ket = pred['rf_keterangan'] if 'rf_keterangan' in pred.keys() else '-'
+    return [str(pred['created_at']), hasil, ket]
+
+
+def render_classifications_pdf(classifications, title_text, output, progress=_no_progress, total=None,
+                               chunk_rows=REPORT_CHUNK_ROWS):
+    """Write the classifications report to `output` (a path or a binary file).
+
+    `classifications` may be any iterable of rows; pass `total` for progress when it has no len().
+    """
+    if total is None and hasattr(classifications, '__len__'):
+        total = len(classifications)
+    _render(output, title_text, _table_blocks(
+        classifications, _classification_row, CLASSIFICATION_HEADER, CLASSIFICATION_COLUMN_WIDTHS,
+        CLASSIFICATION_TABLE_STYLE, chunk_rows, total, progress))
+
+
+def render_user_history_pdf(classifications, title_text, output, progress=_no_progress, total=None,
+                            chunk_rows=REPORT_CHUNK_ROWS):
+    if total is None and hasattr(classifications, '__len__'):
+        total = len(classifications)
+    _render(output, title_text, _table_blocks(
+        classifications, _history_row, HISTORY_HEADER, HISTORY_COLUMN_WIDTHS,
+        HISTORY_TABLE_STYLE, chunk_rows, total, progress))
+
+
+def classifications_report(params, path, progress=_no_progress):
+    """Job builder for the admin report; params are the filters plus the title."""
+    filters = dict(user_id=params.get('user_id'), start_date=params.get('start_date'), end_date=params.get('end_date'))
+    t = time.perf_counter_ns()
+    total = count_user_classifications(**filters)
+    t = lap(ADMIN_PDF_QUERY, t)
+    # Baris dibaca dari cursor sambil dirender, jadi waktu query ikut terhitung di sini
+    render_classifications_pdf(iter_user_classifications(**filters), params['title'], path, progress, total)
+    lap(ADMIN_PDF_RENDER, t)
+
+
+def user_history_report(params, path, progress=_no_progress):
+    """Job builder for a patient's own history."""
+    filters = dict(user_id=params['user_id'], start_date=params.get('start_date'), end_date=params.get('end_date'))
+    t = time.perf_counter_ns()
+    total = count_user_classifications(**filters)
+    t = lap(USER_PDF_QUERY, t)
+    render_user_history_pdf(iter_user_classifications(**filters), params['title'], path, progress, total)
+    lap(USER_PDF_RENDER, t)
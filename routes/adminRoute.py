@@ -1,53 +1,118 @@
-from flask import render_template, request, redirect, url_for, session, flash, jsonify, send_file, Blueprint
-import pandas as pd
-import os
-from werkzeug.security import generate_password_hash, check_password_hash
-from db.database import get_db_connection, get_user_classifications
-from auth.middleware import login_required, admin_required
-import joblib
-import json
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, Blueprint, Response
+from werkzeug.security import generate_password_hash
+from db.database import get_db_connection, RECENT_CLASSIFICATIONS, HAS_CLASSIFICATIONS
+from db.stats import dashboard_counts, trend_series
+from routes.datatables import classifications_datatable, parse_date
+from routes.reportRoutes import enqueue_report, current_data_version, report_cache_key, revalidate
+from routes.exports import EXPORT_FORMATS, export_response, parse_export_args
+from auth.middleware import admin_required
+from routes.loadModel import model_report, reload_model_async
+from ml.registry import ModelRegistry
 from datetime import datetime
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-import io
 
 admin_bp = Blueprint('admin', __name__)
 
+# period -> (jumlah titik default, maksimum)
+TREND_POINTS = {'day': (30, 366), 'week': (12, 104)}
+
 def adminRoute(app):
     @app.route('/admin/dashboard')
     @admin_required
     def admin_dashboard():
         conn = get_db_connection()
         try:
-            total_users = conn.execute('SELECT COUNT(*) FROM users WHERE role = ?', ('patient',)).fetchone()[0]
-            total_classifications = conn.execute('SELECT COUNT(*) FROM classifications').fetchone()[0]
-            high_risk_classifications = conn.execute('''
-                SELECT COUNT(*) FROM rf_results 
-                WHERE rf_result = 'ya'
-            ''').fetchone()[0]
-            today_str = datetime.now().strftime('%Y-%m-%d')
-            today_classifications = conn.execute('''
-                SELECT COUNT(*) FROM classifications 
-                WHERE DATE(created_at) = DATE(?)
-            ''', (today_str,)).fetchone()[0]
-            recent_classifications = conn.execute(
-                """SELECT p.*, u.username, u.full_name, r.rf_result, r.rf_keterangan, r.created_at as rf_created_at \
-                FROM classifications p \
-                JOIN users u ON p.user_id = u.id \
-                JOIN rf_results r ON p.id = r.classification_id \
-                ORDER BY p.created_at DESC LIMIT 5"""
-            ).fetchall()
+            counts = dashboard_counts(conn, datetime.now().strftime('%Y-%m-%d'))
+            recent_classifications = conn.execute(RECENT_CLASSIFICATIONS).fetchall()
             return render_template('admin/dashboard.html',
-                                total_users=total_users,
-                                total_classifications=total_classifications,
-                                high_risk_classifications=high_risk_classifications,
-                                today_classifications=today_classifications,
+                                total_users=counts['patients'],
+                                total_classifications=counts['classifications'],
+                                high_risk_classifications=counts['high_risk'],
+                                today_classifications=counts['today'],
                                 recent_classifications=recent_classifications)
         finally:
             conn.close()
 
+    @app.route('/admin/api/trends')
+    @admin_required
+    def dashboard_trends():
+        period = request.args.get('period', 'day')
+        if period not in TREND_POINTS:
+            return jsonify({'error': "period harus 'day' atau 'week'"}), 400
+        default_points, max_points = TREND_POINTS[period]
+        points = min(max(request.args.get('points', default_points, type=int), 1), max_points)
+        end = datetime.now().date()
+        conn = get_db_connection()
+        try:
+            series = trend_series(conn, period, end, points)
+        finally:
+            conn.close()
+        return jsonify({'period': period, 'start': series[0]['date'], 'end': series[-1]['date'], 'series': series})
+
+    @app.route('/admin/prediction-cache')
+    @admin_required
+    def prediction_cache_stats():
+        cache = app.config.get('PREDICTION_CACHE')
+        if cache is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(cache.stats(), enabled=True))
+
+    @app.route('/admin/micro-batcher')
+    @admin_required
+    def micro_batcher_stats():
+        batcher = app.config.get('MICRO_BATCHER')
+        if batcher is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(batcher.stats(), enabled=True))
+
+    @app.route('/admin/model-report')
+    @admin_required
+    def model_load_report():
+        return jsonify(model_report(app))
+
+    @app.route('/admin/models')
+    @admin_required
+    def model_versions():
+        registry = ModelRegistry()
+        models = {
+            'serving': app.config['MODEL'].version if app.config.get('MODEL') else None,
+            'registry': registry.read_manifest(),
+            'reload': app.config.get('MODEL_RELOAD_STATUS', {}),
+        }
+        # Browser mendapat halaman dengan form ber-token CSRF; klien lain tetap JSON
+        if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+            return render_template('admin/models.html', **models)
+        return jsonify(models)
+
+    @app.route('/admin/models/reload', methods=['POST'])
+    @admin_required
+    def reload_model_version():
+        payload = request.get_json(silent=True) or {}
+        version = payload.get('version') or request.form.get('version')
+        registry = ModelRegistry()
+        if version:
+            try:
+                # Worker lain mengikuti lewat watcher manifest
+                registry.set_current(version)
+            except KeyError as e:
+                if not request.is_json:
+                    flash(e.args[0], 'danger')
+                    return redirect(url_for('model_versions'))
+                return jsonify({'error': str(e)}), 404
+        reload_model_async(app, version)
+        version = version or registry.current_version()
+        if not request.is_json:
+            flash(f'Model {version or "default"} sedang dimuat ulang', 'success')
+            return redirect(url_for('model_versions'))
+        return jsonify({'status': 'reloading', 'version': version}), 202
+
+    @app.route('/admin/write-behind')
+    @admin_required
+    def write_behind_stats():
+        writer = app.config.get('CLASSIFICATION_WRITER')
+        if writer is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(writer.stats(), enabled=True))
+
     @app.route('/admin/users')
     @admin_required
     def admin_users():
@@ -132,118 +197,61 @@ def adminRoute(app):
     @app.route('/admin/classifications')
     @admin_required
     def admin_classifications():
-        classifications = get_user_classifications()
-        return render_template('admin/classifications.html', classifications=classifications)
+        # Baris tabel diambil per halaman lewat /admin/classifications/data
+        conn = get_db_connection()
+        has_classifications = conn.execute(HAS_CLASSIFICATIONS).fetchone() is not None
+        conn.close()
+        return render_template('admin/classifications.html', has_classifications=has_classifications)
+
+    @app.route('/admin/classifications/data')
+    @admin_required
+    def admin_classifications_data():
+        return classifications_datatable(request.args, route='admin_classifications_data')
 
     @app.route('/admin/classifications/export/<format>')
     @admin_required
     def export_classifications(format):
-        classifications = get_user_classifications()
-        data = []
-        # Hanya ambil data input
-        for pred in classifications:
-            pred_data = dict(pred)
-            row = {
-                'age': pred_data.get('age', ''),
-                'sex': pred_data.get('sex', ''),
-                'chestpaintype': pred_data.get('chestpaintype', ''),
-                'restingbp': pred_data.get('restingbp', ''),
-                'cholesterol': pred_data.get('cholesterol', ''),
-                'fastingbs': pred_data.get('fastingbs', ''),
-                'restingecg': pred_data.get('restingecg', ''),
-                'maxhr': pred_data.get('maxhr', ''),
-                'exerciseangina': pred_data.get('exerciseangina', ''),
-                'oldpeak': pred_data.get('oldpeak', ''),
-                'stslope': pred_data.get('stslope', '')
-            }
-            data.append(row)
-
-        if format == 'csv':
-            df = pd.DataFrame(data)
-            csv_data = df.to_csv(index=False)
-            return csv_data, 200, {
-                'Content-Type': 'text/csv',
-                'Content-Disposition': 'attachment; filename=classifications_input.csv'
-            }
-        elif format == 'json':
-            return jsonify(data)
-        elif format == 'pdf':
-            # Create PDF
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            elements = []
-
-            # Add title
-            title = Paragraph("classification History Report", styles['Title'])
-            elements.append(title)
-            elements.append(Spacer(1, 20))
+        try:
+            filters = parse_export_args(request.args)
+        except ValueError:
+            return jsonify({'error': 'Format tanggal harus YYYY-MM-DD'}), 400
 
-            # Create table data
-            table_data = [['User', 'Date', 'Input Data', 'Result']]
-            for pred in classifications:
-                pred_dict = dict(pred)
+        if format != 'pdf' and format not in EXPORT_FORMATS:
+            return jsonify({'error': 'Format ekspor tidak dikenal'}), 404
+        compress = request.args.get('gzip') == '1'
 
-                # Format input data directly from pred_dict
-                input_data_formatted = "<br/>".join([
-                    f"<strong>Age:</strong> {pred_dict.get('age', 'N/A')}",
-                    f"<strong>Sex:</strong> {pred_dict.get('sex', 'N/A')}",
-                    f"<strong>Chest Pain Type:</strong> {pred_dict.get('chestpaintype', 'N/A')}",
-                    f"<strong>Resting BP:</strong> {pred_dict.get('restingbp', 'N/A')}",
-                    f"<strong>Cholesterol:</strong> {pred_dict.get('cholesterol', 'N/A')}",
-                    f"<strong>Fasting BS:</strong> {pred_dict.get('fastingbs', 'N/A')}",
-                    f"<strong>Resting ECG:</strong> {pred_dict.get('restingecg', 'N/A')}",
-                    f"<strong>Max HR:</strong> {pred_dict.get('maxhr', 'N/A')}",
-                    f"<strong>Exercise Angina:</strong> {pred_dict.get('exerciseangina', 'N/A')}",
-                    f"<strong>Old Peak:</strong> {pred_dict.get('oldpeak', 'N/A')}",
-                    f"<strong>ST Slope:</strong> {pred_dict.get('stslope', 'N/A')}"
-                ])
-                
-                # Format result directly from pred_dict
-                result_formatted = "<br/>".join([
-                    f"<strong>Decision Tree:</strong> {pred_dict.get('decision_tree', 'N/A')}% ({pred_dict.get('decision_tree_risk', 'N/A')})",
-                    f"<strong>Random Forest:</strong> {pred_dict.get('random_forest', 'N/A')}% ({pred_dict.get('random_forest_risk', 'N/A')})",
-                    f"<strong>XGBoost:</strong> {pred_dict.get('xgboost', 'N/A')}% ({pred_dict.get('xgboost_risk', 'N/A')})"
-                ])
-                
-                table_data.append([
-                    Paragraph(pred_dict.get('full_name', 'N/A'), styles['Normal']),
-                    Paragraph(str(pred_dict.get('created_at', 'N/A')), styles['Normal']),
-                    Paragraph(input_data_formatted, styles['Normal']),
-                    Paragraph(result_formatted, styles['Normal'])
-                ])
+        # Kunci cache sekaligus ETag: unduhan ulang tanpa perubahan data cukup satu query versi
+        cache = app.config['REPORT_CACHE']
+        if format == 'pdf':
+            # Kunci yang sama dengan job laporan, jadi PDF hasil antrean langsung terpakai di sini
+            report_params = dict({name: value for name, value in filters.items() if value is not None},
+                                 title="classification History Report")
+            etag = report_cache_key('classifications', report_params)
+        else:
+            etag = cache.key('export_classifications', dict(filters, format=format, gzip=compress),
+                             current_data_version())
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return revalidate(response)
 
-            # Create table
-            table = Table(table_data, colWidths=[80, 100, 180, 180])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('LEFTPADDING', (0,0), (-1,-1), 6),
-                ('RIGHTPADDING', (0,0), (-1,-1), 6),
-                ('TOPPADDING', (0,0), (-1,-1), 6),
-                ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-            ]))
-            elements.append(table)
+        # CSV/JSON dialirkan per batch dari cursor, memori tetap walau tabel besar
+        if format in EXPORT_FORMATS:
+            return revalidate(export_response(format, 'classifications_input', compress=compress,
+                                              cache=cache, cache_key=etag, **filters))
 
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name='classifications.pdf',
-                mimetype='application/pdf'
-            )
+        path = cache.get(etag, 'pdf')
+        if path is None:
+            # ReportLab tidak jalan di worker web: PDF dirender antrean laporan, halaman status mengunduhnya
+            return redirect(enqueue_report('classifications', report_params))
+        return revalidate(send_file(
+            path,
+            as_attachment=True,
+            download_name='classifications.pdf',
+            mimetype='application/pdf',
+            etag=etag,
+            conditional=True
+        ))
 
     @app.route('/admin/classifications/delete/<int:classification_id>', methods=['POST'])
     @admin_required
@@ -254,7 +262,6 @@ def adminRoute(app):
             if not classification:
                 flash('klasifikasi tidak ditemukan', 'danger')
                 return redirect(url_for('admin_classifications'))
-            conn.execute('DELETE FROM rf_results WHERE classification_id = ?', (classification_id,))
             conn.execute('DELETE FROM classifications WHERE id = ?', (classification_id,))
             conn.commit()
             flash('klasifikasi berhasil dihapus', 'success')
@@ -267,8 +274,8 @@ def adminRoute(app):
     @app.route('/print_all_classifications')
     @admin_required
     def print_all_classifications():
-        classifications = get_user_classifications()
-        return generate_classifications_pdf(classifications, "All classifications Report")
+        # PDF dibuat di background; halaman status menampilkan progress lalu mengunduh hasilnya
+        return redirect(enqueue_report('classifications', {'title': "All classifications Report"}))
 
     @app.route('/print_classifications_by_date_range')
     @admin_required
@@ -279,84 +286,15 @@ def adminRoute(app):
         if not start_date_str or not end_date_str:
             flash('Start date and end date are required for printing by range.', 'danger')
             return redirect(url_for('admin_classifications'))
+        try:
+            parse_date(start_date_str)
+            parse_date(end_date_str)
+        except ValueError:
+            flash('Format tanggal harus YYYY-MM-DD', 'danger')
+            return redirect(url_for('admin_classifications'))
 
-        classifications = get_user_classifications(start_date=start_date_str, end_date=end_date_str)
-        return generate_classifications_pdf(classifications, f"classifications Report from {start_date_str} to {end_date_str}")
-
-def generate_classifications_pdf(classifications, title_text):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Add title
-    title = Paragraph(title_text, styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-
-    # Create table data
-    table_data = [['User', 'Date', 'Input Data', 'Result']]
-    for pred in classifications:
-        pred_dict = dict(pred)
-
-        # Format input data directly from pred_dict
-        input_data_formatted = "<br/>".join([
-            f"<strong>Age:</strong> {pred_dict.get('age', 'N/A')}",
-            f"<strong>Sex:</strong> {pred_dict.get('sex', 'N/A')}",
-            f"<strong>Chest Pain Type:</strong> {pred_dict.get('chestpaintype', 'N/A')}",
-            f"<strong>Resting BP:</strong> {pred_dict.get('restingbp', 'N/A')}",
-            f"<strong>Cholesterol:</strong> {pred_dict.get('cholesterol', 'N/A')}",
-            f"<strong>Fasting BS:</strong> {pred_dict.get('fastingbs', 'N/A')}",
-            f"<strong>Resting ECG:</strong> {pred_dict.get('restingecg', 'N/A')}",
-            f"<strong>Max HR:</strong> {pred_dict.get('maxhr', 'N/A')}",
-            f"<strong>Exercise Angina:</strong> {pred_dict.get('exerciseangina', 'N/A')}",
-            f"<strong>Old Peak:</strong> {pred_dict.get('oldpeak', 'N/A')}",
-            f"<strong>ST Slope:</strong> {pred_dict.get('stslope', 'N/A')}"
-        ])
-        
-        # Format result directly from pred_dict
-        result_formatted = "<br/>".join([
-            f"<strong>Decision Tree:</strong> {pred_dict.get('decision_tree', 'N/A')}% ({pred_dict.get('decision_tree_risk', 'N/A')})",
-            f"<strong>Random Forest:</strong> {pred_dict.get('random_forest', 'N/A')}% ({pred_dict.get('random_forest_risk', 'N/A')})",
-            f"<strong>XGBoost:</strong> {pred_dict.get('xgboost', 'N/A')}% ({pred_dict.get('xgboost_risk', 'N/A')})"
-        ])
-        
-        table_data.append([
-            Paragraph(pred_dict.get('full_name', 'N/A'), styles['Normal']),
-            Paragraph(str(pred_dict.get('created_at', 'N/A')), styles['Normal']),
-            Paragraph(input_data_formatted, styles['Normal']),
-            Paragraph(result_formatted, styles['Normal'])
-        ])
-
-    # Create table
-    # Increased column widths for better readability and to prevent text overflow
-    table = Table(table_data, colWidths=[80, 100, 180, 180])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('LEFTPADDING', (0,0), (-1,-1), 6),
-        ('RIGHTPADDING', (0,0), (-1,-1), 6),
-        ('TOPPADDING', (0,0), (-1,-1), 6),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-    ]))
-    elements.append(table)
-
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name='classifications.pdf',
-        mimetype='application/pdf'
-    )
+        return redirect(enqueue_report('classifications', {
+            'title': f"classifications Report from {start_date_str} to {end_date_str}",
+            'start_date': start_date_str,
+            'end_date': end_date_str,
+        }))
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from db.database import get_db_connection, get_user_classifications
+from db.database import get_db_connection, CLASSIFICATION_SELECT
+from routes.datatables import classifications_datatable
 from auth.middleware import login_required, admin_required
 from datetime import datetime
 
@@ -8,12 +9,13 @@ classification_bp = Blueprint('classification', __name__)
 @classification_bp.route('/classifications')
 @login_required
 def list_classifications():
-    conn = get_db_connection()
-    try:
-        classifications = get_user_classifications(session.get('user_id'))
-        return render_template('classifications/list.html', classifications=classifications)
-    finally:
-        conn.close()
+    # Baris tabel diambil per halaman lewat /classifications/data
+    return render_template('classifications/list.html')
+
+@classification_bp.route('/classifications/data')
+@login_required
+def classifications_data():
+    return classifications_datatable(request.args, user_id=session.get('user_id'))
 
 @classification_bp.route('/classifications/<int:id>')
 @login_required
@@ -21,11 +23,7 @@ def view_classification(id):
     conn = get_db_connection()
     try:
         classification = conn.execute(
-            """SELECT p.*, u.username, u.full_name, r.rf_result, r.rf_keterangan, r.created_at as rf_created_at \
-            FROM classifications p \
-            JOIN users u ON p.user_id = u.id \
-            JOIN rf_results r ON p.id = r.classification_id \
-            WHERE p.id = ? AND p.user_id = ?""",
+            CLASSIFICATION_SELECT + "WHERE p.id = ? AND p.user_id = ?",
             (id, session.get('user_id'))
         ).fetchone()
         if not classification:
@@ -41,11 +39,7 @@ def edit_classification(id):
     conn = get_db_connection()
     try:
         classification = conn.execute(
-            """SELECT p.*, u.username, u.full_name, r.rf_result, r.rf_keterangan, r.created_at as rf_created_at \
-            FROM classifications p \
-            JOIN users u ON p.user_id = u.id \
-            JOIN rf_results r ON p.id = r.classification_id \
-            WHERE p.id = ? AND p.user_id = ?""",
+            CLASSIFICATION_SELECT + "WHERE p.id = ? AND p.user_id = ?",
             (id, session.get('user_id'))
         ).fetchone()
         if not classification:
@@ -96,9 +90,6 @@ def delete_classification(id):
         if not classification:
             flash('klasifikasi tidak ditemukan', 'error')
             return redirect(url_for('classification.list_classifications'))
-        # Delete from rf_results first due to foreign key constraint
-        conn.execute('DELETE FROM rf_results WHERE classification_id = ?', (id,))
-        # Then delete from classifications
         conn.execute('DELETE FROM classifications WHERE id = ? AND user_id = ?', (id, session.get('user_id')))
         conn.commit()
         flash('klasifikasi berhasil dihapus', 'success')
@@ -0,0 +1,96 @@
+from flask import jsonify
+from datetime import datetime
+import time
+from db.database import get_db_connection, classifications_page_query, count_classifications_query, CLASSIFICATION_SORT_COLUMNS
+from monitoring.metrics import stage, lap
+
+DEFAULT_PAGE_LENGTH = 10
+MAX_PAGE_LENGTH = 100
+
+DATA_STAGES = {
+    route: (stage(route, 'query'), stage(route, 'serialize'))
+    for route in ('history_data', 'classifications_data', 'admin_classifications_data')
+}
+
+
+def parse_date(value):
+    if not value:
+        return None
+    datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+def parse_datatables_args(args):
+    """Read the DataTables server-side parameters plus our date filters and keyset cursor."""
+    draw = args.get('draw', 0, type=int)
+    start = max(args.get('start', 0, type=int), 0)
+    length = args.get('length', DEFAULT_PAGE_LENGTH, type=int)
+    if length <= 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+
+    column_index = args.get('order[0][column]', type=int)
+    order_by = args.get(f'columns[{column_index}][data]', 'created_at') if column_index is not None else 'created_at'
+    if order_by not in CLASSIFICATION_SORT_COLUMNS:
+        order_by = 'created_at'
+    descending = args.get('order[0][dir]', 'desc') != 'asc'
+
+    cursor = None
+    cursor_created_at = args.get('cursor_created_at')
+    cursor_id = args.get('cursor_id', type=int)
+    if cursor_created_at and cursor_id is not None:
+        cursor = (cursor_created_at, cursor_id)
+
+    return {
+        'draw': draw,
+        'start': start,
+        'length': length,
+        'search': args.get('search[value]', '').strip() or None,
+        'order_by': order_by,
+        'descending': descending,
+        'start_date': parse_date(args.get('start_date')),
+        'end_date': parse_date(args.get('end_date')),
+        'cursor': cursor,
+    }
+
+
+def classifications_datatable(args, user_id=None, route='classifications_data'):
+    """JSON response for a DataTables table of classifications, optionally limited to one user."""
+    query_hist, serialize_hist = DATA_STAGES[route]
+    try:
+        params = parse_datatables_args(args)
+    except ValueError:
+        return jsonify({'error': 'Format tanggal harus YYYY-MM-DD'}), 400
+
+    t = time.perf_counter_ns()
+    filters = dict(user_id=user_id, start_date=params['start_date'], end_date=params['end_date'])
+    conn = get_db_connection()
+    try:
+        query, query_params = count_classifications_query(**filters)
+        records_total = conn.execute(query, query_params).fetchone()[0]
+        if params['search']:
+            query, query_params = count_classifications_query(search=params['search'], **filters)
+            records_filtered = conn.execute(query, query_params).fetchone()[0]
+        else:
+            records_filtered = records_total
+        query, query_params = classifications_page_query(
+            search=params['search'], order_by=params['order_by'], descending=params['descending'],
+            limit=params['length'], offset=params['start'], cursor=params['cursor'], **filters
+        )
+        rows = conn.execute(query, query_params).fetchall()
+    finally:
+        conn.close()
+    t = lap(query_hist, t)
+
+    data = [dict(row) for row in rows]
+    next_cursor = None
+    if data and params['order_by'] == 'created_at':
+        next_cursor = {'created_at': data[-1]['created_at'], 'id': data[-1]['id']}
+    response = jsonify({
+        'draw': params['draw'],
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': data,
+        'next_cursor': next_cursor,
+    })
+    lap(serialize_hist, t)
+    return response
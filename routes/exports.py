@@ -0,0 +1,114 @@
+from flask import Response, send_file, stream_with_context
+import csv
+import io
+import json
+import time
+import zlib
+from db.database import get_db_connection, export_query, EXPORT_COLUMNS
+from routes.datatables import parse_date
+from monitoring import metrics
+from monitoring.metrics import stage
+
+EXPORT_FETCH_ROWS = 1000
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+EXPORT_QUERY = stage('export_classifications', 'query')
+EXPORT_SERIALIZE = stage('export_classifications', 'serialize')
+
+
+def parse_export_args(args):
+    """Filters for an export request. Raises ValueError on a malformed date."""
+    return {
+        'user_id': args.get('user_id', type=int),
+        'start_date': parse_date(args.get('start_date')),
+        'end_date': parse_date(args.get('end_date')),
+    }
+
+
+def _format_rows(output_format, rows, first):
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        return buffer.getvalue()
+    records = [json.dumps(dict(zip(EXPORT_COLUMNS, row))) for row in rows]
+    if output_format == 'ndjson':
+        return ''.join(record + '\n' for record in records)
+    # Array JSON ditulis bertahap: "[" di awal, koma di antara batch, "]" di akhir
+    return ('' if first else ',') + ','.join(records)
+
+
+def iter_export(output_format, user_id=None, start_date=None, end_date=None, fetch_rows=EXPORT_FETCH_ROWS):
+    """Yield the export as text pieces, reading fetch_rows rows at a time."""
+    query, params = export_query(user_id, start_date, end_date)
+    query_ns = serialize_ns = 0
+    conn = get_db_connection()
+    try:
+        t = time.perf_counter_ns()
+        cursor = conn.execute(query, params)
+        query_ns += time.perf_counter_ns() - t
+        if output_format == 'csv':
+            yield ','.join(EXPORT_COLUMNS) + '\n'
+        elif output_format == 'json':
+            yield '['
+        first = True
+        while True:
+            t0 = time.perf_counter_ns()
+            rows = cursor.fetchmany(fetch_rows)
+            t1 = time.perf_counter_ns()
+            query_ns += t1 - t0
+            if not rows:
+                break
+            piece = _format_rows(output_format, rows, first)
+            serialize_ns += time.perf_counter_ns() - t1
+            first = False
+            yield piece
+        if output_format == 'json':
+            yield ']'
+    finally:
+        conn.close()
+        if metrics.ENABLED:
+            EXPORT_QUERY.observe(query_ns * 1e-9)
+            EXPORT_SERIALIZE.observe(serialize_ns * 1e-9)
+
+
+def gzip_stream(pieces, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(output_format, filename, compress=False, cache=None, cache_key=None, **filters):
+    """Streamed download of classification inputs; memory use does not depend on the row count.
+
+    With a report cache the stream is stored while it is sent, and later requests for the
+    same cache_key are answered from that file.
+    """
+    mimetype, extension = EXPORT_FORMATS[output_format]
+    if compress:
+        mimetype = 'application/gzip'
+        extension += '.gz'
+    filename = f'{filename}.{extension}'
+    if cache is not None:
+        cached = cache.get(cache_key, extension)
+        if cached is not None:
+            return send_file(cached, mimetype=mimetype, as_attachment=True, download_name=filename,
+                             etag=cache_key, conditional=True)
+
+    body = iter_export(output_format, **filters)
+    if compress:
+        body = gzip_stream(body)
+    if cache is not None:
+        body = cache.tee(cache_key, extension, body)
+    response = Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+    if cache_key:
+        response.set_etag(cache_key)
+    return response
@@ -1,35 +1,275 @@
 import os
-import joblib
+import threading
+import time
 import logging
 import numpy as np
+from ml.forest_engine import CompiledForest
+from ml.prediction_cache import PredictionCache
+from ml.micro_batcher import MicroBatcher
+from ml.artifact import ENGINE_ARRAYS, is_current, load_engine, memory_report, read_meta
+from ml.preprocessing import Preprocessor, read_columns
+from ml.quantized import QUANTIZED_FORMAT, QuantizedForest, load_quantized, validation_sweep
+from ml.registry import ModelRegistry
+
+REFERENCE_CSV = 'heart.csv'
+MODEL_PATH = 'models/models_and_scaler_smoteenn.pkl'
+ENGINE_DIR = 'models/rf_engine'
+QUANTIZED_DIR = 'models/rf_quantized'
+LEGACY_VERSION = 'legacy'
+
+_reload_lock = threading.Lock()
+
+
+class ModelBundle:
+    """Everything needed to score one model version; swapped into app.config as a single object."""
+
+    def __init__(self, version, rf_model=None, scaler=None, engine=None, source=None, load_seconds=None,
+                 compiled_bytes=None, preprocessor=None):
+        self.version = version
+        self.rf_model = rf_model
+        self.scaler = scaler
+        self.engine = engine
+        # Encoding milik versi model ini; encoder hasil compile dipakai di setiap request
+        self.preprocessor = preprocessor
+        self.encoder = preprocessor.compile() if preprocessor is not None else None
+        self.source = source
+        self.load_seconds = load_seconds
+        # Ukuran forest terkompilasi yang digantikan oleh model terkuantisasi, untuk laporan memori
+        self.compiled_bytes = compiled_bytes
+
+    @property
+    def engine_bytes(self):
+        if self.engine is None:
+            return None
+        if isinstance(self.engine, QuantizedForest):
+            return self.engine.nbytes
+        return int(sum(getattr(self.engine, name).nbytes for name in ENGINE_ARRAYS))
+
+
+def model_preprocessor(saved, csv_path=REFERENCE_CSV):
+    """The preprocessor saved with a model; models saved before it existed get one fitted on heart.csv,
+    which is what their training did."""
+    if saved:
+        return Preprocessor.from_dict(saved)
+    logging.warning(f"Model has no saved preprocessor, fitting one on {csv_path}")
+    return Preprocessor.fit(read_columns(csv_path))
+
+def sample_matrix(preprocessor):
+    # Satu baris contoh dari preprocessor model itu sendiri, bukan array yang ditulis tangan
+    return preprocessor.compile().encode_records([preprocessor.reference_record()])
+
+def load_reference_matrix(preprocessor, csv_path=REFERENCE_CSV):
+    # Encode heart.csv dengan encoder yang sama dengan /predict
+    return preprocessor.compile().encode_columns(read_columns(csv_path))
+
+def build_engine(rf_model, scaler, preprocessor, csv_path=REFERENCE_CSV):
+    """Compile the forest and check it against sklearn on heart.csv. Returns None on mismatch."""
+    start = time.perf_counter()
+    engine = CompiledForest.from_sklearn(rf_model, scaler)
+    if os.path.exists(csv_path):
+        mismatches = engine.verify(load_reference_matrix(preprocessor, csv_path), rf_model, scaler)
+        if mismatches:
+            logging.error(f"❌ Compiled forest differs from sklearn on {mismatches} rows of {csv_path}; using sklearn")
+            return None
+    else:
+        logging.warning(f"{csv_path} not found, skipping compiled forest equivalence check")
+    logging.info(f"✅ Compiled forest ready: {engine.n_trees} trees, {engine.n_nodes} nodes "
+                 f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return engine
+
+def build_quantized(rf_model, scaler, preprocessor, csv_path=REFERENCE_CSV):
+    """Quantize the forest and require bit-identical output on a validation sweep. Returns None otherwise."""
+    if not os.path.exists(csv_path):
+        # Tanpa data referensi sweep tidak bisa dijalankan; forest terkompilasi tetap dipakai
+        logging.warning(f"{csv_path} not found, skipping quantized forest")
+        return None
+    start = time.perf_counter()
+    forest = QuantizedForest.from_sklearn(rf_model, scaler)
+    sweep = validation_sweep(rf_model, scaler, load_reference_matrix(preprocessor, csv_path))
+    mismatches = forest.verify(sweep, rf_model, scaler)
+    if mismatches:
+        logging.error(f"❌ Quantized forest differs from sklearn on {mismatches} of {len(sweep)} sweep rows; "
+                      f"keeping the compiled forest")
+        return None
+    logging.info(f"✅ Quantized forest ready: {forest.nbytes} bytes for {forest.n_nodes} nodes, "
+                 f"identical on {len(sweep)} sweep rows ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return forest
+
+def model_report(app):
+    """Per-worker load time and memory usage, to compare pickle vs shared mmap loading."""
+    return dict(app.config.get('MODEL_LOAD_REPORT', {}), memory=memory_report())
+
+def resolve_model_paths(version=None):
+    """Return (version, pickle path, engine dir, quantized dir) for a registry version, the current one,
+    or the legacy files."""
+    registry = ModelRegistry()
+    if version is None and registry.exists():
+        version = registry.current_version()
+    if version is None:
+        return LEGACY_VERSION, MODEL_PATH, ENGINE_DIR, QUANTIZED_DIR
+    return version, registry.model_path(version), registry.engine_dir(version), registry.quantized_dir(version)
+
+def load_bundle(config, version=None):
+    version, model_path, engine_dir, quantized_dir = resolve_model_paths(version)
 
-def loadModel(app):
     def load_models():
-        model_path = 'models/models_and_scaler_smoteenn.pkl'
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Models not found at {model_path}. Please run train_models.py first.")
         try:
+            # joblib (dan sklearn lewat unpickle) hanya dimuat jika artifact mmap tidak tersedia
+            import joblib
             models = joblib.load(model_path)
             required_keys = ['rf_model', 'scaler']
             missing_keys = [key for key in required_keys if key not in models]
             if missing_keys:
                 raise KeyError(f"Missing required models in file: {', '.join(missing_keys)}")
-            return models['rf_model'], models['scaler']
+            return models['rf_model'], models['scaler'], models.get('preprocessor')
         except Exception as e:
             raise Exception(f"Error loading models: {str(e)}")
-    try:
-        logging.info("Loading ML models...")
-        rf_model, scaler = load_models()
+
+    start = time.perf_counter()
+    use_engine = config.get('USE_COMPILED_FOREST', True)
+    use_quantized = use_engine and config.get('MODEL_QUANTIZED', True)
+    mmap = config.get('MODEL_MMAP', True)
+    if use_quantized and is_current(quantized_dir, model_path, QUANTIZED_FORMAT):
+        # Versi terkuantisasi (~1/5 memori) sudah diverifikasi identik saat training
+        engine = load_quantized(quantized_dir, mmap=mmap)
+        meta = read_meta(quantized_dir)
+        preprocessor = model_preprocessor(meta.get('preprocessor'))
+        rf_pred = engine.predict_proba(sample_matrix(preprocessor))
+        if not isinstance(rf_pred, np.ndarray):
+            raise ValueError("Quantized forest failed to make classifications")
+        source = 'quantized-mmap' if mmap else 'quantized'
+        bundle = ModelBundle(version, engine=engine, source=source, preprocessor=preprocessor,
+                             compiled_bytes=meta.get('compiled_nbytes'))
+        logging.info(f"✅ Quantized forest {version} loaded from {quantized_dir}")
+    elif use_engine and is_current(engine_dir, model_path):
+        # Artifact numpy di-mmap: halaman memori dipakai bersama oleh semua worker
+        engine = load_engine(engine_dir, mmap=mmap)
+        preprocessor = model_preprocessor(read_meta(engine_dir).get('preprocessor'))
+        rf_pred = engine.predict_proba(sample_matrix(preprocessor))
+        if not isinstance(rf_pred, np.ndarray):
+            raise ValueError("Compiled forest failed to make classifications")
+        source = 'artifact-mmap' if mmap else 'artifact'
+        bundle = ModelBundle(version, engine=engine, source=source, preprocessor=preprocessor)
+        logging.info(f"✅ Compiled forest {version} loaded from {engine_dir}")
+    else:
+        rf_model, scaler, saved_preprocessor = load_models()
+        preprocessor = model_preprocessor(saved_preprocessor)
         # Validate models
-        test_data = np.array([[40, 1, 0, 120, 200, 0, 1, 150, 0, 0.0, 1]])  # Sample data
-        test_data_scaled = scaler.transform(test_data)
+        test_data_scaled = scaler.transform(sample_matrix(preprocessor))
         rf_pred = rf_model.predict_proba(test_data_scaled)
         if not isinstance(rf_pred, np.ndarray):
             raise ValueError("Random Forest model failed to make classifications")
-        # Store models in app config
-        app.config['RF_MODEL'] = rf_model
-        app.config['SCALER'] = scaler
-        logging.info("✅ Random Forest model and scaler loaded successfully")
+        engine = build_engine(rf_model, scaler, preprocessor) if use_engine else None
+        bundle = ModelBundle(version, rf_model=rf_model, scaler=scaler, engine=engine, source='pickle',
+                             preprocessor=preprocessor)
+        logging.info(f"✅ Random Forest model {version} and scaler loaded successfully")
+    bundle.load_seconds = round(time.perf_counter() - start, 4)
+    return bundle
+
+def warm_up(bundle):
+    # Jalankan beberapa prediksi dulu agar halaman mmap & cache CPU sudah panas sebelum dipakai
+    from predict_route import run_model
+    sample = load_reference_matrix(bundle.preprocessor) if os.path.exists(REFERENCE_CSV) else None
+    if sample is not None:
+        run_model(bundle, sample[:64])
+        for row in sample[:8]:
+            run_model(bundle, row[None, :])
+
+def install_bundle(app, bundle):
+    # Satu assignment: request yang sedang berjalan tetap memakai bundle lamanya sampai selesai
+    app.config['MODEL'] = bundle
+    app.config['RF_MODEL'] = bundle.rf_model
+    app.config['SCALER'] = bundle.scaler
+    app.config['RF_ENGINE'] = bundle.engine
+    app.config['MODEL_LOAD_REPORT'] = {
+        'version': bundle.version,
+        'source': bundle.source,
+        'load_seconds': bundle.load_seconds,
+        'loaded_by_pid': os.getpid(),
+        'engine_bytes': bundle.engine_bytes,
+        'compiled_engine_bytes': bundle.compiled_bytes,
+    }
+    # Model baru berarti hasil cache lama tidak berlaku lagi
+    cache = app.config.get('PREDICTION_CACHE')
+    if cache is not None:
+        cache.clear()
+
+def reload_model(app, version=None):
+    """Load, warm up and sanity-check a model version, then swap it in. Returns the new version."""
+    with _reload_lock:
+        status = app.config.setdefault('MODEL_RELOAD_STATUS', {})
+        status.update({'state': 'loading', 'requested_version': version, 'error': None})
+        try:
+            bundle = load_bundle(app.config, version)
+            warm_up(bundle)
+            install_bundle(app, bundle)
+            status.update({'state': 'ready', 'version': bundle.version})
+            logging.info(f"✅ Model {bundle.version} is now serving")
+            return bundle.version
+        except Exception as e:
+            status.update({'state': 'failed', 'error': str(e)})
+            logging.error(f"❌ Model reload failed, keeping {app.config['MODEL'].version}: {str(e)}")
+            raise
+
+def reload_model_async(app, version=None):
+    thread = threading.Thread(target=_reload_quietly, args=(app, version), name='model-reload', daemon=True)
+    thread.start()
+    return thread
+
+def _reload_quietly(app, version):
+    try:
+        reload_model(app, version)
+    except Exception:
+        pass
+
+def start_registry_watcher(app):
+    """Poll the registry manifest; when the current version changes, hot-reload it in this worker."""
+    if app.config.get('MODEL_WATCHER_PID') == os.getpid():
+        return
+    app.config['MODEL_WATCHER_PID'] = os.getpid()
+    interval = app.config.get('MODEL_WATCH_INTERVAL', 5.0)
+    registry = ModelRegistry()
+
+    def watch():
+        last_mtime = registry.manifest_mtime()
+        while True:
+            time.sleep(interval)
+            mtime = registry.manifest_mtime()
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                current = registry.current_version()
+                if current and current != app.config['MODEL'].version:
+                    reload_model(app, current)
+            except Exception as e:
+                logging.error(f"Model registry watcher error: {str(e)}")
+
+    threading.Thread(target=watch, name='model-registry-watcher', daemon=True).start()
+
+def loadModel(app):
+    try:
+        logging.info("Loading ML models...")
+        bundle = load_bundle(app.config)
+        install_bundle(app, bundle)
+        if app.config.get('PREDICTION_CACHE') is None:
+            app.config['PREDICTION_CACHE'] = PredictionCache(app.config.get('PREDICTION_CACHE_SIZE', 4096))
+        if app.config.get('PREDICT_MICROBATCH') and app.config.get('MICRO_BATCHER') is None:
+            from predict_route import run_model_proba
+            # Setiap baris membawa bundle-nya sendiri, jadi hasil selalu dari versi model yang dicatat
+            app.config['MICRO_BATCHER'] = MicroBatcher(
+                run_model_proba,
+                window_ms=app.config.get('PREDICT_MICROBATCH_WINDOW_MS', 2.0),
+                max_batch=app.config.get('PREDICT_MICROBATCH_MAX_ROWS', 64)
+            )
+            logging.info("✅ Micro-batching enabled for /predict")
+        if app.config.get('MODEL_WATCH_INTERVAL'):
+            # Thread watcher dimulai per proses (lihat before_request), karena tidak ikut ter-fork
+            @app.before_request
+            def _ensure_registry_watcher():
+                start_registry_watcher(app)
     except FileNotFoundError as e:
         logging.error(f"❌ Error: {e}")
         raise
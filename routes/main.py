@@ -1,25 +1,40 @@
-from flask import render_template, request, redirect, url_for, session, flash, send_file
-import os
-import pandas as pd
-from werkzeug.security import generate_password_hash, check_password_hash
-from db.database import get_db_connection, get_user_classifications
-from auth.middleware import login_required, admin_required
-import joblib
-import json
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from datetime import datetime
+from flask import render_template, request, redirect, url_for, session, flash, jsonify
+from db.database import get_db_connection, HAS_USER_CLASSIFICATIONS
+from routes.datatables import classifications_datatable, parse_date
+from routes.reportRoutes import enqueue_report
+from auth.middleware import login_required
+import time
+from monitoring.metrics import stage, lap
+
+HISTORY_QUERY = stage('history', 'query')
+HISTORY_RENDER = stage('history', 'render')
 
 def main(app):
     @app.route('/')
     def home():
-        df = pd.read_csv('heart.csv')
-        data = df.head(10).values.tolist()
-        return render_template('index.html', 
-                            data=data)
+        # Dataset sudah ada di memori (dimuat ulang hanya jika heart.csv berubah)
+        dataset = app.config['DATASET'].get()
+        return render_template('index.html',
+                            data=dataset.preview(0, 10),
+                            stats=dataset.stats)
+
+    @app.route('/api/dataset/stats')
+    def dataset_stats():
+        dataset = app.config['DATASET'].get()
+        return jsonify(dict(dataset.stats, version=dataset.mtime))
+
+    @app.route('/api/dataset/preview')
+    def dataset_preview():
+        dataset = app.config['DATASET'].get()
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', 10, type=int)
+        return jsonify({
+            'columns': dataset.columns,
+            'offset': offset,
+            'total': dataset.rows,
+            'rows': dataset.preview(offset, limit),
+            'version': dataset.mtime,
+        })
 
     @app.route('/klasifikasi')
     @login_required
@@ -29,85 +44,44 @@ def main(app):
     @app.route('/history')
     @login_required
     def history():
+        # Baris tabel diambil per halaman lewat /history/data
+        t = time.perf_counter_ns()
         conn = get_db_connection()
         user = conn.execute('SELECT full_name FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-        classifications = conn.execute(
-            """SELECT p.*, r.rf_result, r.rf_keterangan, r.created_at as rf_created_at \
-            FROM classifications p \
-            JOIN rf_results r ON p.id = r.classification_id \
-            WHERE p.user_id = ? \
-            ORDER BY p.created_at DESC""",
-            (session['user_id'],)
-        ).fetchall()
+        has_classifications = conn.execute(HAS_USER_CLASSIFICATIONS, (session['user_id'],)).fetchone() is not None
         conn.close()
-        processed_classifications = []
-        for pred in classifications:
-            processed_pred = {
-                'id': pred['id'],
-                'created_at': pred['created_at'],
-                'age': pred['age'],
-                'sex': pred['sex'],
-                'chestpaintype': pred['chestpaintype'],
-                'restingbp': pred['restingbp'],
-                'cholesterol': pred['cholesterol'],
-                'fastingbs': pred['fastingbs'],
-                'restingecg': pred['restingecg'],
-                'maxhr': pred['maxhr'],
-                'exerciseangina': pred['exerciseangina'],
-                'oldpeak': pred['oldpeak'],
-                'stslope': pred['stslope'],
-                'rf_result': pred['rf_result'],
-                'rf_keterangan': pred['rf_keterangan']
-            }
-            processed_classifications.append(processed_pred)
-        return render_template('history.html', classifications=processed_classifications, user_full_name=user['full_name'])
+        t = lap(HISTORY_QUERY, t)
+        page = render_template('history.html', has_classifications=has_classifications, user_full_name=user['full_name'])
+        lap(HISTORY_RENDER, t)
+        return page
+
+    @app.route('/history/data')
+    @login_required
+    def history_data():
+        return classifications_datatable(request.args, user_id=session['user_id'], route='history_data')
 
     @app.route('/print_user_history')
+    @login_required
     def print_user_history():
-        user_id = session.get('user_id')
-        classifications = get_user_classifications(user_id=user_id)
-        return generate_user_history_pdf(classifications, "classification History")
+        return redirect(enqueue_report('user_history', {
+            'title': "classification History",
+            'user_id': session['user_id'],
+        }))
 
     @app.route('/print_user_history_by_date_range')
+    @login_required
     def print_user_history_by_date_range():
-        user_id = session.get('user_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        classifications = get_user_classifications(user_id=user_id, start_date=start_date, end_date=end_date)
-        return generate_user_history_pdf(classifications, f"classification History {start_date} to {end_date}")
-
-def generate_user_history_pdf(classifications, title_text):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-    title = Paragraph(title_text, styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    table_data = [['Date', 'Hasil', 'Keterangan']]
-    for pred in classifications:
-        hasil = pred['rf_result'] if 'rf_result' in pred.keys() else '-'
-        ket = pred['rf_keterangan'] if 'rf_keterangan' in pred.keys() else '-'
-        table_data.append([
-            str(pred['created_at']),
-            hasil,
-            ket
-        ])
-    table = Table(table_data, colWidths=[150, 150, 250])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name='classification_history.pdf', mimetype='application/pdf')
+        try:
+            parse_date(start_date)
+            parse_date(end_date)
+        except ValueError:
+            flash('Format tanggal harus YYYY-MM-DD', 'danger')
+            return redirect(url_for('history'))
+        return redirect(enqueue_report('user_history', {
+            'title': f"classification History {start_date} to {end_date}",
+            'user_id': session['user_id'],
+            'start_date': start_date,
+            'end_date': end_date,
+        }))
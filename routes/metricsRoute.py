@@ -0,0 +1,71 @@
+import hmac
+import os
+import time
+from flask import Response, request, g
+from monitoring import metrics
+
+
+def metricsRoute(app):
+    metrics.ENABLED = app.config.get('METRICS_ENABLED', True)
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_start_ns = time.perf_counter_ns()
+
+    @app.after_request
+    def _record_request_time(response):
+        start = g.get('request_start_ns')
+        if start is not None and request.endpoint:
+            # Respons streaming hanya diukur sampai header siap
+            metrics.lap(metrics.REGISTRY.histogram(
+                'heart_http_request_seconds', 'Request latency per endpoint',
+                endpoint=request.endpoint), start)
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            header = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+                return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        elif not (app.config.get('METRICS_PUBLIC') or app.debug):
+            # Metrik memuat versi model dan isi antrean; tanpa token hanya terbuka jika diminta eksplisit
+            return Response('Metrics are disabled: set METRICS_TOKEN, or METRICS_PUBLIC=1 to expose them '
+                            'without authentication\n', status=403, mimetype='text/plain')
+        extra, gauges = collect_component_metrics(app)
+        body = metrics.render_prometheus(extra, gauges, common_labels={'worker': os.getpid()})
+        return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def collect_component_metrics(app):
+    extra = []
+    gauges = []
+    cache = app.config.get('PREDICTION_CACHE')
+    if cache is not None:
+        stats = cache.stats()
+        for key in ('hits', 'misses', 'evictions', 'invalidations'):
+            gauges.append((f'heart_prediction_cache_{key}_total', f'Prediction cache {key}', 'counter', {}, stats[key]))
+        gauges.append(('heart_prediction_cache_size', 'Entries in the prediction cache', 'gauge', {}, stats['size']))
+    batcher = app.config.get('MICRO_BATCHER')
+    if batcher is not None:
+        extra.append(('heart_microbatch_size', 'Rows per micro-batch', {}, batcher.batch_size))
+        extra.append(('heart_microbatch_queue_depth', 'Rows still queued when a micro-batch is dispatched', {}, batcher.queue_depth))
+        extra.append(('heart_microbatch_latency_ms', 'Enqueue-to-result latency of micro-batched rows (ms)', {}, batcher.latency_ms))
+    writer = app.config.get('CLASSIFICATION_WRITER')
+    if writer is not None:
+        stats = writer.stats()
+        extra.append(('heart_write_behind_queue_depth', 'Write-behind queue depth after each drain', {}, writer.queue_depth))
+        extra.append(('heart_write_behind_batch_rows', 'Rows per write-behind transaction', {}, writer.batch_rows))
+        extra.append(('heart_write_behind_flush_ms', 'Write-behind transaction latency (ms)', {}, writer.flush_ms))
+        for key in ('written', 'rejected', 'failed'):
+            gauges.append((f'heart_write_behind_{key}_total', f'Write-behind rows {key}', 'counter', {}, stats[key]))
+    reports = app.config.get('REPORT_QUEUE')
+    if reports is not None:
+        for status, count in reports.stats().items():
+            gauges.append(('heart_report_jobs', 'Report jobs by status', 'gauge', {'status': status}, count))
+    model = app.config.get('MODEL')
+    if model is not None:
+        gauges.append(('heart_model_info', 'Model version served by this worker', 'gauge',
+                       {'version': model.version, 'source': model.source}, 1))
+    return extra, gauges
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+from flask import render_template, session, jsonify, send_file, abort, url_for, current_app, redirect, flash
+from auth.middleware import login_required
+from db.database import get_db_connection
+from db.stats import data_version
+from reports.jobs import REPORT_KINDS, TIMESTAMP_FORMAT, get_job
+
+
+def current_data_version():
+    """Data version for report cache keys: classification revision/max id/count plus the served model."""
+    conn = get_db_connection()
+    version = data_version(conn)
+    conn.close()
+    model = current_app.config.get('MODEL')
+    return f"{version}-{model.version if model is not None else ''}"
+
+
+def revalidate(response):
+    # Browser boleh menyimpan, tapi harus bertanya ulang (If-None-Match) sebelum memakainya
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def report_cache_key(kind, params):
+    """Report cache key (and ETag) of a PDF report job for the current data."""
+    return current_app.config['REPORT_CACHE'].key(kind, params, current_data_version())
+
+
+def enqueue_report(kind, params):
+    """Queue a PDF report for the logged-in user and return the URL of its status page."""
+    cache_key = report_cache_key(kind, params)
+    job_id = current_app.config['REPORT_QUEUE'].submit(kind, params, session['user_id'], cache_key)
+    return url_for('report_status', job_id=job_id)
+
+
+def _own_job(job_id):
+    job = get_job(job_id)
+    if job is None or job['user_id'] != session['user_id']:
+        abort(404)
+    return job
+
+
+def _recover(job):
+    # Job 'done' yang PDF-nya sudah dihapus cache dibuat ulang, bukan 404
+    return current_app.config['REPORT_QUEUE'].recover(job)
+
+
+def reportRoutes(app):
+    @app.route('/reports/<job_id>')
+    @login_required
+    def report_status(job_id):
+        job, _ = _recover(_own_job(job_id))
+        return render_template('reports/status.html', job=job)
+
+    @app.route('/reports/<job_id>/status')
+    @login_required
+    def report_status_data(job_id):
+        job, requeued = _recover(_own_job(job_id))
+        return jsonify({
+            'status': job['status'],
+            'requeued': requeued,
+            'progress': job['progress'],
+            'error': job['error'],
+            'expires_at': job['expires_at'],
+            'download_url': url_for('report_download', job_id=job_id) if job['status'] == 'done' else None,
+        })
+
+    @app.route('/reports/<job_id>/download')
+    @login_required
+    def report_download(job_id):
+        job, requeued = _recover(_own_job(job_id))
+        if job['status'] == 'done' and job['expires_at'] < datetime.now().strftime(TIMESTAMP_FORMAT):
+            abort(410)
+        if job['status'] != 'done' or not job['file_path'] or not os.path.exists(job['file_path']):
+            # Halaman status menampilkan progres (atau error) dan mengunduh otomatis setelah selesai
+            if requeued:
+                flash('File laporan sudah dihapus dari cache, laporan sedang dibuat ulang.', 'info')
+            return redirect(url_for('report_status', job_id=job_id))
+        _, download_name = REPORT_KINDS[job['kind']]
+        return revalidate(send_file(job['file_path'], as_attachment=True, download_name=download_name,
+                                    mimetype='application/pdf', etag=job['cache_key'] or True, conditional=True))
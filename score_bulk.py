@@ -0,0 +1,159 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from multiprocessing import Pool
+
+from predict_route import normalize_csv_header, score_chunk
+from routes.loadModel import load_bundle
+
+# Model per proses worker, dimuat sekali oleh initializer
+_bundle = None
+_output_format = None
+
+
+def init_worker(version, use_engine, output_format):
+    global _bundle, _output_format
+    logging.disable(logging.INFO)
+    _bundle = load_bundle({'USE_COMPILED_FOREST': use_engine}, version)
+    _output_format = output_format
+
+
+def format_results(results, output_format, with_id):
+    if output_format == 'ndjson':
+        return ''.join(json.dumps(result) + '\n' for result in results)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for result in results:
+        row = [result['row'], result.get('random_forest', ''), result.get('keterangan', ''), result.get('error', '')]
+        writer.writerow(([result['id']] if with_id else []) + row)
+    return buffer.getvalue()
+
+
+def summarize(results, with_id):
+    # Worker mengembalikan teks siap tulis, jadi parent hanya menulis ke file
+    errors = sum(1 for result in results if 'error' in result)
+    return len(results), errors, format_results(results, _output_format, with_id)
+
+
+def score_csv_lines(job):
+    first_row, header, lines = job
+    records = [dict(zip(header, values)) for values in csv.reader(lines) if values]
+    return summarize(score_chunk(_bundle, first_row, records), with_id=False)
+
+
+def score_sqlite_rows(job):
+    first_row, columns, rows = job
+    ids = [row[0] for row in rows]
+    records = [dict(zip(columns, row[1:])) for row in rows]
+    results = score_chunk(_bundle, first_row, records)
+    for result, row_id in zip(results, ids):
+        result['id'] = row_id
+    return summarize(results, with_id=True)
+
+
+def iter_csv_jobs(path, chunk_rows, fields):
+    # Parent hanya memotong baris mentah; parsing CSV dikerjakan worker agar skala linear
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = normalize_csv_header(next(csv.reader([f.readline()])))
+        missing_fields = [field for field in fields if field not in header]
+        if missing_fields:
+            raise SystemExit(f"Missing required columns: {', '.join(missing_fields)}")
+        first_row = 1
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) >= chunk_rows:
+                yield first_row, header, lines
+                first_row += len(lines)
+                lines = []
+        if lines:
+            yield first_row, header, lines
+
+
+def iter_sqlite_jobs(path, table, chunk_rows, fields):
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        lowered = {name.lower().replace('_', ''): name for name in columns}
+        missing_fields = [field for field in fields if field not in lowered]
+        if missing_fields:
+            raise SystemExit(f"Missing required columns in {table}: {', '.join(missing_fields)}")
+        selected = ', '.join(f'"{lowered[field]}"' for field in fields)
+        cursor = conn.execute(f'SELECT rowid, {selected} FROM "{table}" ORDER BY rowid')
+        first_row = 1
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield first_row, fields, rows
+            first_row += len(rows)
+    finally:
+        conn.close()
+
+
+def count_input_rows(args):
+    if args.table:
+        conn = sqlite3.connect(args.input)
+        try:
+            return conn.execute(f'SELECT COUNT(*) FROM "{args.table}"').fetchone()[0]
+        finally:
+            conn.close()
+    with open(args.input, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV file or SQLite table with the trained Random Forest.')
+    parser.add_argument('input', help='CSV file in heart.csv layout, or a SQLite database when --table is given')
+    parser.add_argument('output', help='Output file (.ndjson/.jsonl for NDJSON, anything else for CSV)')
+    parser.add_argument('--table', help='SQLite table to read instead of a CSV file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    parser.add_argument('--chunk-rows', type=int, default=20000, help='Rows per chunk sent to a worker')
+    parser.add_argument('--model-version', help='Registry version to use (default: current)')
+    parser.add_argument('--no-engine', action='store_true', help='Score with sklearn instead of the compiled forest')
+    parser.add_argument('--no-progress', action='store_true', help='Do not report progress on stderr')
+    args = parser.parse_args(argv)
+
+    output_format = 'ndjson' if args.output.endswith(('.ndjson', '.jsonl')) else 'csv'
+    total = None if args.no_progress else count_input_rows(args)
+    # Kolom wajib diambil dari preprocessor model yang dipakai worker
+    fields = load_bundle({'USE_COMPILED_FOREST': not args.no_engine}, args.model_version).preprocessor.fields
+    if args.table:
+        jobs, score = iter_sqlite_jobs(args.input, args.table, args.chunk_rows, fields), score_sqlite_rows
+    else:
+        jobs, score = iter_csv_jobs(args.input, args.chunk_rows, fields), score_csv_lines
+    # Kolom diperiksa di sini: SystemExit dari generator yang dibaca thread imap membuat Pool menggantung
+    first_job = next(jobs, None)
+    jobs = itertools.chain([first_job] if first_job is not None else [], jobs)
+
+    start = time.perf_counter()
+    done = 0
+    errors = 0
+    with open(args.output, 'w', newline='', encoding='utf-8') as out, \
+            Pool(args.workers, initializer=init_worker, initargs=(args.model_version, not args.no_engine, output_format)) as pool:
+        if output_format == 'csv':
+            out.write(('id,' if args.table else '') + 'row,random_forest,keterangan,error\r\n')
+        # imap menjaga urutan output sama dengan urutan input
+        for n_rows, n_errors, text in pool.imap(score, jobs):
+            out.write(text)
+            done += n_rows
+            errors += n_errors
+            if total is not None:
+                elapsed = time.perf_counter() - start
+                percent = f"{done / total * 100:5.1f}%" if total else '100.0%'
+                print(f"\r{percent} {done}/{total} rows, {done / elapsed:,.0f} rows/s", end='', file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    if total is not None:
+        print(file=sys.stderr)
+    print(f"✅ Scored {done} rows ({errors} errors) in {elapsed:.1f}s with {args.workers} workers -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+// Tabel klasifikasi server-side (protokol DataTables).
+// Halaman berikutnya diminta dengan cursor (created_at, id) dari baris terakhir halaman sebelumnya,
+// jadi server mencari lewat index alih-alih melewati OFFSET baris. Lompat halaman atau urut
+// berdasarkan kolom lain tetap memakai `start` biasa.
+function escapeHtml(value) {
+    return $('<div>').text(value === null || value === undefined ? '' : value).html();
+}
+
+function riskBadge(rfResult, highText, lowText) {
+    return rfResult === 'ya'
+        ? '<span class="badge bg-danger">' + escapeHtml(highText) + '</span>'
+        : '<span class="badge bg-success">' + escapeHtml(lowText) + '</span>';
+}
+
+// Isi modal detail: setiap elemen [data-field] mendapat nilai kolom dengan nama yang sama
+function fillClassificationDetails(modal, row) {
+    $(modal).find('[data-field]').each(function () {
+        var value = row[$(this).data('field')];
+        $(this).text(value === null || value === undefined ? '' : value);
+    });
+    $(modal).find('[data-risk]').each(function () {
+        var high = $(this).data('risk-high');
+        var low = $(this).data('risk-low');
+        $(this).html(riskBadge(row.rf_result, high, low));
+    });
+}
+
+function classificationTable(selector, url, options) {
+    options = options || {};
+    var cursors = {};
+    var cursorKey = null;
+    var requests = {};
+
+    function filterValues() {
+        return {
+            start_date: options.startDate ? $(options.startDate).val() : '',
+            end_date: options.endDate ? $(options.endDate).val() : ''
+        };
+    }
+
+    if (!$(selector).length) {
+        return null;
+    }
+
+    var table = $(selector).DataTable($.extend({
+        serverSide: true,
+        processing: true,
+        searchDelay: 400,
+        ajax: {
+            url: url,
+            data: function (d) {
+                var filters = filterValues();
+                var key = JSON.stringify([d.order, d.search.value, d.length, filters]);
+                if (key !== cursorKey) {
+                    cursors = {};
+                    cursorKey = key;
+                }
+                var cursor = cursors[d.start];
+                if (cursor) {
+                    d.cursor_created_at = cursor.created_at;
+                    d.cursor_id = cursor.id;
+                }
+                $.extend(d, filters);
+                requests[d.draw] = { start: d.start, length: d.length };
+            },
+            dataSrc: function (json) {
+                var request = requests[json.draw];
+                delete requests[json.draw];
+                if (request && json.next_cursor) {
+                    cursors[request.start + request.length] = json.next_cursor;
+                }
+                return json.data;
+            }
+        }
+    }, options.dataTable));
+
+    $([options.startDate, options.endDate].filter(Boolean).join(',')).on('change', function () {
+        table.draw();
+    });
+    return table;
+}
+
+function rowNumber(data, type, row, meta) {
+    return meta.settings._iDisplayStart + meta.row + 1;
+}
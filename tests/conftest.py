@@ -0,0 +1,89 @@
+"""Shared fixtures: a scratch workspace with heart.csv, a small trained model and an empty database.
+
+The app uses paths relative to the working directory (models/, database.db, reports_output/),
+so the session changes into the workspace before ``app`` is imported.
+"""
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+API_TOKEN = 'test-api-token'
+
+
+def _train_small_model():
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from ml.preprocessing import TARGET_COLUMN, Preprocessor, read_columns
+    from train_models import save_model
+
+    data = read_columns('heart.csv')
+    preprocessor = Preprocessor.fit(data)
+    X = pd.DataFrame(preprocessor.transform(data), columns=preprocessor.columns)
+    y = np.asarray(data[TARGET_COLUMN], dtype=np.int64)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=42)
+    model.fit(pd.DataFrame(scaler.transform(X), columns=preprocessor.columns), y)
+    save_model({'model': model}, scaler, preprocessor, publish=False)
+
+
+@pytest.fixture(scope='session')
+def workspace(tmp_path_factory):
+    path = tmp_path_factory.mktemp('workspace')
+    shutil.copy(os.path.join(ROOT, 'heart.csv'), path)
+    os.chdir(path)
+    _train_small_model()
+    return path
+
+
+@pytest.fixture(scope='session')
+def trained_model(workspace):
+    """(rf_model, scaler, preprocessor) of the workspace model, read back from its pickle."""
+    import joblib
+    from ml.preprocessing import Preprocessor
+    from routes.loadModel import MODEL_PATH
+
+    saved = joblib.load(MODEL_PATH)
+    return saved['rf_model'], saved['scaler'], Preprocessor.from_dict(saved['preprocessor'])
+
+
+@pytest.fixture(scope='session')
+def flask_app(workspace):
+    os.environ.update({
+        'DATABASE_PATH': str(workspace / 'database.db'),
+        'REPORT_DIR': str(workspace / 'reports_output'),
+        'MODEL_WATCH_INTERVAL': '0',
+        'API_TOKENS': API_TOKEN,
+    })
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    return app_module.app
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+
+def login(client, user_id=1, role='admin'):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = role
+        session['full_name'] = 'Test User'
+
+
+def csrf_token(client):
+    """CSRF token bound to the client's session, read from the login form (call it before login())."""
+    html = client.get('/login').get_data(as_text=True)
+    return re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+
+
+RECORD = {'age': 40, 'sex': 'M', 'chestpaintype': 'ATA', 'restingbp': 140, 'cholesterol': 289, 'fastingbs': 0,
+          'restingecg': 'Normal', 'maxhr': 172, 'exerciseangina': 'N', 'oldpeak': 0.0, 'stslope': 'Up'}
@@ -0,0 +1,51 @@
+import re
+import time
+
+from conftest import login
+
+HTML = {'Accept': 'text/html'}
+
+
+def _page_token(html):
+    return re.search(r'name="csrf_token" value="([^"]+)"', html).group(1)
+
+
+def test_models_page_has_csrf_protected_reload_form(client):
+    login(client)
+    html = client.get('/admin/models', headers=HTML).get_data(as_text=True)
+    assert 'action="/admin/models/reload"' in html
+    assert _page_token(html)
+
+
+def test_models_json_for_api_clients(client):
+    login(client)
+    body = client.get('/admin/models', headers={'Accept': 'application/json'}).get_json()
+    assert set(body) == {'serving', 'registry', 'reload'}
+
+
+def test_reload_form_submits_with_page_token(client, flask_app):
+    login(client)
+    token = _page_token(client.get('/admin/models', headers=HTML).get_data(as_text=True))
+    response = client.post('/admin/models/reload', data={'csrf_token': token})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/admin/models')
+    assert 'sedang dimuat ulang' in client.get('/admin/models', headers=HTML).get_data(as_text=True)
+    status = flask_app.config['MODEL_RELOAD_STATUS']
+    deadline = time.monotonic() + 30
+    while status.get('state') == 'loading' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert status['state'] == 'ready'
+
+
+def test_reload_unknown_version_flashes_error(client):
+    login(client)
+    token = _page_token(client.get('/admin/models', headers=HTML).get_data(as_text=True))
+    response = client.post('/admin/models/reload', data={'csrf_token': token, 'version': 'v-missing'})
+    assert response.status_code == 302
+    assert 'Unknown model version: v-missing' in client.get('/admin/models', headers=HTML).get_data(as_text=True)
+
+
+def test_reload_without_csrf_token_is_rejected(client):
+    login(client)
+    assert client.post('/admin/models/reload', data={}).status_code == 400
+    assert client.post('/admin/models/reload', json={}).status_code == 400
@@ -0,0 +1,68 @@
+import csv
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from ml.dataset import DatasetService
+
+
+def _read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _typed(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def test_stats_and_preview_match_the_csv(client, workspace):
+    rows = _read_csv(workspace / 'heart.csv')
+    stats = client.get('/api/dataset/stats').get_json()
+    assert stats['rows'] == len(rows)
+    assert stats['class_balance'] == {label: sum(row['HeartDisease'] == label for row in rows) for label in ('0', '1')}
+    cholesterol = np.array([float(row['Cholesterol']) for row in rows])
+    feature = stats['features']['Cholesterol']
+    assert feature['zeros'] == int((cholesterol == 0).sum())
+    assert feature['mean'] == pytest.approx(cholesterol.mean(), abs=1e-3)
+    assert sum(feature['histogram']['counts']) == len(rows)
+    assert stats['features']['Sex']['counts'] == {'F': sum(r['Sex'] == 'F' for r in rows),
+                                                  'M': sum(r['Sex'] == 'M' for r in rows)}
+
+    preview = client.get('/api/dataset/preview?offset=5&limit=3').get_json()
+    assert preview['total'] == len(rows)
+    assert preview['rows'] == [[_typed(row[name]) for name in preview['columns']] for row in rows[5:8]]
+
+
+def test_service_reloads_changed_file_and_keeps_last_good_one(workspace, tmp_path):
+    path = tmp_path / 'heart.csv'
+    shutil.copy(workspace / 'heart.csv', path)
+    service = DatasetService(str(path), check_interval=0)
+    first = service.get()
+    assert service.get() is first and service.reloads == 1
+
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text(''.join(lines[:11]))
+    os.utime(path, ns=(1, 1))
+    assert service.get().rows == 10
+    assert service.reloads == 2
+
+    # File rusak: snapshot terakhir tetap dipakai
+    path.write_text('Age,Sex\n40,M\n')
+    os.utime(path, ns=(2, 2))
+    assert service.get().rows == 10
+    # Angka yang tidak bisa dibaca (NaN dari konversi preprocessor) juga ditolak
+    path.write_text(lines[0] + lines[1].replace(lines[1].split(',')[0], 'abc', 1))
+    os.utime(path, ns=(3, 3))
+    assert service.get().rows == 10
+
+
+def test_service_raises_when_first_load_fails(tmp_path):
+    path = tmp_path / 'broken.csv'
+    path.write_text('Age\n1\n')
+    with pytest.raises(ValueError):
+        DatasetService(str(path)).get()
@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import login
+from db.database import connect
+
+ROWS = 23
+
+
+@pytest.fixture(scope='module')
+def patient(flask_app):
+    """A patient with ROWS classifications spread over a few identical timestamps."""
+    conn = connect()
+    user_id = conn.execute("INSERT INTO users (username, email, password, full_name, role) "
+                           "VALUES ('pager', 'pager@example.com', 'x', 'Pasien Paging', 'patient')").lastrowid
+    rows = []
+    for i in range(ROWS):
+        created_at = f'2024-05-0{1 + i % 5} 09:00:00'
+        row_id = conn.execute(
+            """INSERT INTO classifications (user_id, age, sex, chestpaintype, restingbp, cholesterol, fastingbs,
+                                            restingecg, maxhr, exerciseangina, oldpeak, stslope, rf_result,
+                                            rf_keterangan, created_at)
+                VALUES (?, ?, 'F', 'ATA', 120, 180, 0, 'Normal', 160, 'N', 0.0, 'Up', 'tidak', '-', ?)""",
+            (user_id, 30 + i, created_at)).lastrowid
+        rows.append((created_at, row_id))
+    conn.commit()
+    conn.close()
+    return user_id, rows
+
+
+def _page(client, **args):
+    return client.get('/history/data', query_string=dict({'draw': 1}, **args)).get_json()
+
+
+def _walk_with_cursor(client, **args):
+    ids = []
+    cursor = {}
+    while True:
+        body = _page(client, length=5, **args, **cursor)
+        if not body['data']:
+            return ids
+        ids.extend(row['id'] for row in body['data'])
+        cursor = {'cursor_created_at': body['next_cursor']['created_at'], 'cursor_id': body['next_cursor']['id']}
+
+
+def test_keyset_pages_cover_every_row_once_in_order(client, patient):
+    user_id, rows = patient
+    login(client, user_id=user_id, role='patient')
+    expected = [row_id for _, row_id in sorted(rows, reverse=True)]
+    assert _walk_with_cursor(client) == expected
+    # Urutan naik: cursor mencari ke arah sebaliknya
+    ascending = {'order[0][column]': 0, 'columns[0][data]': 'created_at', 'order[0][dir]': 'asc'}
+    assert _walk_with_cursor(client, **ascending) == expected[::-1]
+
+
+def test_offset_paging_matches_keyset_paging(client, patient):
+    user_id, rows = patient
+    login(client, user_id=user_id, role='patient')
+    ids = []
+    for start in range(0, ROWS, 5):
+        body = _page(client, start=start, length=5)
+        assert body['recordsTotal'] == body['recordsFiltered'] == ROWS
+        ids.extend(row['id'] for row in body['data'])
+    assert ids == _walk_with_cursor(client)
+
+
+def test_date_filter_and_page_length_limits(client, patient):
+    user_id, rows = patient
+    login(client, user_id=user_id, role='patient')
+    body = _page(client, start_date='2024-05-02', end_date='2024-05-03', length=1000)
+    expected = sorted((row for row in rows if '2024-05-02' <= row[0][:10] <= '2024-05-03'), reverse=True)
+    assert [row['id'] for row in body['data']] == [row_id for _, row_id in expected]
+    assert body['recordsTotal'] == len(expected)
+    assert client.get('/history/data?start_date=2024-13-01').status_code == 400
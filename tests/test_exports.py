@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from conftest import login
+from db.database import EXPORT_COLUMNS, connect
+from routes.exports import iter_export
+
+ROWS = 37
+# Tipe tiap kolom ekspor, untuk membaca kembali CSV
+CSV_TYPES = (int, str, str, int, int, int, str, int, str, float, str)
+
+
+@pytest.fixture(scope='module')
+def exported_user(flask_app):
+    conn = connect()
+    user_id = conn.execute("INSERT INTO users (username, email, password, role) "
+                           "VALUES ('ekspor', 'ekspor@example.com', 'x', 'patient')").lastrowid
+    expected = []
+    for i in range(ROWS):
+        values = (40 + i, 'M' if i % 2 else 'F', 'ASY', 120 + i, 200 + i, i % 2, 'ST', 150 - i, 'Y', i / 10, 'Flat')
+        conn.execute(
+            """INSERT INTO classifications (user_id, age, sex, chestpaintype, restingbp, cholesterol, fastingbs,
+                                            restingecg, maxhr, exerciseangina, oldpeak, stslope, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (user_id,) + values + (f'2024-06-01 10:{i:02d}:00',))
+        expected.append(dict(zip(EXPORT_COLUMNS, values)))
+    conn.commit()
+    conn.close()
+    # Export diurutkan terbaru dulu
+    return user_id, expected[::-1]
+
+
+def _export(client, user_id, output_format, compress=False):
+    response = client.get(f'/admin/classifications/export/{output_format}',
+                          query_string={'user_id': user_id, 'gzip': '1' if compress else '0'})
+    assert response.status_code == 200
+    body = response.get_data()
+    return gzip.decompress(body).decode('utf-8') if compress else body.decode('utf-8')
+
+
+def _csv_records(text):
+    rows = list(csv.DictReader(io.StringIO(text)))
+    return [{name: cast(row[name]) for name, cast in zip(EXPORT_COLUMNS, CSV_TYPES)} for row in rows]
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_exports_contain_every_row_in_each_format(client, exported_user, compress):
+    user_id, expected = exported_user
+    login(client)
+    assert json.loads(_export(client, user_id, 'json', compress)) == expected
+    ndjson = _export(client, user_id, 'ndjson', compress)
+    assert [json.loads(line) for line in ndjson.splitlines()] == expected
+    text = _export(client, user_id, 'csv', compress)
+    assert text.splitlines()[0] == ','.join(EXPORT_COLUMNS)
+    assert _csv_records(text) == expected
+
+
+def test_cached_export_is_identical_and_revalidates(client, exported_user):
+    user_id, _ = exported_user
+    login(client)
+    first = client.get('/admin/classifications/export/ndjson', query_string={'user_id': user_id, 'gzip': '1'})
+    body = first.get_data()
+    second = client.get('/admin/classifications/export/ndjson', query_string={'user_id': user_id, 'gzip': '1'})
+    assert second.get_data() == body
+    assert client.get('/admin/classifications/export/ndjson', query_string={'user_id': user_id, 'gzip': '1'},
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('output_format', ['json', 'ndjson', 'csv'])
+def test_small_fetch_batches_give_the_same_export(flask_app, exported_user, output_format):
+    user_id, _ = exported_user
+    with flask_app.app_context():
+        whole = ''.join(iter_export(output_format, user_id=user_id))
+        pieces = list(iter_export(output_format, user_id=user_id, fetch_rows=4))
+    # Header/"[" + 10 batch + "]" untuk JSON
+    assert len(pieces) > ROWS // 4
+    assert ''.join(pieces) == whole
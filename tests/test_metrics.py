@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_config(flask_app, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'METRICS_TOKEN', None)
+    monkeypatch.setitem(flask_app.config, 'METRICS_PUBLIC', False)
+    return flask_app.config
+
+
+def test_metrics_closed_without_token(client, metrics_config):
+    response = client.get('/metrics')
+    assert response.status_code == 403
+    assert 'METRICS_TOKEN' in response.get_data(as_text=True)
+
+
+def test_metrics_require_configured_token(client, metrics_config):
+    metrics_config['METRICS_TOKEN'] = 'scrape-secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'heart_model_info' in response.get_data(as_text=True)
+
+
+def test_metrics_public_when_opted_in(client, metrics_config):
+    metrics_config['METRICS_PUBLIC'] = True
+    assert client.get('/metrics').status_code == 200
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import pytest
+
+from ml.micro_batcher import MicroBatcher
+
+
+def _submit_concurrently(batcher, jobs):
+    results = [None] * len(jobs)
+    barrier = threading.Barrier(len(jobs))
+
+    def worker(i, row, context):
+        barrier.wait()
+        try:
+            results[i] = batcher.submit(row, context)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, *job)) for i, job in enumerate(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_results_are_routed_to_their_own_row_and_context():
+    calls = []
+
+    def predict(context, matrix):
+        calls.append((context, len(matrix)))
+        return matrix[:, 0] * context['scale']
+
+    small, large = {'scale': 1}, {'scale': 1000}
+    batcher = MicroBatcher(predict, window_ms=50, max_batch=64)
+    jobs = [(np.array([float(i), 0.0]), small if i % 2 else large) for i in range(40)]
+    results = _submit_concurrently(batcher, jobs)
+
+    assert results == [i * (1 if i % 2 else 1000) for i in range(40)]
+    # Baris digabung: jauh lebih sedikit panggilan model daripada request, dan tiap panggilan satu context
+    assert len(calls) < len(jobs)
+    assert sum(n for _, n in calls) == len(jobs)
+
+
+def test_failure_only_affects_its_own_context():
+    def predict(context, matrix):
+        if context == 'broken':
+            raise ValueError('model rusak')
+        return matrix[:, 0]
+
+    batcher = MicroBatcher(predict, window_ms=50)
+    jobs = [(np.array([float(i)]), 'broken' if i < 3 else 'ok') for i in range(8)]
+    results = _submit_concurrently(batcher, jobs)
+    assert all(isinstance(result, ValueError) for result in results[:3])
+    assert results[3:] == [3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+def test_max_batch_caps_rows_per_call():
+    sizes = []
+    batcher = MicroBatcher(lambda context, matrix: sizes.append(len(matrix)) or matrix[:, 0], window_ms=50,
+                           max_batch=4)
+    _submit_concurrently(batcher, [(np.array([float(i)]), None) for i in range(10)])
+    assert max(sizes) <= 4 and sum(sizes) == 10
+
+
+def test_timeout_when_model_never_answers():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda context, matrix: release.wait() and matrix[:, 0], timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher.submit(np.array([1.0]))
+    release.set()
@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+
+from db import database
+
+ROWS = 30
+
+
+def _legacy_db(path, monkeypatch):
+    """Database at schema version 2: results still live in the rf_results table."""
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(path))
+    conn = database.connect()
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, role TEXT)')
+    conn.execute('''CREATE TABLE classifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, age INTEGER NOT NULL,
+        sex TEXT NOT NULL, chestpaintype TEXT NOT NULL, restingbp INTEGER NOT NULL,
+        cholesterol INTEGER NOT NULL, fastingbs INTEGER NOT NULL, restingecg TEXT NOT NULL,
+        maxhr INTEGER NOT NULL, exerciseangina TEXT NOT NULL, oldpeak REAL NOT NULL,
+        stslope TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE rf_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, classification_id INTEGER NOT NULL,
+        rf_result TEXT NOT NULL, rf_keterangan TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute("INSERT INTO users (username, role) VALUES ('admin', 'admin')")
+    for i in range(ROWS):
+        conn.execute("""INSERT INTO classifications (user_id, age, sex, chestpaintype, restingbp, cholesterol,
+                        fastingbs, restingecg, maxhr, exerciseangina, oldpeak, stslope)
+                        VALUES (1, 50, 'M', 'ASY', 130, 200, 0, 'Normal', 150, 'N', 1.0, 'Flat')""")
+        conn.execute('INSERT INTO rf_results (classification_id, rf_result, rf_keterangan) VALUES (?, ?, ?)',
+                     (i + 1, str(i % 2), f'hasil {i}'))
+    conn.commit()
+    with monkeypatch.context() as m:
+        m.setattr(database, 'MIGRATIONS', database.MIGRATIONS[:2])
+        database.migrate(conn)
+    assert database.schema_version(conn) == 2
+    conn.close()
+
+
+def _assert_migrated(conn):
+    assert database.schema_version(conn) == database.SCHEMA_VERSION
+    assert database._object_type(conn, 'rf_results') == 'view'
+    assert database._object_type(conn, 'rf_results_legacy') == 'table'
+    rows = conn.execute('SELECT id, rf_result, rf_keterangan FROM classifications ORDER BY id').fetchall()
+    assert [tuple(row) for row in rows] == [(i + 1, str(i % 2), f'hasil {i}') for i in range(ROWS)]
+    assert conn.execute('SELECT COUNT(*) FROM rf_results').fetchone()[0] == ROWS
+
+
+def test_migrate_twice(tmp_path, monkeypatch):
+    _legacy_db(tmp_path / 'db.sqlite', monkeypatch)
+    conn = database.connect()
+    database.migrate(conn)
+    database.migrate(conn)
+    _assert_migrated(conn)
+    conn.close()
+
+
+def test_migrate_resumes_after_interrupted_backfill(tmp_path, monkeypatch):
+    _legacy_db(tmp_path / 'db.sqlite', monkeypatch)
+    monkeypatch.setattr(database, 'BACKFILL_CHUNK_ROWS', 10)
+    copy_results = database._copy_results
+    calls = []
+
+    def failing_copy(conn, after_id, up_to_id=None):
+        if calls:
+            raise sqlite3.OperationalError('interrupted')
+        calls.append(after_id)
+        copy_results(conn, after_id, up_to_id)
+
+    monkeypatch.setattr(database, '_copy_results', failing_copy)
+    conn = database.connect()
+    with pytest.raises(sqlite3.OperationalError):
+        database.migrate(conn)
+    assert database.schema_version(conn) == 2
+    assert database._object_type(conn, 'rf_results') == 'table'
+    # Chunk pertama sudah di-commit sebelum gangguan
+    assert conn.execute('SELECT COUNT(*) FROM classifications WHERE rf_result IS NOT NULL').fetchone()[0] == 10
+
+    monkeypatch.setattr(database, '_copy_results', copy_results)
+    database.migrate(conn)
+    database.migrate(conn)
+    _assert_migrated(conn)
+    conn.close()
+
+
+class RacingConnection(sqlite3.Connection):
+    """Runs a complete migration on another connection just before the final swap of step 3."""
+
+    begins_after_backfill = 0
+    raced = False
+
+    def execute(self, sql, *args):
+        if sql.startswith('SELECT COALESCE(MAX(id), 0) FROM classifications'):
+            self.begins_after_backfill = 0
+        elif sql == 'BEGIN IMMEDIATE' and not self.raced and 'begins_after_backfill' in vars(self):
+            self.begins_after_backfill += 1
+            # Satu chunk backfill, lalu transaksi terakhir yang me-rename rf_results
+            if self.begins_after_backfill == 2:
+                self.raced = True
+                other = database.connect()
+                database.migrate(other)
+                other.close()
+        return super().execute(sql, *args)
+
+
+def test_concurrent_migrate_does_not_rename_twice(tmp_path, monkeypatch):
+    _legacy_db(tmp_path / 'db.sqlite', monkeypatch)
+    conn = database.connect(RacingConnection)
+    database.migrate(conn)
+    assert conn.raced
+    _assert_migrated(conn)
+    conn.close()
+
+
+def test_legacy_table_conflict_is_reported(tmp_path, monkeypatch):
+    _legacy_db(tmp_path / 'db.sqlite', monkeypatch)
+    conn = database.connect()
+    conn.execute('CREATE TABLE rf_results_legacy (id INTEGER)')
+    conn.commit()
+    with pytest.raises(RuntimeError, match='rf_results_legacy already exists'):
+        database.migrate(conn)
+    assert database.schema_version(conn) == 2
+    conn.close()
+
+
+def test_fresh_database_starts_with_the_results_view(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE_PATH', str(tmp_path / 'fresh.sqlite'))
+    database.init_db()
+    conn = database.connect()
+    assert database.schema_version(conn) == database.SCHEMA_VERSION
+    assert database._object_type(conn, 'rf_results') == 'view'
+    assert database._object_type(conn, 'rf_results_legacy') is None
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' "
+                        "AND name LIKE 'idx_rf_results%'").fetchone()[0] == 0
+    # Insert lewat view lama tetap sampai ke classifications
+    conn.execute("""INSERT INTO classifications (user_id, age, sex, chestpaintype, restingbp, cholesterol,
+                    fastingbs, restingecg, maxhr, exerciseangina, oldpeak, stslope)
+                    VALUES (1, 50, 'M', 'ASY', 130, 200, 0, 'Normal', 150, 'N', 1.0, 'Flat')""")
+    conn.execute("INSERT INTO rf_results (classification_id, rf_result, rf_keterangan) VALUES (1, '1', 'hasil')")
+    assert tuple(conn.execute('SELECT rf_result, rf_keterangan FROM classifications').fetchone()) == ('1', 'hasil')
+    conn.rollback()
+    conn.close()
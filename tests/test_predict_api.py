@@ -0,0 +1,29 @@
+from conftest import API_TOKEN, RECORD, csrf_token, login
+
+
+def test_batch_accepts_api_token_without_csrf(client):
+    response = client.post('/predict/batch', json=[RECORD, dict(RECORD, sex='X')],
+                           headers={'Authorization': f'Bearer {API_TOKEN}'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 2 and body['errors'] == 1
+    assert body['results'][0]['random_forest'] in ('ya', 'tidak')
+
+
+def test_batch_accepts_api_key_header(client):
+    response = client.post('/predict/batch', json={'records': [RECORD]}, headers={'X-API-Key': API_TOKEN})
+    assert response.status_code == 200
+
+
+def test_batch_rejects_missing_or_wrong_token(client):
+    assert client.post('/predict/batch', json=[RECORD]).status_code == 401
+    response = client.post('/predict/batch', json=[RECORD], headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+
+
+def test_batch_session_still_needs_csrf_token(client):
+    token = csrf_token(client)
+    login(client, role='patient')
+    assert client.post('/predict/batch', json=[RECORD]).status_code == 400
+    response = client.post('/predict/batch', json=[RECORD], headers={'X-CSRFToken': token})
+    assert response.status_code == 200
@@ -0,0 +1,46 @@
+import io
+import json
+
+from conftest import API_TOKEN, csrf_token, login
+
+AUTH = {'Authorization': f'Bearer {API_TOKEN}'}
+
+
+def heart_csv(rows=25):
+    with open('heart.csv', 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    return b''.join(lines[:rows + 1])
+
+
+def test_multipart_upload_end_to_end(client):
+    data = {'file': (io.BytesIO(heart_csv()), 'heart.csv')}
+    response = client.post('/predict/csv', data=data, headers=AUTH, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.headers['X-Model-Version']
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['row'] for r in results] == list(range(1, 26))
+    assert all(r['random_forest'] in ('ya', 'tidak') for r in results)
+
+
+def test_raw_csv_body_with_csv_output(client):
+    body = heart_csv(5) + b'40,X,ATA,140,289,0,Normal,172,N,0,Up,0\n'
+    response = client.post('/predict/csv?format=csv', data=body, headers=dict(AUTH, **{'Content-Type': 'text/csv'}))
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == 'row,random_forest,keterangan,error'
+    assert len(lines) == 7
+    assert 'Invalid value for sex' in lines[-1]
+
+
+def test_upload_requires_authentication(client):
+    data = {'file': (io.BytesIO(heart_csv(2)), 'heart.csv')}
+    assert client.post('/predict/csv', data=data, content_type='multipart/form-data').status_code == 401
+
+
+def test_cross_site_form_with_session_cookie_is_rejected(client):
+    token = csrf_token(client)
+    login(client, role='patient')
+    data = {'file': (io.BytesIO(heart_csv(2)), 'heart.csv')}
+    assert client.post('/predict/csv', data=data, content_type='multipart/form-data').status_code == 400
+    data = {'file': (io.BytesIO(heart_csv(2)), 'heart.csv'), 'csrf_token': token}
+    assert client.post('/predict/csv', data=data, content_type='multipart/form-data').status_code == 200
@@ -0,0 +1,34 @@
+from conftest import API_TOKEN, RECORD
+from ml.prediction_cache import PredictionCache
+from routes.loadModel import reload_model
+
+AUTH = {'Authorization': f'Bearer {API_TOKEN}'}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_size=2)
+    cache.put(('a',), 1)
+    cache.put(('b',), 2)
+    assert cache.get(('a',)) == 1
+    cache.put(('c',), 3)
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 1 and cache.get(('c',)) == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_model_reload_invalidates_cached_predictions(client, flask_app):
+    cache = flask_app.config['PREDICTION_CACHE']
+    record = dict(RECORD, age=61, maxhr=133)
+    first = client.post('/predict/batch', json=[record], headers=AUTH).get_json()['results'][0]
+    hits = cache.stats()['hits']
+    assert client.post('/predict/batch', json=[record], headers=AUTH).get_json()['results'][0] == first
+    assert cache.stats()['hits'] == hits + 1
+
+    invalidations = cache.stats()['invalidations']
+    reload_model(flask_app)
+    stats = cache.stats()
+    assert stats['invalidations'] == invalidations + 1
+    assert stats['size'] == 0
+    misses = stats['misses']
+    assert client.post('/predict/batch', json=[record], headers=AUTH).get_json()['results'][0] == first
+    assert cache.stats()['misses'] == misses + 1
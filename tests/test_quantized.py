@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from ml.preprocessing import read_columns
+from ml.forest_engine import CompiledForest
+from ml.quantized import QuantizedForest, load_quantized, memory_comparison, save_quantized, validation_sweep
+from routes.loadModel import MODEL_PATH, QUANTIZED_DIR
+
+
+def _sklearn_proba(rf_model, scaler, preprocessor, X):
+    scaled = scaler.transform(pd.DataFrame(X, columns=preprocessor.columns))
+    return rf_model.predict_proba(pd.DataFrame(scaled, columns=preprocessor.columns))
+
+
+def _sweep(trained_model):
+    rf_model, scaler, preprocessor = trained_model
+    reference = preprocessor.transform(read_columns('heart.csv'))
+    return validation_sweep(rf_model, scaler, reference)
+
+
+def test_quantized_proba_is_bit_identical_to_sklearn(trained_model):
+    rf_model, scaler, preprocessor = trained_model
+    X = _sweep(trained_model)
+    forest = QuantizedForest.from_sklearn(rf_model, scaler)
+    expected = _sklearn_proba(rf_model, scaler, preprocessor, X)
+    assert np.array_equal(forest.predict_proba(X), expected)
+    assert np.array_equal(forest.predict(X), rf_model.classes_.take(np.argmax(expected, axis=1)))
+
+
+def test_quantized_forest_is_smaller_than_compiled(trained_model):
+    rf_model, scaler, _ = trained_model
+    forest = QuantizedForest.from_sklearn(rf_model, scaler)
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+    assert forest.n_nodes == compiled.n_nodes
+    assert memory_comparison(forest, compiled)['reduction'] > 2
+
+
+def test_saved_quantized_artifact_matches_sklearn(trained_model, tmp_path):
+    rf_model, scaler, preprocessor = trained_model
+    X = _sweep(trained_model)
+    expected = _sklearn_proba(rf_model, scaler, preprocessor, X)
+
+    save_quantized(QuantizedForest.from_sklearn(rf_model, scaler), str(tmp_path / 'q'), source_path=MODEL_PATH)
+    assert np.array_equal(load_quantized(str(tmp_path / 'q'), mmap=True).predict_proba(X), expected)
+    # Artifact yang ditulis train_models.save_model (dan dipakai server) juga identik
+    served = load_quantized(QUANTIZED_DIR)
+    assert served.leaf.dtype == np.uint8
+    assert np.array_equal(served.predict_proba(X), expected)
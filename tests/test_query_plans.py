@@ -0,0 +1,25 @@
+import pytest
+
+from db.database import connect
+from db.query_plans import HOT_QUERIES, check_query_plans
+
+
+@pytest.fixture
+def conn(flask_app):
+    # Skema dibuat oleh init_db saat app di-import
+    conn = connect()
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(conn, name):
+    details, problems = check_query_plans(conn, {name: HOT_QUERIES[name]})[name]
+    assert not problems, f'{name} plan: {details}'
+
+
+def test_plan_check_reports_full_scan(conn):
+    details, problems = check_query_plans(
+        conn, {'unindexed': ('SELECT * FROM classifications WHERE stslope = ?', ('Up',))})['unindexed']
+    assert problems == [detail for detail in details if detail.startswith('SCAN')]
+    assert problems
@@ -0,0 +1,136 @@
+import io
+import os
+import re
+import time
+
+import pytest
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from conftest import login
+from reports import pdf
+from reports.jobs import get_job
+
+
+def _wait_done(flask_app, job_id):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        with flask_app.app_context():
+            job = get_job(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'report job {job_id} did not finish')
+
+
+def _submit(flask_app, cache_key):
+    with flask_app.app_context():
+        return flask_app.config['REPORT_QUEUE'].submit('user_history', {'user_id': 1, 'title': 'Riwayat'}, 1,
+                                                       cache_key)
+
+
+def test_download_rerenders_evicted_pdf(client, flask_app):
+    login(client)
+    job_id = _submit(flask_app, 'evicted-report-test')
+    job = _wait_done(flask_app, job_id)
+    assert job['status'] == 'done'
+    os.remove(job['file_path'])
+
+    response = client.get(f'/reports/{job_id}/download')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/reports/{job_id}')
+    assert 'sedang dibuat ulang' in client.get(f'/reports/{job_id}').get_data(as_text=True)
+
+    job = _wait_done(flask_app, job_id)
+    assert job['status'] == 'done' and os.path.exists(job['file_path'])
+    response = client.get(f'/reports/{job_id}/download')
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+
+
+def test_status_requeues_evicted_pdf_once(client, flask_app):
+    login(client)
+    job_id = _submit(flask_app, 'evicted-status-test')
+    os.remove(_wait_done(flask_app, job_id)['file_path'])
+
+    first = client.get(f'/reports/{job_id}/status').get_json()
+    assert first['requeued'] is True
+    assert first['status'] in ('queued', 'running', 'done')
+    # Permintaan berikutnya melihat job yang sudah diantrikan, bukan mengantrikan lagi
+    if first['status'] != 'done':
+        assert client.get(f'/reports/{job_id}/status').get_json()['requeued'] is False
+    assert _wait_done(flask_app, job_id)['status'] == 'done'
+
+
+def _page_count(pdf_bytes):
+    return len(re.findall(rb'/Type /Page\b(?!s)', pdf_bytes))
+
+
+def _history_rows(n):
+    return [{'created_at': f'2024-01-01 00:{i % 60:02d}:00', 'rf_result': 'ya' if i % 3 else 'tidak',
+             'rf_keterangan': f'Baris {i}'} for i in range(n)]
+
+
+def _reference_pdf(title, blocks):
+    # Layout yang sama lewat SimpleDocTemplate dengan seluruh flowable di memori
+    output = io.BytesIO()
+    SimpleDocTemplate(output, pagesize=pdf.PAGE_SIZE).build(
+        [Paragraph(title, pdf.TITLE_STYLE), Spacer(1, 20)] + list(blocks))
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('chunk_rows', [pdf.REPORT_CHUNK_ROWS, 7, None])
+def test_large_history_report_matches_doc_template_layout(chunk_rows):
+    rows = _history_rows(1500)
+    output = io.BytesIO()
+    pdf.render_user_history_pdf(rows, 'Riwayat', output, chunk_rows=chunk_rows)
+    pages = _page_count(output.getvalue())
+    assert pages > 25
+    blocks = pdf._table_blocks(rows, pdf._history_row, pdf.HISTORY_HEADER, pdf.HISTORY_COLUMN_WIDTHS,
+                               pdf.HISTORY_TABLE_STYLE, chunk_rows, None, pdf._no_progress)
+    assert pages == _page_count(_reference_pdf('Riwayat', blocks))
+
+
+def test_large_classifications_report_matches_doc_template_layout():
+    rows = [{'full_name': f'Pasien {i}', 'created_at': '2024-01-01 00:00:00', 'age': 40 + i % 30, 'sex': 'M'}
+            for i in range(120)]
+    output = io.BytesIO()
+    pdf.render_classifications_pdf(rows, 'Klasifikasi', output)
+    blocks = pdf._table_blocks(rows, pdf._classification_row, pdf.CLASSIFICATION_HEADER,
+                               pdf.CLASSIFICATION_COLUMN_WIDTHS, pdf.CLASSIFICATION_TABLE_STYLE,
+                               pdf.REPORT_CHUNK_ROWS, None, pdf._no_progress)
+    assert _page_count(output.getvalue()) == _page_count(_reference_pdf('Klasifikasi', blocks)) > 3
+
+
+def test_classification_row_shows_the_stored_result():
+    user, _, _, result = pdf._classification_row({'full_name': 'Pasien', 'created_at': '2024-01-01 00:00:00',
+                                                  'rf_result': 'Berisiko', 'rf_keterangan': 'Segera periksa'})
+    assert user.text == 'Pasien'
+    assert 'Berisiko' in result.text and 'Segera periksa' in result.text
+    assert 'N/A' not in result.text
+
+    user, _, _, result = pdf._classification_row({'full_name': None, 'username': 'pasien1',
+                                                  'created_at': '2024-01-01 00:00:00', 'rf_result': None})
+    assert user.text == 'pasien1'
+    assert result.text.count('-') == 2
+
+
+def test_empty_report_has_one_page():
+    output = io.BytesIO()
+    pdf.render_user_history_pdf([], 'Kosong', output)
+    assert _page_count(output.getvalue()) == 1
+
+
+def test_pdf_export_is_rendered_by_the_queue(client, flask_app):
+    login(client)
+    response = client.get('/admin/classifications/export/pdf?start_date=2000-01-01')
+    assert response.status_code == 302
+    job_id = response.headers['Location'].rstrip('/').rsplit('/', 1)[-1]
+    assert _wait_done(flask_app, job_id)['status'] == 'done'
+
+    # Setelah job selesai, export yang sama langsung dikirim dari cache dengan ETag
+    response = client.get('/admin/classifications/export/pdf?start_date=2000-01-01')
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+    etag = response.headers['ETag']
+    response = client.get('/admin/classifications/export/pdf?start_date=2000-01-01', headers={'If-None-Match': etag})
+    assert response.status_code == 304
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from conftest import ROOT
+from monitoring.startup import DEFAULT_BUDGET_SECONDS, check_startup, loaded_lazy_modules, profile_import
+
+
+@pytest.fixture
+def app_env(flask_app, monkeypatch):
+    # Interpreter baru di workspace test: model mmap sudah ada, jadi jalur pickle/sklearn tidak dipakai
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+
+
+def test_import_app_within_budget(app_env):
+    seconds, modules = profile_import('app')
+    assert any(name == 'app' for name, _, _, _ in modules)
+    assert check_startup(seconds, modules, DEFAULT_BUDGET_SECONDS) == []
+
+
+def test_heavy_modules_stay_out_of_import_app(app_env):
+    loaded = loaded_lazy_modules('app')
+    assert 'reportlab' not in loaded
+    assert 'pandas' not in loaded
+    assert loaded == []
+
+
+def test_check_startup_flags_budget_and_lazy_modules():
+    problems = check_startup(2.0, [('pandas', 10, 10, 1)], budget=1.0)
+    assert problems == ['startup took 2.00s, budget is 1.00s', 'pandas is imported at startup']
@@ -0,0 +1,77 @@
+from conftest import csrf_token, login
+from db.database import connect
+from db.stats import get_counters, rebuild_stats
+from routes.reportRoutes import current_data_version
+
+
+def _data_version(flask_app):
+    with flask_app.app_context():
+        return current_data_version()
+
+
+def test_deleting_a_user_changes_the_data_version(client, flask_app):
+    conn = connect()
+    user_id = conn.execute(
+        "INSERT INTO users (username, email, password, full_name, role) VALUES (?, ?, ?, ?, 'patient')",
+        ('hapus', 'hapus@example.com', 'x', 'Akan Dihapus')).lastrowid
+    conn.commit()
+    conn.close()
+    before = _data_version(flask_app)
+
+    token = csrf_token(client)
+    login(client)
+    assert client.post(f'/admin/users/{user_id}/delete', data={'csrf_token': token}).status_code == 302
+    assert _data_version(flask_app) != before
+
+
+def test_adding_a_user_changes_the_data_version(flask_app):
+    before = _data_version(flask_app)
+    conn = connect()
+    conn.execute("INSERT INTO users (username, email, password, role) VALUES ('baru', 'baru@example.com', 'x', 'patient')")
+    conn.commit()
+    conn.close()
+    assert _data_version(flask_app) != before
+
+
+def _insert_classification(conn, user_id, rf_result, created_at):
+    return conn.execute(
+        """INSERT INTO classifications (user_id, age, sex, chestpaintype, restingbp, cholesterol, fastingbs,
+                                        restingecg, maxhr, exerciseangina, oldpeak, stslope, rf_result,
+                                        rf_keterangan, created_at)
+            VALUES (?, 50, 'M', 'ASY', 130, 200, 0, 'Normal', 150, 'N', 1.0, 'Flat', ?, '-', ?)""",
+        (user_id, rf_result, created_at)).lastrowid
+
+
+def _snapshot(conn):
+    counters = {name: value for name, value in get_counters(conn).items() if name != 'revision'}
+    days = {row[0]: (row[1], row[2]) for row in conn.execute(
+        'SELECT day, classifications, high_risk FROM daily_stats WHERE classifications != 0 OR high_risk != 0')}
+    return counters, days
+
+
+def test_trigger_counts_match_rebuild_stats(flask_app):
+    conn = connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        patients = [conn.execute("INSERT INTO users (username, email, password, role) VALUES (?, ?, 'x', 'patient')",
+                                 (f'stat{i}', f'stat{i}@example.com')).lastrowid for i in range(3)]
+        ids = [_insert_classification(conn, patients[i % 3], ('ya', 'tidak', None)[i % 3],
+                                      f'2024-03-{1 + i % 4:02d} 10:00:00') for i in range(12)]
+        # Hasil berubah, pindah hari, dihapus; user berganti role dan dihapus
+        conn.execute("UPDATE classifications SET rf_result = 'ya' WHERE id IN (?, ?)", (ids[1], ids[2]))
+        conn.execute("UPDATE classifications SET rf_result = 'tidak' WHERE id = ?", (ids[0],))
+        conn.execute("UPDATE classifications SET created_at = '2024-04-01 08:00:00' WHERE id IN (?, ?)",
+                     (ids[3], ids[4]))
+        conn.execute('DELETE FROM classifications WHERE id IN (?, ?, ?)', (ids[5], ids[6], ids[9]))
+        conn.execute("UPDATE users SET role = 'admin' WHERE id = ?", (patients[0],))
+        conn.execute('DELETE FROM users WHERE id = ?', (patients[1],))
+
+        by_triggers = _snapshot(conn)
+        revision = get_counters(conn)['revision']
+        rebuild_stats(conn)
+        assert _snapshot(conn) == by_triggers
+        assert get_counters(conn)['revision'] == revision + 1
+        assert by_triggers[1]['2024-04-01'][0] >= 2
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,19 @@
+import numpy as np
+
+from ml.preprocessing import CLEANING_RULES
+from ml.training import PreparedData
+
+
+def test_dataset_cache_is_reused_and_keyed_on_the_cleaning_rules(workspace, tmp_path, monkeypatch):
+    first = PreparedData(str(workspace / 'heart.csv'), cache_dir=str(tmp_path), folds=2)
+    assert first.hits == 0
+    again = PreparedData(str(workspace / 'heart.csv'), cache_dir=str(tmp_path), folds=2)
+    assert again.dataset_key == first.dataset_key
+    assert again.misses == 0 and again.hits == first.misses
+    assert np.array_equal(again.X_train, first.X_train)
+
+    monkeypatch.setitem(CLEANING_RULES['RestingBP'], 'max', 150)
+    changed = PreparedData(str(workspace / 'heart.csv'), cache_dir=str(tmp_path), folds=2)
+    assert changed.dataset_key != first.dataset_key
+    assert changed.preprocessor.rules['RestingBP']['max'] == 150
+    assert changed.misses == first.misses
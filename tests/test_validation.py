@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from conftest import API_TOKEN, RECORD, csrf_token, login
+from db.database import connect
+
+AUTH = {'Authorization': f'Bearer {API_TOKEN}'}
+BAD_VALUES = ['nan', 'NaN', 'inf', '-inf', 'Infinity', '1e400', True, False]
+
+
+@pytest.mark.parametrize('value', BAD_VALUES)
+def test_predict_rejects_non_finite_and_bool(client, value):
+    response = client.post('/predict', json=dict(RECORD, cholesterol=value),
+                           headers={'X-CSRFToken': csrf_token(client)})
+    assert response.status_code == 400
+    assert 'Invalid numeric value for cholesterol' in response.get_json()['error']
+
+
+def test_predict_rejects_json_nan_literal(client):
+    body = json.dumps(dict(RECORD, oldpeak=float('nan')))
+    assert 'NaN' in body
+    response = client.post('/predict', data=body, content_type='application/json',
+                           headers={'X-CSRFToken': csrf_token(client)})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('value', BAD_VALUES)
+def test_batch_reports_non_finite_and_bool_per_row(client, value):
+    response = client.post('/predict/batch', json=[RECORD, dict(RECORD, maxhr=value)], headers=AUTH)
+    body = response.get_json()
+    assert body['errors'] == 1
+    assert 'random_forest' in body['results'][0]
+    assert 'Invalid numeric value for maxhr' in body['results'][1]['error']
+
+
+def test_batch_does_not_store_rejected_rows(client):
+    token = csrf_token(client)
+    login(client, user_id=1, role='admin')
+    conn = connect()
+    before = conn.execute('SELECT COUNT(*) FROM classifications WHERE user_id = 1').fetchone()[0]
+    response = client.post('/predict/batch', json=[RECORD, dict(RECORD, age='nan'), dict(RECORD, oldpeak=True)],
+                           headers={'X-CSRFToken': token})
+    assert response.get_json()['errors'] == 2
+    after = conn.execute('SELECT COUNT(*) FROM classifications WHERE user_id = 1').fetchone()[0]
+    conn.close()
+    assert after - before == 1
+
+
+def test_validation_follows_model_preprocessor():
+    from ml.preprocessing import Preprocessor
+    from predict_route import validate_record
+
+    preprocessor = Preprocessor.fit({'Age': ['40', '50'], 'Sex': ['M', 'F'], 'ST_Slope': ['Up', 'Flat'],
+                                     'HeartDisease': ['0', '1']})
+    data, error = validate_record({'Age': 45, 'Sex': 'F', 'stslope': 'Up'}, preprocessor)
+    assert error is None and data == {'age': 45, 'sex': 'F', 'stslope': 'Up'}
+    # 'Down' tidak ada di data training model ini
+    assert 'Must be one of' in validate_record({'age': 45, 'sex': 'F', 'stslope': 'Down'}, preprocessor)[1]
+    assert validate_record({'age': 45, 'sex': 'F'}, preprocessor)[1] == 'Missing required fields: stslope'
+
+
+def test_invalid_category_lists_model_categories(client):
+    response = client.post('/predict/batch', json=[dict(RECORD, chestpaintype='XX')], headers=AUTH)
+    error = response.get_json()['results'][0]['error']
+    assert error == "Invalid value for chestpaintype: XX. Must be one of ['ASY', 'ATA', 'NAP', 'TA']"
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import threading
+
+from conftest import RECORD, ROOT, csrf_token, login
+from db.database import connect
+from db.write_behind import ClassificationWriter
+
+
+def _count(user_id=1):
+    conn = connect()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM classifications WHERE user_id = ?', (user_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _blocked_writer(max_queue):
+    writer = ClassificationWriter(max_queue=max_queue, batch_size=1, put_timeout=0.01)
+    release = threading.Event()
+    taken = threading.Event()
+    write = writer._write
+
+    def slow_write(batch):
+        taken.set()
+        release.wait()
+        write(batch)
+
+    writer._write = slow_write
+    return writer, release, taken
+
+
+def test_full_queue_rejects_and_caller_writes_synchronously(client, flask_app, monkeypatch):
+    writer, release, taken = _blocked_writer(max_queue=1)
+    # Baris pertama diambil thread writer (lalu tertahan), baris kedua memenuhi antrean
+    assert writer.submit((1, RECORD, 'tidak', '-', 'test', 0.1))
+    assert taken.wait(5)
+    assert writer.submit((1, RECORD, 'tidak', '-', 'test', 0.1))
+    assert not writer.submit((1, RECORD, 'tidak', '-', 'test', 0.1))
+    assert writer.stats()['rejected'] == 1
+
+    monkeypatch.setitem(flask_app.config, 'CLASSIFICATION_WRITER', writer)
+    token = csrf_token(client)
+    login(client)
+    before = _count()
+    response = client.post('/predict/batch', json=[RECORD, RECORD, RECORD], headers={'X-CSRFToken': token})
+    assert response.status_code == 200
+    # Antrean penuh: ketiga baris ditulis langsung oleh request
+    assert _count() == before + 3
+    assert writer.stats()['rejected'] == 4
+
+    release.set()
+    writer.flush()
+    assert _count() == before + 5
+    assert writer.stats()['written'] == 2
+
+
+def test_queued_rows_are_flushed_on_exit(workspace, tmp_path):
+    script = textwrap.dedent(f'''
+        import time
+        import db.write_behind as write_behind
+        import app
+
+        insert = write_behind.insert_classifications_batch
+        def slow_insert(conn, rows):
+            time.sleep(0.01)
+            insert(conn, rows)
+        write_behind.insert_classifications_batch = slow_insert
+
+        writer = app.app.config['CLASSIFICATION_WRITER']
+        for i in range(200):
+            assert writer.submit((1, {RECORD!r}, 'ya', 'queued', 'test', 0.9))
+        print('submitted', writer.stats()['written'])
+    ''')
+    database = tmp_path / 'exit.db'
+    env = dict(os.environ, PYTHONPATH=ROOT, DATABASE_PATH=str(database), DB_WRITE_BEHIND='1',
+               DB_WRITE_BEHIND_BATCH='10', MODEL_WATCH_INTERVAL='0')
+    result = subprocess.run([sys.executable, '-c', script], cwd=workspace, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    # Saat submit selesai sebagian besar baris masih di antrean; atexit flush menulis sisanya
+    assert int(result.stdout.split()[-1]) < 200
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT COUNT(*) FROM classifications WHERE rf_keterangan = 'queued'").fetchone()[0] == 200
+    conn.close()
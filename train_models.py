@@ -1,84 +1,149 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
 import os
-import joblib
+import sys
+import time
 import warnings
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-from imblearn.combine import SMOTEENN
+import joblib
+from ml.artifact import save_engine
+from ml.compression import compress, select_promotion, format_compression_report
+from ml.quantized import save_quantized, memory_comparison
+from ml.registry import ModelRegistry
+from ml.training import (DEFAULT_CACHE_DIR, DEFAULT_FOLDS, DEFAULT_GRID, RANK_KEYS, PreparedData,
+                         search, report_rows, format_report)
+from routes.loadModel import build_engine, build_quantized, MODEL_PATH, ENGINE_DIR, QUANTIZED_DIR
 
 warnings.filterwarnings('ignore')
 
-# Load dataset
-data = pd.read_csv('heart.csv')
-
-# Encode kategori
-label_encoders = {}
-for column in data.select_dtypes(include=['object']).columns:
-    le = LabelEncoder()
-    data[column] = le.fit_transform(data[column])
-    label_encoders[column] = le
-
-# Bersihkan data
-data['RestingBP'] = pd.to_numeric(data['RestingBP'], errors='coerce')
-data['Cholesterol'] = pd.to_numeric(data['Cholesterol'], errors='coerce')
-data['RestingBP'] = data['RestingBP'].apply(lambda x: np.nan if x > 140 or x < 40 else x)
-data['Cholesterol'] = data['Cholesterol'].replace(0, np.nan)
-data['RestingBP'].fillna(data['RestingBP'].median(), inplace=True)
-data['Cholesterol'].fillna(data['Cholesterol'].median(), inplace=True)
-
-# Pisahkan fitur dan label
-X = data.drop('HeartDisease', axis=1)
-y = data['HeartDisease']
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-# Scaling - tetap gunakan kolom fitur agar sesuai dengan Flask app
-scaler = StandardScaler()
-X_train_scaled = pd.DataFrame(scaler.fit_transform(X_train), columns=X.columns)
-X_test_scaled = pd.DataFrame(scaler.transform(X_test), columns=X.columns)
-
-# Terapkan SMOTEENN
-sm = SMOTEENN(sampling_strategy=0.96, random_state=42)
-X_train_res, y_train_res = sm.fit_resample(X_train_scaled, y_train)
-
-# Fungsi evaluasi dan mengembalikan model
-def evaluate_model(model, X_train, y_train, X_test, y_test, name, hasil):
-    model.fit(X_train, y_train)
-    pred = model.predict(X_test)
-    hasil.append({
-        'Model': name,
-        'Accuracy': accuracy_score(y_test, pred),
-        'Precision': precision_score(y_test, pred),
-        'Recall': recall_score(y_test, pred),
-        'F1-Score': f1_score(y_test, pred)
-    })
-    return model
-
-# Evaluasi model
-hasil_sesudah = []
-
-rf_model = evaluate_model(
-    RandomForestClassifier(n_estimators=100, max_depth=40, random_state=42, min_samples_split=4),
-    X_train_res, y_train_res, X_test_scaled, y_test,
-    'Random Forest (After)', hasil_sesudah)
-
-# Simpan model dan scaler
-saved_models = {
-    'scaler': scaler,
-    'rf_model': rf_model
-}
-
-if not os.path.exists('models'):
-    os.makedirs('models')
-
-joblib.dump(saved_models, 'models/models_and_scaler_smoteenn.pkl')
-
-# Tampilkan hasil evaluasi
-df_hasil = pd.DataFrame(hasil_sesudah)
-print("\n=== Kinerja Model Random Forest Sesudah SMOTEENN ===")
-print(df_hasil.sort_values(by='Model').reset_index(drop=True))
-print("✅ Model Random Forest dan scaler telah disimpan ke 'models/models_and_scaler_smoteenn.pkl'.")
+REPORT_PATH = os.path.join('models', 'training_report.json')
+
+
+def parse_grid_values(text):
+    # "6,10,none" -> [6, 10, None]
+    return [None if value.strip().lower() == 'none' else int(value) for value in text.split(',')]
+
+
+def save_model(candidate, scaler, preprocessor, publish=True, quantize=True):
+    """Write the winning candidate: pickle, compiled and quantized mmap artifacts, registry version.
+
+    The fitted preprocessor goes into each of them, so serving encodes requests exactly like training.
+    """
+    if not os.path.exists('models'):
+        os.makedirs('models')
+
+    # Simpan model, scaler dan preprocessor (sebagai dict biasa agar pickle tidak bergantung pada kelasnya)
+    saved_preprocessor = preprocessor.to_dict()
+    joblib.dump({'scaler': scaler, 'rf_model': candidate['model'], 'preprocessor': saved_preprocessor}, MODEL_PATH)
+
+    # Simpan juga forest terkompilasi sebagai buffer numpy agar bisa di-mmap oleh semua worker
+    engine = build_engine(candidate['model'], scaler, preprocessor)
+    if engine is not None:
+        save_engine(engine, ENGINE_DIR, source_path=MODEL_PATH, preprocessor=saved_preprocessor)
+    print(f"✅ Model Random Forest dan scaler telah disimpan ke '{MODEL_PATH}'.")
+    if engine is not None:
+        print(f"✅ Artifact forest terkompilasi (mmap) disimpan ke '{ENGINE_DIR}'.")
+
+    # Versi terkuantisasi hanya disimpan jika identik dengan sklearn pada validation sweep
+    quantized = build_quantized(candidate['model'], scaler, preprocessor) if quantize and engine is not None else None
+    if quantized is not None:
+        memory = memory_comparison(quantized, engine)
+        save_quantized(quantized, QUANTIZED_DIR, source_path=MODEL_PATH, compiled_bytes=memory['compiled_bytes'],
+                       preprocessor=saved_preprocessor)
+        print(f"✅ Forest terkuantisasi disimpan ke '{QUANTIZED_DIR}': {memory['quantized_bytes'] / 1024:.1f} KB vs "
+              f"{memory['compiled_bytes'] / 1024:.1f} KB terkompilasi ({memory['bytes_per_node']} vs "
+              f"{memory['compiled_bytes_per_node']} B/node, {memory['reduction']:.2f}x lebih kecil per worker).")
+    if not publish:
+        return
+
+    # Daftarkan sebagai versi baru di registry; worker yang berjalan akan hot-reload otomatis
+    test = candidate['test']
+    version = ModelRegistry().publish(
+        MODEL_PATH,
+        engine_dir=ENGINE_DIR if engine is not None else None,
+        quantized_dir=QUANTIZED_DIR if quantized is not None else None,
+        metrics={'Accuracy': test['accuracy'], 'Precision': test['precision'],
+                 'Recall': test['recall'], 'F1-Score': test['f1']}
+    )
+    print(f"✅ Model terdaftar di registry sebagai versi {version}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the heart disease Random Forest with a cross-validated search.')
+    parser.add_argument('--data', default='heart.csv', help='Training CSV in heart.csv layout')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Cache for the cleaned dataset and resampled folds')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help='Stratified CV folds')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    parser.add_argument('--n-estimators', type=parse_grid_values,
+                        default=DEFAULT_GRID['n_estimators'], help='Comma separated, e.g. 50,100,200')
+    parser.add_argument('--max-depth', type=parse_grid_values,
+                        default=DEFAULT_GRID['max_depth'], help='Comma separated, "none" for unlimited')
+    parser.add_argument('--min-samples-split', type=parse_grid_values,
+                        default=DEFAULT_GRID['min_samples_split'], help='Comma separated')
+    parser.add_argument('--rank-by', choices=sorted(RANK_KEYS), default='f1', help='CV metric used for ranking')
+    parser.add_argument('--report', default=REPORT_PATH, help='Where to write the ranked JSON report')
+    parser.add_argument('--top', type=int, default=10, help='Candidates to print')
+    parser.add_argument('--no-compress', action='store_true', help='Skip the compression stage')
+    parser.add_argument('--distill', action='store_true', help='Also try distilled students (small forest, single tree)')
+    parser.add_argument('--accuracy-tolerance', type=float,
+                        help='Promote the fastest compressed variant whose CV accuracy and F1 drop by at most this much')
+    parser.add_argument('--no-quantize', action='store_true', help='Do not write the quantized serving artifact')
+    parser.add_argument('--no-save', action='store_true', help='Only write the report, keep the current model')
+    parser.add_argument('--no-publish', action='store_true', help='Save the model files but do not register a version')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    prepared = PreparedData(args.data, cache_dir=args.cache_dir, folds=args.folds)
+    print(f"Data: {len(prepared.y_train)} train / {len(prepared.y_test)} test rows, "
+          f"cache {prepared.hits} hit / {prepared.misses} miss ({args.cache_dir})")
+
+    grid = {'n_estimators': args.n_estimators, 'max_depth': args.max_depth,
+            'min_samples_split': args.min_samples_split}
+    candidates = search(prepared, grid, workers=args.workers, rank_by=args.rank_by)
+    print(f"\n=== {len(candidates)} kandidat, {args.folds}-fold CV, {args.workers} worker, "
+          f"{time.perf_counter() - start:.1f}s ===")
+    print(format_report(candidates, args.top))
+    best = candidates[0]
+    print(f"Terbaik: {best['params']}")
+
+    report = {
+        'data': args.data,
+        'dataset_key': prepared.dataset_key,
+        'folds': args.folds,
+        'rank_by': args.rank_by,
+        'candidates': report_rows(candidates),
+    }
+    if not args.no_compress:
+        # Varian lebih kecil dari model terbaik, dibandingkan pada fold dan test set yang sama
+        compressed = compress(prepared, best, workers=args.workers, distill=args.distill)
+        print(f"\n=== Kompresi (referensi: {best['params']}) ===")
+        print(format_compression_report(best, compressed))
+        promoted = None
+        if args.accuracy_tolerance is not None:
+            promoted = select_promotion(best, compressed, args.accuracy_tolerance)
+            if promoted is None:
+                print(f"Tidak ada varian dalam toleransi akurasi {args.accuracy_tolerance}; model referensi dipakai.")
+            else:
+                print(f"Dipromosikan: {promoted['name']} {promoted['params']} "
+                      f"({promoted['delta']['latency_ratio']:.2f}x latensi, {promoted['delta']['bytes_ratio']:.2f}x ukuran)")
+                best = promoted
+        report['compression'] = {
+            'reference': candidates[0]['params'],
+            'accuracy_tolerance': args.accuracy_tolerance,
+            'promoted': promoted['name'] if promoted else None,
+            'candidates': report_rows(compressed),
+        }
+
+    report['seconds'] = round(time.perf_counter() - start, 1)
+    os.makedirs(os.path.dirname(args.report) or '.', exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Laporan lengkap disimpan ke '{args.report}'.")
+
+    if not args.no_save:
+        save_model(best, prepared.scaler(), prepared.preprocessor, publish=not args.no_publish,
+                   quantize=not args.no_quantize)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())